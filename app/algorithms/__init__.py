@@ -3,5 +3,8 @@ Import all calc methods and constants
 """
 
 from .benchmark_model import benchmark_train_and_predict
-from .xgb_model import xgb_train_and_predict
-from .xgb_interval_prediction import xgb_interval_train_and_predict
+from .xgb_model import xgb_features, xgb_train_and_predict
+from .xgb_search import load_hyperparameters
+from .xgb_hist import xgb_hist_features, xgb_hist_train_and_predict
+from .xgb_interval_prediction import add_quantiles_predictions, interval_quantiles, quantile_column, \
+    xgb_interval_features, xgb_interval_train_and_predict
@@ -12,7 +12,7 @@ def benchmark_train_and_predict(column_to_predict, train_data, test_data):
     'frequentation_prevue' or 'frequentation_reel' times 'effectif'
     """
     logger.info("----------- check training data -------------")
-    for resolution, dtf in train_data.groupby(['cantine_nom', 'cantine_type']):
+    for resolution, dtf in train_data.groupby(['cantine_nom', 'cantine_type'], observed=True):
         logger.info("canteen %s has %s days of history to train on starting on %s and ending on %s",
                     resolution,
                     len(dtf),
@@ -26,7 +26,7 @@ def benchmark_train_and_predict(column_to_predict, train_data, test_data):
         test_data['output'] = test_data['frequentation_reel'] * test_data['effectif']
 
     logger.info("----------- check predictions -------------")
-    for resolution, dtf in test_data.groupby(['cantine_nom', 'cantine_type']):
+    for resolution, dtf in test_data.groupby(['cantine_nom', 'cantine_type'], observed=True):
         logger.info("canteen %s has predictions for %s days starting on %s and ending on %s",
                     resolution,
                     len(dtf),
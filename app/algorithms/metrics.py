@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------
+# Evaluation metrics used for early stopping
+# -----------------------------------------------------------
+import math
+import time
+
+import numpy as np
+from sklearn.metrics import mean_absolute_error, mean_squared_error
+
+from app.log import logger
+
+
+# - numpy: mae and rmse computed with numpy on every round
+# - sklearn: mae and rmse computed with sklearn on every round, slower because of inputs checks
+# - xgboost: built-in metrics of xgboost, computed without calling python
+EVAL_METRICS = ["numpy", "sklearn", "xgboost"]
+
+
+def multi_custom_metrics(y_pred, dtrain):
+    """
+    allow to optimize xgboost using multiple metrics for early stopping
+    """
+    y_true = dtrain.get_label()
+    mae = mean_absolute_error(y_true, y_pred)
+    rmse = math.sqrt(mean_squared_error(y_true, y_pred))
+
+    return [("mae", mae), ("mse", rmse)]
+
+
+def numpy_metrics(y_pred, dtrain):
+    """
+    same metrics as multi_custom_metrics computed with numpy only
+    """
+    errors = dtrain.get_label() - y_pred
+    mae = np.mean(np.abs(errors))
+    rmse = math.sqrt(np.mean(errors ** 2))
+
+    return [("mae", mae), ("mse", rmse)]
+
+
+def timed(metric, timer):
+    """
+    given a metric callback, returns a callback which adds its duration and number of calls to the dict timer
+    """
+    def _timed_metric(y_pred, dtrain):
+        start = time.perf_counter()
+        result = metric(y_pred, dtrain)
+        timer["seconds"] += time.perf_counter() - start
+        timer["calls"] += 1
+        return result
+    return _timed_metric
+
+
+def early_stopping_metric(eval_metric="numpy"):
+    """
+    returns the `eval_metric` argument to give to XGBRegressor.fit for the metric `eval_metric` (see EVAL_METRICS)
+    and a dict timer {"seconds": float, "calls": int} updated by python metrics
+    early stopping relies on the last metric: the root mean squared error
+    """
+    if eval_metric not in EVAL_METRICS:
+        raise ValueError(f"Unrecognized eval metric '{eval_metric}', choose among {EVAL_METRICS}")
+    timer = {"seconds": 0.0, "calls": 0}
+    if eval_metric == "xgboost":
+        return ["mae", "rmse"], timer
+    metric = numpy_metrics if eval_metric == "numpy" else multi_custom_metrics
+    return timed(metric, timer), timer
+
+
+def log_metric_time(eval_metric, timer, training_seconds):
+    """
+    logs how much of the training_seconds the evaluation metric took
+    """
+    if eval_metric == "xgboost":
+        logger.info("training took %.2fs, eval metric computed by xgboost", training_seconds)
+        return
+    logger.info("training took %.2fs, eval metric '%s' took %.2fs (%.0f%%) over %s calls",
+                training_seconds,
+                eval_metric,
+                timer["seconds"],
+                100 * timer["seconds"] / training_seconds if training_seconds else 0,
+                timer["calls"])
@@ -0,0 +1,193 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------
+# Train a XGBoost model with the histogram tree method
+# -----------------------------------------------------------
+import multiprocessing as mp
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+import xgboost
+from xgboost import DMatrix
+
+from app.algorithms.metrics import early_stopping_metric, log_metric_time
+from app.algorithms.xgb_model import FEATURES as XGB_FEATURES, xgb_features
+from app.exceptions import EmptyTrainingSet
+from app.log import logger
+from app.plot import plot_curve
+
+
+# codes of categories, split as categories when xgboost supports it (see native_categorical_supported)
+CATEGORICAL_FEATURES = ["site_id", "secteur_cat", "school_year_cat"]
+
+# parameters of xgboost.train, base_score and nthread are set when training
+PARAMS = {
+    "objective": "reg:squarederror",
+    "tree_method": "hist",
+    "max_bin": 256,
+    "eta": 0.09,
+    "max_depth": 5,
+    "min_child_weight": 1,
+    "subsample": 1,
+    "lambda": 1,
+    "alpha": 0,
+    "seed": 0,
+    "verbosity": 0,
+}
+NUM_BOOST_ROUND = 5000
+EARLY_STOPPING_ROUNDS = 100
+
+
+def xgb_hist_features(data_path):
+    """
+    returns the list of features used by the xgb_hist model:
+    the ones of the xgb model and the school year
+    """
+    features = xgb_features(data_path)
+    position = len(XGB_FEATURES)
+    return features[:position] + ["school_year_cat"] + features[position:]
+
+
+def native_categorical_supported():
+    """
+    whether the installed xgboost splits categorical features on categories with the hist tree method
+    """
+    version = tuple(int(number) for number in xgboost.__version__.split(".")[:2])
+    return version >= (1, 6)
+
+
+def feature_categories(dataset, features, categorical_features=CATEGORICAL_FEATURES):
+    """
+    returns {feature: sorted list of its values in dataset} for the categorical_features among features,
+    the categories of the models to save with them, see feature_matrix
+    """
+    return {
+        col: sorted(dataset[col].dropna().unique().tolist())
+        for col in categorical_features if col in features}
+
+
+def feature_matrix(dataset, features, categorical_features=(), label=None, categories=None):
+    """
+    returns the DMatrix of the features of dataset, categorical_features being handled as categories
+    when xgboost supports it, as numbers otherwise
+    xgboost splits on the codes of the categories: the ones of `categories` {feature: list of values}
+    (see feature_categories) must be given to predict with the categories the model has been trained on,
+    values missing from them are handled as missing values, categories are the values of dataset otherwise
+    """
+    categorical_features = [col for col in categorical_features if col in features]
+    if categorical_features and native_categorical_supported():
+        categories = categories or {}
+        data = dataset[features].copy()
+        for col in categorical_features:
+            data[col] = pd.Categorical(data[col], categories=categories.get(col))
+        return DMatrix(data, label=label, missing=np.nan, enable_categorical=True)
+    return DMatrix(dataset[features].values.astype(np.float64), label=label, missing=np.nan, feature_names=features)
+
+
+def booster_feature_importance(booster, features):
+    """
+    returns the list of (feature, importance) of booster sorted by decreasing importance,
+    importances are the average gains of features normalized to sum to 1 as XGBRegressor.feature_importances_
+    """
+    gains = booster.get_score(importance_type="gain")
+    total = sum(gains.values()) or 1
+    feature_importance = [(feature, gains.get(feature, 0) / total) for feature in features]
+    feature_importance_list = sorted(feature_importance, key=lambda t: t[1], reverse=True)
+    logger.info("FI:")
+    logger.info(feature_importance_list)
+    return feature_importance_list
+
+
+# pylint: disable=too-many-locals
+def xgb_hist_train_and_predict(column_to_predict, train_data, evaluation_data, data_path, eval_metric="numpy",
+                               n_threads=None, plot=True, categories=None):
+    """
+    train a xgboost model with the hist tree method on column_to_predict from train_data
+    and generates predictions for evaluation_data which are stored in a column named `output`
+    a single DMatrix of the lines of train_data without nans and of evaluation_data is built, then sliced
+    into the training, validation and prediction matrices
+    data_path specify path to data in order to compute external features
+    eval_metric is the metric used for early stopping, see metrics.EVAL_METRICS
+    the model is trained using n_threads threads (all cpus if None)
+    the training curves are saved in output/figs if plot is True
+    categories {feature: list of values} are the categories of the categorical features, the ones of train_data
+    if None (see feature_categories), they must be saved with the booster to predict with it
+    returns evaluation_data, the features importance and the trained booster as {"model": booster}
+    """
+    logger.info("----------- check training data -------------")
+    for resolution, dtf in train_data.groupby(['cantine_nom', 'cantine_type'], observed=True):
+        logger.info("canteen %s has %s days of history to train on starting on %s and ending on %s",
+                    resolution,
+                    len(dtf),
+                    dtf["date_str"].min(),
+                    dtf['date_str'].max(),
+                    )
+
+    features = xgb_hist_features(data_path)
+
+    # same training lines as the xgb model: lines without nans
+    train_data_reduced = train_data[features + [column_to_predict]].dropna()
+    logger.info("Dropping %s percent of training data due to NANs",
+                round(100 * (len(train_data) - len(train_data_reduced)) / len(train_data)) if len(train_data) else 0)
+    if len(train_data_reduced) == 0:
+        raise EmptyTrainingSet("")
+    train_data_y = train_data_reduced[column_to_predict].values.astype(np.float64)
+    nb_train = len(train_data_reduced)
+    if categories is None:
+        categories = feature_categories(train_data, features)
+
+    # a single matrix for training, validation and prediction, labels of lines to predict are unknown
+    matrix = feature_matrix(
+        pd.concat([train_data_reduced[features], evaluation_data[features]], ignore_index=True),
+        features,
+        CATEGORICAL_FEATURES,
+        np.concatenate([train_data_y, np.zeros(len(evaluation_data))]),
+        categories)
+    # same validation lines as ratio_split of the xgb model
+    train_lines, validation_lines = train_test_split(np.arange(nb_train), test_size=0.1, random_state=42)
+    dtrain = matrix.slice(train_lines)
+    dvalidation = matrix.slice(validation_lines)
+    dprediction = matrix.slice(np.arange(nb_train, nb_train + len(evaluation_data)))
+
+    params = dict(PARAMS, base_score=train_data_y[train_lines].mean(), nthread=n_threads or mp.cpu_count())
+    metric, timer = early_stopping_metric(eval_metric)
+    feval = None
+    if callable(metric):
+        params["disable_default_eval_metric"] = 1
+        feval = metric
+    else:
+        params["eval_metric"] = metric
+
+    evals_result = {}
+    start = time.perf_counter()
+    booster = xgboost.train(
+        params,
+        dtrain,
+        num_boost_round=NUM_BOOST_ROUND,
+        evals=[(dtrain, "validation_0"), (dvalidation, "validation_1")],
+        feval=feval,
+        early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+        evals_result=evals_result,
+        verbose_eval=False)
+    log_metric_time(eval_metric, timer, time.perf_counter() - start)
+    # predict values
+    evaluation_data['output'] = np.ceil(booster.predict(dprediction, ntree_limit=booster.best_ntree_limit))
+
+    logger.info("----------- check predictions -------------")
+    for resolution, dtf in evaluation_data.groupby(['cantine_nom', 'cantine_type'], observed=True):
+        logger.info("canteen %s has predictions for %s days starting on %s and ending on %s",
+                    resolution,
+                    len(dtf),
+                    dtf["date_str"].min(),
+                    dtf['date_str'].max(),
+                    )
+
+    logger.info("----------- evaluate model -------------")
+
+    feature_importance_list = booster_feature_importance(booster, features)
+
+    if plot:
+        plot_curve(evals_result, "nantes_metropole_xgb")
+
+    return evaluation_data, feature_importance_list, {"model": booster}
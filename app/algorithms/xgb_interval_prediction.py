@@ -2,43 +2,147 @@
 # -----------------------------------------------------------
 # Train XGBoost model to estimate a confidence interval
 # -----------------------------------------------------------
-import json
+from concurrent.futures import ThreadPoolExecutor
 import multiprocessing as mp
-import os
+import time
 
 import numpy as np
 from xgboost import XGBRegressor
 
-from app.algorithms.xgb_model import evaluate_feature_importance, multi_custom_metrics, ratio_split
+from app.algorithms.metrics import early_stopping_metric, log_metric_time
+from app.algorithms.xgb_model import evaluate_feature_importance, ratio_split
+from app.calculators import read_meals_dictionary
 from app.exceptions import EmptyTrainingSet
 from app.log import logger
 from app.plot import plot_curve
 
 
-# pylint: disable=too-many-locals
-def xgb_interval_train_and_predict(column_to_predict, train_data, evaluation_data, confidence_interval, data_path):
+FEATURES = [
+    "site_id",
+    "secteur_cat",
+    "week",
+    "wednesday",  # this feature is only used if the dedicated parameter include_wednesday is set to True
+    "non_working_in",
+    "holidays_in",
+    "effectif",
+    "frequentation_prevue",
+    "Events.RAMADAN_ago",  # "Events.AID_ago"
+]
+
+# hyperparameters of the models, the objective depends on their quantile, base_score and n_jobs are set when training
+PARAMS = {
+    "n_estimators": 5000,
+    "learning_rate": 0.09,
+    "max_depth": 5,
+    "booster": 'gbtree',
+    "importance_type": 'gain',
+    "max_delta_step": 0,
+    "min_child_weight": 1,
+    "random_state": 0,
+    "reg_alpha": 0,
+    "reg_lambda": 1,
+    "scale_pos_weight": 1,
+    "subsample": 1,
+    "verbosity": 0,
+}
+
+
+def xgb_interval_features(data_path):
     """
-    train a xgboost model on column_to_predict from train_data
+    returns the list of features used by the xgb_interval models:
+    FEATURES and the meals categories of `data_path/calculators/menus.json`
+    """
+    return FEATURES + list(read_meals_dictionary(data_path).keys())
+
+
+def interval_quantiles(confidence_interval, quantiles=None):
+    """
+    returns the sorted list of quantiles to train models on:
+    `quantiles` if providen, else the bounds of the confidence_interval
+    """
+    if not quantiles:
+        confidence_step = (1 - confidence_interval) / 2
+        quantiles = [confidence_step, 1 - confidence_step]
+    for quantile in quantiles:
+        if not 0 < quantile < 1:
+            raise ValueError(f"Invalid quantile: '{quantile}', quantiles must belong to ]0, 1[")
+    return sorted(set(quantiles))
+
+
+def quantile_column(quantile):
+    """
+    returns the name of the column storing the predictions of the model trained on `quantile`
+    """
+    return f"pred_quantile_{quantile:g}"
+
+
+def add_quantiles_predictions(evaluation_data, quantiles, predictions):
+    """
+    given the sorted list of quantiles and the list of raw predictions of their models, adds to evaluation_data:
+    - the predictions of each quantile in a column (see quantile_column)
+    - the lowest and highest ones in `pred_lower_bound` and `pred_upper_bound`
+    - the maximum of all of them in `output`
+    """
+    for quantile, prediction in zip(quantiles, predictions):
+        evaluation_data[quantile_column(quantile)] = np.ceil(prediction)
+
+    # models of the highest quantiles are considered as upper bounds
+    evaluation_data['pred_lower_bound'] = evaluation_data[quantile_column(quantiles[0])]
+    evaluation_data['pred_upper_bound'] = evaluation_data[quantile_column(quantiles[-1])]
+    evaluation_data['output'] = evaluation_data[[quantile_column(quantile) for quantile in quantiles]].max(axis=1)
+    return evaluation_data
+
+
+def thread_budget(nb_models, n_threads=None):
+    """
+    returns the number of models trained concurrently and the number of threads of each model
+    such that at most n_threads (all cpus if None) are used
+    """
+    n_threads = n_threads or mp.cpu_count()
+    nb_workers = max(1, min(nb_models, n_threads))
+    return nb_workers, max(1, n_threads // nb_workers)
+
+
+def train_quantile_model(quantile, params, train_matrix, train_y, eval_set, eval_metric="numpy"):
+    """
+    trains a model on the `quantile` of train_y with early stopping on eval_set using eval_metric
+    """
+    model = XGBRegressor(**params, objective=log_cosh_quantile(quantile))
+    metric, timer = early_stopping_metric(eval_metric)
+    start = time.perf_counter()
+    model.fit(
+        train_matrix,
+        train_y,
+        early_stopping_rounds=100,
+        eval_set=eval_set,
+        eval_metric=metric,
+        verbose=False)
+    logger.info("model of quantile %s stopped after %s rounds", quantile, model.best_ntree_limit)
+    log_metric_time(eval_metric, timer, time.perf_counter() - start)
+    return model
+
+
+# pylint: disable=too-many-locals,too-many-arguments
+def xgb_interval_train_and_predict(column_to_predict, train_data, evaluation_data, confidence_interval, data_path,
+                                   quantiles=None, n_threads=None, eval_metric="numpy", plot=True):
+    """
+    train xgboost models on column_to_predict from train_data
     and generates predictions for evaluation_data which are stored in a column named `output`
     data_path specify path to data in order to compute external features
-    Note: here, the model does not directly learn from column to_predict but from the bound of a confidence_interval
+    Note: here, the models do not directly learn from column to_predict but from quantiles of it,
+    the bounds of a confidence_interval or the list `quantiles` if providen
     see here for more details: https://towardsdatascience.com/confidence-intervals-for-xgboost-cac2955a8fde
-
+    predictions of each quantile are stored in a column (see quantile_column), the lowest and highest ones
+    in `pred_lower_bound` and `pred_upper_bound`, and `output` is the maximum of all of them
+    models are trained concurrently using at most n_threads threads (all cpus if None)
+    eval_metric is the metric used for early stopping, see metrics.EVAL_METRICS
+    the training curves of the last model are saved in output/figs if plot is True
+    returns evaluation_data, the features importance and the trained models as {quantile_column(quantile): model}
     """
-    features = [
-        "site_id",
-        "secteur_cat",
-        "week",
-        "wednesday",  # this feature is only used if the dedicated parameter include_wednesday is set to True
-        "non_working_in",
-        "holidays_in",
-        "effectif",
-        "frequentation_prevue",
-        "Events.RAMADAN_ago",  # "Events.AID_ago"
-    ]
+    quantiles = interval_quantiles(confidence_interval, quantiles)
 
     logger.info("----------- check training data -------------")
-    for resolution, dtf in train_data.groupby(['cantine_nom', 'cantine_type']):
+    for resolution, dtf in train_data.groupby(['cantine_nom', 'cantine_type'], observed=True):
         logger.info("canteen %s has %s days of history to train on starting on %s and ending on %s",
                     resolution,
                     len(dtf),
@@ -46,9 +150,7 @@ def xgb_interval_train_and_predict(column_to_predict, train_data, evaluation_dat
                     dtf['date_str'].max(),
                     )
 
-    with open(os.path.join(data_path, "calculators/menus.json")) as f_in:
-        dict_special_dishes = json.load(f_in)
-    features = features + list(dict_special_dishes.keys())
+    features = xgb_interval_features(data_path)
 
     # prepare training dataset
     train_data_reduced = train_data[features + [column_to_predict]]
@@ -64,56 +166,36 @@ def xgb_interval_train_and_predict(column_to_predict, train_data, evaluation_dat
         raise EmptyTrainingSet("")
     # prepare test_dataset to control overfitting
     train_data_x, train_data_y, test_data_x, test_data_y = ratio_split(train_data_x, train_data_y, 0.1)
-    eval_set = [(train_data_x, train_data_y), (test_data_x, test_data_y)]
+
+    # matrices are prepared once and shared by all models,
+    # each model still builds its own xgboost DMatrix as they are not meant to be used by concurrent trainings
+    train_matrix = train_data_x.values.astype(np.float64)
+    test_matrix = test_data_x.values.astype(np.float64)
+    eval_set = [(train_matrix, train_data_y.values), (test_matrix, test_data_y.values)]
 
     # prepare prediction dataset
     evaluation_data_x = evaluation_data[features]
+    evaluation_matrix = evaluation_data_x.values.astype(np.float64)
 
-    params = {
-        "n_jobs": mp.cpu_count(),
-        'base_score': train_data_y.mean(),
-        "objective": 'reg:squarederror',
-        "n_estimators": 5000,
-        "learning_rate": 0.09,
-        "max_depth": 5,
-        "booster": 'gbtree',
-        "importance_type": 'gain',
-        "max_delta_step": 0,
-        "min_child_weight": 1,
-        "random_state": 0,
-        "reg_alpha": 0,
-        "reg_lambda": 1,
-        "scale_pos_weight": 1,
-        "subsample": 1,
-        "verbosity": 0,
-    }
-
-    confidence_step = (1 - confidence_interval) / 2
-    # under predict
-    params.update({"objective": log_cosh_quantile(1 - confidence_step)})
-
-    confidence_upper_bound_model = XGBRegressor(**params)
-    confidence_upper_bound_model.fit(
-        train_data_x,
-        train_data_y,
-        early_stopping_rounds=100,
-        eval_set=eval_set,
-        eval_metric=multi_custom_metrics,
-        verbose=False)
-    y_upper_smooth = np.ceil(confidence_upper_bound_model.predict(evaluation_data_x))
+    nb_workers, n_jobs = thread_budget(len(quantiles), n_threads)
+    params = dict(PARAMS, n_jobs=n_jobs, base_score=train_data_y.mean())
 
-    # over predict
-    params.update({"objective": log_cosh_quantile(confidence_step)})
-    confidence_lower_bound_model = XGBRegressor(**params)
-    confidence_lower_bound_model.fit(train_data_x, train_data_y, verbose=False)
-    y_lower_smooth = np.ceil(confidence_lower_bound_model.predict(evaluation_data_x))
+    logger.info("training %s models on quantiles %s, %s at a time using %s threads each",
+                len(quantiles), quantiles, nb_workers, n_jobs)
+    with ThreadPoolExecutor(max_workers=nb_workers) as executor:
+        futures = [
+            executor.submit(
+                train_quantile_model, quantile, params, train_matrix, train_data_y.values, eval_set, eval_metric)
+            for quantile in quantiles]
+        models = [future.result() for future in futures]
 
-    evaluation_data['pred_lower_bound'] = y_lower_smooth
-    evaluation_data['pred_upper_bound'] = y_upper_smooth
-    evaluation_data['output'] = np.maximum.reduce([y_upper_smooth, y_lower_smooth])
+    evaluation_data = add_quantiles_predictions(
+        evaluation_data,
+        quantiles,
+        [model.predict(evaluation_matrix) for model in models])
 
     logger.info("----------- check predictions -------------")
-    for resolution, dtf in evaluation_data.groupby(['cantine_nom', 'cantine_type']):
+    for resolution, dtf in evaluation_data.groupby(['cantine_nom', 'cantine_type'], observed=True):
         logger.info("canteen %s has predictions for %s days starting on %s and ending on %s",
                     resolution,
                     len(dtf),
@@ -123,30 +205,34 @@ def xgb_interval_train_and_predict(column_to_predict, train_data, evaluation_dat
 
     logger.info("----------- evaluate model -------------")
 
-    feature_importance_list = evaluate_feature_importance(evaluation_data_x, confidence_upper_bound_model)
-    
+    feature_importance_list = evaluate_feature_importance(evaluation_data_x, models[-1])
+
     ## Generates errors on Windows with Reticulate
-    plot_curve(confidence_upper_bound_model.evals_result(), "nantes_metropole_xgb")
+    if plot:
+        plot_curve(models[-1].evals_result(), "nantes_metropole_xgb")
+
+    return evaluation_data, feature_importance_list, {
+        quantile_column(quantile): model for quantile, model in zip(quantiles, models)}
 
-    return evaluation_data, feature_importance_list
+
+# above this absolute error, the hessian 1 / cosh(error)**2 is approximated by 0 to avoid overflows of cosh
+HESSIAN_CLIP = 350
 
 
 def log_cosh_quantile(alpha):
     """
     log cosh quantile is a regularized quantile loss function
+    gradient and hessian are computed on the whole arrays of predictions at once
     """
     def _log_cosh_quantile(y_true, y_pred):
-        err = np.float64(y_pred - y_true)
-        err = np.where(err < 0, np.float64(alpha * err), np.float64((1 - alpha) * err))
+        err = np.asarray(y_pred, dtype=np.float64) - np.asarray(y_true, dtype=np.float64)
+        err = np.where(err < 0, alpha * err, (1 - alpha) * err)
 
         # approximate hessian when abs(error) becomes to big to avoid overflow
-        def _f_hess(error):
-            if abs(error) > 350:
-                return 0
-            return 1 / np.cosh(error)**2
-        v_hess = np.vectorize(_f_hess)
-        hess = v_hess(err)
-
-        grad = np.float64(np.tanh(err))
+        hess = np.zeros_like(err)
+        not_clipped = np.abs(err) <= HESSIAN_CLIP
+        hess[not_clipped] = 1 / np.cosh(err[not_clipped])**2
+
+        grad = np.tanh(err)
         return grad, hess
     return _log_cosh_quantile
@@ -2,31 +2,72 @@
 # -----------------------------------------------------------
 # Train a XGBoost model
 # -----------------------------------------------------------
-import json
-import math
 import multiprocessing as mp
-import os
+import time
 
 import numpy as np
 import pandas as pd
-from sklearn.metrics import mean_absolute_error, mean_squared_error
 from sklearn.model_selection import train_test_split
 from xgboost import XGBRegressor
 
+from app.algorithms.metrics import early_stopping_metric, log_metric_time
+from app.calculators import read_meals_dictionary
 from app.exceptions import EmptyTrainingSet
 from app.log import logger
 from app.plot import plot_curve
 
 
-def multi_custom_metrics(y_pred, dtrain):
+FEATURES = [
+    "site_id",
+    # "date_str",
+    # "cantine_nom",
+    # "site_type_cat",
+    "secteur_cat",
+    # "year",
+    # "month",
+    # "day",
+    "week",
+    "wednesday",  # this feature is only used if the dedicated parameter include_wednesday is set to True
+    # "weekday",  # weekday is not used here because redundant with meal composition
+    "holidays_in",
+    "non_working_in",
+    "effectif",
+    "frequentation_prevue",
+    "Events.RAMADAN_ago",  # "Events.AID_ago"
+]
+
+# hyperparameters of the model, base_score and n_jobs are set when training
+PARAMS = {
+    "objective": 'reg:squarederror',
+    "n_estimators": 5000,
+    "learning_rate": 0.09,
+    "max_depth": 5,
+    "booster": 'gbtree',
+    "colsample_bylevel": 1,
+    "colsample_bynode": 1,
+    "colsample_bytree": 1,
+    "gamma": 0,
+    "importance_type": 'gain',
+    "max_delta_step": 0,
+    "min_child_weight": 1,
+    "missing": None,
+    "nthread": None,
+    "random_state": 0,
+    "reg_alpha": 0,
+    "reg_lambda": 1,
+    "scale_pos_weight": 1,
+    "seed": None,
+    "subsample": 1,
+    "verbosity": 0,
+}
+
+
+def xgb_features(data_path):
     """
-    allow to optimize xgboost using multiple metrics for early stopping
+    returns the list of features used by the xgb model:
+    FEATURES and the meals categories of `data_path/calculators/menus.json`
     """
-    y_true = dtrain.get_label()
-    mae = mean_absolute_error(y_true, y_pred)
-    rmse = math.sqrt(mean_squared_error(y_true, y_pred))
-
-    return [("mae", mae), ("mse", rmse)]
+    return FEATURES + list(read_meals_dictionary(data_path).keys())
 
 
 def ratio_split(x_data, y_data, test_percent):
@@ -46,14 +87,20 @@ def ratio_split(x_data, y_data, test_percent):
 
 
 # pylint: disable=too-many-locals
-def xgb_train_and_predict(column_to_predict, train_data, evaluation_data, data_path):
+def xgb_train_and_predict(column_to_predict, train_data, evaluation_data, data_path, eval_metric="numpy",
+                          n_threads=None, hyperparameters=None, plot=True):
     """
     train a xgboost model on column_to_predict from train_data
     and generates predictions for evaluation_data which are stored in a column named `output`
     data_path specify path to data in order to compute external features
+    eval_metric is the metric used for early stopping, see metrics.EVAL_METRICS
+    the model is trained using n_threads threads (all cpus if None)
+    hyperparameters overrides the ones of PARAMS, e.g. the ones found by xgb_search.search_hyperparameters
+    the training curves are saved in output/figs if plot is True
+    returns evaluation_data, the features importance and the trained model as {"model": model}
     """
     logger.info("----------- check training data -------------")
-    for resolution, dtf in train_data.groupby(['cantine_nom', 'cantine_type']):
+    for resolution, dtf in train_data.groupby(['cantine_nom', 'cantine_type'], observed=True):
         logger.info("canteen %s has %s days of history to train on starting on %s and ending on %s",
                     resolution,
                     len(dtf),
@@ -61,28 +108,7 @@ def xgb_train_and_predict(column_to_predict, train_data, evaluation_data, data_p
                     dtf['date_str'].max(),
                     )
 
-    features = [
-        "site_id",
-        # "date_str",
-        # "cantine_nom",
-        # "site_type_cat",
-        "secteur_cat",
-        # "year",
-        # "month",
-        # "day",
-        "week",
-        "wednesday",  # this feature is only used if the dedicated parameter include_wednesday is set to True
-        # "weekday",  # weekday is not used here because redundant with meal composition
-        "holidays_in",
-        "non_working_in",
-        "effectif",
-        "frequentation_prevue",
-        "Events.RAMADAN_ago",  # "Events.AID_ago"
-    ]
-
-    with open(os.path.join(data_path, "calculators/menus.json")) as f_in:
-        dict_special_dishes = json.load(f_in)
-    features = features + list(dict_special_dishes.keys())
+    features = xgb_features(data_path)
 
     # prepare training dataset
     train_data_reduced = train_data[features + [column_to_predict]]
@@ -103,46 +129,25 @@ def xgb_train_and_predict(column_to_predict, train_data, evaluation_data, data_p
     # prepare prediction dataset
     evaluation_data_x = evaluation_data[features]
 
-    params = {
-        'base_score': train_data_y.mean(),
-        "objective": 'reg:squarederror',
-        "n_estimators": 5000,
-        "learning_rate": 0.09,
-        "max_depth": 5,
-        "booster": 'gbtree',
-        "colsample_bylevel": 1,
-        "colsample_bynode": 1,
-        "colsample_bytree": 1,
-        "gamma": 0,
-        "importance_type": 'gain',
-        "max_delta_step": 0,
-        "min_child_weight": 1,
-        "missing": None,
-        "n_jobs": mp.cpu_count(),
-        "nthread": None,
-        "random_state": 0,
-        "reg_alpha": 0,
-        "reg_lambda": 1,
-        "scale_pos_weight": 1,
-        "seed": None,
-        "subsample": 1,
-        "verbosity": 0,
-    }
+    params = dict(PARAMS, **(hyperparameters or {}), base_score=train_data_y.mean(), n_jobs=n_threads or mp.cpu_count())
     # define model
     model = XGBRegressor(**params)
     # train model
+    metric, timer = early_stopping_metric(eval_metric)
+    start = time.perf_counter()
     model.fit(
         train_data_x,
         train_data_y,
         early_stopping_rounds=100,
         eval_set=eval_set,
-        eval_metric=multi_custom_metrics,
+        eval_metric=metric,
         verbose=False)
+    log_metric_time(eval_metric, timer, time.perf_counter() - start)
     # predict values
     evaluation_data['output'] = np.ceil(model.predict(evaluation_data_x))
 
     logger.info("----------- check predictions -------------")
-    for resolution, dtf in evaluation_data.groupby(['cantine_nom', 'cantine_type']):
+    for resolution, dtf in evaluation_data.groupby(['cantine_nom', 'cantine_type'], observed=True):
         logger.info("canteen %s has predictions for %s days starting on %s and ending on %s",
                     resolution,
                     len(dtf),
@@ -154,9 +159,10 @@ def xgb_train_and_predict(column_to_predict, train_data, evaluation_data, data_p
 
     feature_importance_list = evaluate_feature_importance(evaluation_data_x, model)
 
-    plot_curve(model.evals_result(), "nantes_metropole_xgb")
+    if plot:
+        plot_curve(model.evals_result(), "nantes_metropole_xgb")
 
-    return evaluation_data, feature_importance_list
+    return evaluation_data, feature_importance_list, {"model": model}
 
 
 def evaluate_feature_importance(evaluation_data_x, model):
@@ -0,0 +1,154 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------
+# Search the hyperparameters of the XGBoost model
+# -----------------------------------------------------------
+from concurrent.futures import ProcessPoolExecutor
+import json
+import math
+import multiprocessing as mp
+import os
+
+import numpy as np
+from xgboost import XGBRegressor
+
+from app.algorithms.xgb_model import PARAMS
+from app.exceptions import EmptyTrainingSet
+from app.log import logger
+
+
+HYPERPARAMETERS_FILE = "output/models/xgb_hyperparameters.json"
+SEARCH_METHODS = ["random", "halving"]
+
+# samplers of the searched hyperparameters, the other ones are the ones of PARAMS
+SEARCH_SPACE = {
+    "learning_rate": lambda rng: float(10 ** rng.uniform(-2, -0.5)),
+    "max_depth": lambda rng: int(rng.randint(3, 11)),
+    "min_child_weight": lambda rng: float(10 ** rng.uniform(0, 1.5)),
+    "subsample": lambda rng: float(rng.uniform(0.5, 1)),
+    "colsample_bytree": lambda rng: float(rng.uniform(0.5, 1)),
+    "gamma": lambda rng: float(rng.choice([0, 0.1, 1, 10])),
+    "reg_alpha": lambda rng: float(rng.choice([0, 0.1, 1, 10])),
+    "reg_lambda": lambda rng: float(10 ** rng.uniform(-1, 1)),
+}
+
+# validation split shared by the processes of the pool, see _init_worker
+_SPLIT = None
+
+
+def sample_candidates(nb_candidates, seed=0):
+    """
+    returns nb_candidates sets of hyperparameters drawn from SEARCH_SPACE,
+    the first one being the current hyperparameters of PARAMS
+    """
+    rng = np.random.RandomState(seed)
+    candidates = [{name: PARAMS[name] for name in SEARCH_SPACE}]
+    while len(candidates) < nb_candidates:
+        candidates.append({name: sampler(rng) for name, sampler in SEARCH_SPACE.items()})
+    return candidates
+
+
+def time_split(train_data, features, column_to_predict, validation_ratio=0.2, date_col="date_str"):
+    """
+    returns (train_x, train_y, validation_x, validation_y) float64 arrays such that validation lines
+    are the ones of the last validation_ratio of the dates of train_data, lines with nans are dropped
+    """
+    train_data = train_data[[date_col] + features + [column_to_predict]].dropna()
+    if len(train_data) == 0:
+        raise EmptyTrainingSet("no line without nan to search hyperparameters")
+    dates = np.sort(train_data[date_col].unique())
+    first_validation_date = dates[min(len(dates) - 1, int(len(dates) * (1 - validation_ratio)))]
+    validation = (train_data[date_col] >= first_validation_date).values
+    x_data = train_data[features].values.astype(np.float64)
+    y_data = train_data[column_to_predict].values.astype(np.float64)
+    logger.info("searching hyperparameters on %s lines, validating on %s lines from %s",
+                (~validation).sum(), validation.sum(), first_validation_date)
+    return x_data[~validation], y_data[~validation], x_data[validation], y_data[validation]
+
+
+def _init_worker(split):
+    global _SPLIT  # pylint: disable=global-statement
+    _SPLIT = split
+
+
+def evaluate_candidate(candidate, n_estimators, n_threads=1, early_stopping_rounds=50):
+    """
+    trains a model with the hyperparameters of candidate on the shared training split during at most n_estimators
+    rounds, stopped early when the validation rmse does not improve during early_stopping_rounds rounds
+    returns the best validation rmse and its number of trees
+    """
+    train_x, train_y, validation_x, validation_y = _SPLIT
+    params = dict(PARAMS, **candidate, n_estimators=n_estimators, base_score=train_y.mean(), n_jobs=n_threads)
+    model = XGBRegressor(**params)
+    model.fit(
+        train_x,
+        train_y,
+        eval_set=[(validation_x, validation_y)],
+        eval_metric="rmse",
+        early_stopping_rounds=early_stopping_rounds,
+        verbose=False)
+    return float(model.best_score), int(model.best_ntree_limit)
+
+
+# pylint: disable=too-many-arguments,too-many-locals
+def search_hyperparameters(split, candidates, method="halving", min_rounds=100, max_rounds=5000, eta=3,
+                           workers=None):
+    """
+    evaluates the hyperparameters candidates on the validation split (see time_split) in a pool of `workers`
+    processes (all cpus if None) sharing the cpus of the machine
+    - random: all candidates are trained during max_rounds rounds
+    - halving: all candidates are trained during min_rounds rounds, then the best 1/eta of them
+      during eta times more rounds, and so on until max_rounds rounds or a single candidate remain
+    returns the best candidate and the list of evaluations {candidate, n_estimators, rmse, best_ntree_limit}
+    """
+    if method not in SEARCH_METHODS:
+        raise ValueError(f"Unrecognized search method '{method}', choose among {SEARCH_METHODS}")
+    workers = workers or mp.cpu_count()
+    n_threads = max(1, mp.cpu_count() // workers)
+    rounds = max_rounds if method == "random" else min(min_rounds, max_rounds)
+    remaining = list(range(len(candidates)))
+
+    evaluations = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(split,)) as executor:
+        while True:
+            logger.info("evaluating %s candidates during at most %s rounds in %s processes using %s threads each",
+                        len(remaining), rounds, workers, n_threads)
+            futures = [executor.submit(evaluate_candidate, candidates[index], rounds, n_threads)
+                       for index in remaining]
+            scores = {}
+            for index, future in zip(remaining, futures):
+                rmse, best_ntree_limit = future.result()
+                scores[index] = rmse
+                evaluations.append({"candidate": index, "n_estimators": rounds, "rmse": rmse,
+                                    "best_ntree_limit": best_ntree_limit})
+            remaining = sorted(remaining, key=lambda index: scores[index])
+            if len(remaining) == 1 or rounds >= max_rounds:
+                break
+            remaining = remaining[:math.ceil(len(remaining) / eta)]
+            rounds = min(rounds * eta, max_rounds)
+
+    best = remaining[0]
+    logger.info("best candidate %s: %s with a validation rmse of %.2f", best, candidates[best], scores[best])
+    return candidates[best], evaluations
+
+
+def save_hyperparameters(hyperparameters, file_path=HYPERPARAMETERS_FILE, **details):
+    """
+    writes the hyperparameters found by search_hyperparameters and details on the search to file_path
+    """
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    with open(file_path + ".tmp", "w") as f_out:
+        json.dump(dict(details, hyperparameters=hyperparameters), f_out, indent=2, sort_keys=True)
+    os.replace(file_path + ".tmp", file_path)
+    logger.info("hyperparameters saved to %s", file_path)
+
+
+def load_hyperparameters(file_path=HYPERPARAMETERS_FILE):
+    """
+    returns the hyperparameters saved to file_path by save_hyperparameters
+    """
+    with open(file_path) as f_in:
+        hyperparameters = json.load(f_in)["hyperparameters"]
+    unknown = sorted(set(hyperparameters) - set(PARAMS))
+    if unknown:
+        raise ValueError(f"Unrecognized hyperparameters {unknown} in {file_path}")
+    return hyperparameters
@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------
+# Save and load trained models to predict without training
+# -----------------------------------------------------------
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from xgboost import Booster
+
+from app.algorithms.xgb_hist import feature_matrix
+from app.exceptions import MissingDataForPrediction, MissingModelArtifacts
+from app.log import logger
+
+
+MODELS_DIR = "output/models"
+METADATA_FILE = "metadata.json"
+CAFETERIAS_FILE = "cafeterias.csv"
+
+
+def artifacts_dir(training_type, column_to_predict):
+    """
+    returns the folder where the models trained with `training_type` on `column_to_predict` are saved
+    """
+    return os.path.join(MODELS_DIR, f"{training_type}_{column_to_predict}")
+
+
+def save_artifacts(directory, models, metadata, dictionary_path=None):
+    """
+    saves in directory:
+    - the boosters of `models` {name: fitted XGBRegressor or Booster} and the number of trees to use to predict,
+      as json files: the binary format cannot save the categorical splits of xgb_hist models
+    - metadata: a dict describing the models, e.g. the list of their features
+    - a copy of the dictionary of cafeterias stored at dictionary_path if any
+    """
+    os.makedirs(directory, exist_ok=True)
+    metadata = dict(metadata, models={})
+    for name, model in models.items():
+        file_name = f"{name}.json"
+        booster = model.get_booster() if hasattr(model, "get_booster") else model
+        booster.save_model(os.path.join(directory, file_name))
+        metadata["models"][name] = {"file": file_name, "ntree_limit": int(getattr(model, "best_ntree_limit", 0))}
+
+    if dictionary_path is not None and os.path.exists(dictionary_path):
+        shutil.copyfile(dictionary_path, os.path.join(directory, CAFETERIAS_FILE))
+
+    metadata_path = os.path.join(directory, METADATA_FILE)
+    with open(metadata_path + ".tmp", "w") as f_out:
+        json.dump(metadata, f_out, indent=2, sort_keys=True)
+    os.replace(metadata_path + ".tmp", metadata_path)
+    logger.info("models saved to %s", directory)
+
+
+def load_artifacts(directory):
+    """
+    returns the metadata, the boosters {name: Booster} and the dictionary of cafeterias (None if not saved)
+    saved in directory by save_artifacts
+    """
+    metadata_path = os.path.join(directory, METADATA_FILE)
+    if not os.path.exists(metadata_path):
+        raise MissingModelArtifacts(f"in {directory}")
+    with open(metadata_path) as f_in:
+        metadata = json.load(f_in)
+
+    boosters = {}
+    for name, model in metadata["models"].items():
+        boosters[name] = Booster(model_file=os.path.join(directory, model["file"]))
+
+    dictionary = None
+    if os.path.exists(os.path.join(directory, CAFETERIAS_FILE)):
+        dictionary = pd.read_csv(os.path.join(directory, CAFETERIAS_FILE), keep_default_na=False,
+                                 dtype={"cafeteria_id": np.int32, "cantine_nom": str, "cantine_type": str})
+    return metadata, boosters, dictionary
+
+
+def predict_with_artifacts(metadata, boosters, dataset):
+    """
+    returns the predictions {name: array} of each booster on the features of dataset listed in metadata,
+    the categorical features listed in metadata being handled as the model has been trained with,
+    with the categories saved in metadata, see xgb_hist.feature_matrix
+    """
+    features = metadata["features"]
+    missing_features = [feature for feature in features if feature not in dataset.columns]
+    if missing_features:
+        raise MissingDataForPrediction(f"features {missing_features} used by the trained models are missing")
+
+    matrix = feature_matrix(dataset, features, metadata.get("categorical_features", []),
+                            categories=metadata.get("categories"))
+    return {
+        name: booster.predict(matrix, ntree_limit=metadata["models"][name]["ntree_limit"])
+        for name, booster in boosters.items()}
@@ -0,0 +1,208 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------
+# Evaluate algorithms on many training and prediction periods
+# -----------------------------------------------------------
+from concurrent.futures import ProcessPoolExecutor
+import datetime
+import math
+import multiprocessing as mp
+import os
+
+import dateutil.relativedelta
+import numpy as np
+import pandas as pd
+
+import app.algorithms
+from app.encodings import day_numbers
+from app.exceptions import EmptyTrainingSet, InconsistentDates, MissingDataForPrediction
+from app.log import logger
+from app.preprocess import add_statistical_features, compute_aggregates, compute_min_max_date, tag_outliers
+from app.train import filter_data, precision_calculus, weighted_precision_calculus
+
+
+BACKTEST_DIR = "output/backtest"
+# columns of the dataset computed from the real values of all its dates, computed again for each split
+STATISTICS_COLUMNS = ["frequentation_prevue", "frequentation_reel", "upper_outlier", "lower_outlier"]
+
+# dataset and real values shared by the processes of the pool, see _init_worker
+_DATASET = None
+_INPUTS = None
+
+
+def backtest_splits(start_training_date, first_begin_date, last_begin_date, step_weeks=4, horizon_weeks=2,
+                    weeks_latencies=(10,), training_types=("xgb",), date_format="%Y-%m-%d"):
+    """
+    returns the list of splits {split, training_type, weeks_latency, min_date, max_date, begin_date, end_date}
+    of a rolling-origin backtest: prediction windows of horizon_weeks start every step_weeks
+    from first_begin_date to last_begin_date, each of them is evaluated for every weeks latency and training type
+    training sets start at start_training_date and end weeks_latency weeks before the window, see compute_min_max_date
+    windows of which the training set cannot be computed for a weeks latency are skipped
+    """
+    splits = []
+    begin = datetime.datetime.strptime(first_begin_date, date_format)
+    while begin <= datetime.datetime.strptime(last_begin_date, date_format):
+        end = begin + dateutil.relativedelta.relativedelta(weeks=horizon_weeks, days=-1)
+        begin_date, end_date = begin.strftime(date_format), end.strftime(date_format)
+        for weeks_latency in weeks_latencies:
+            try:
+                min_date, max_date = compute_min_max_date(
+                    start_training_date, begin_date, end_date, date_format, weeks_latency)
+            except InconsistentDates as error:
+                logger.warning("skipping window %s - %s with %s weeks latency: %s",
+                               begin_date, end_date, weeks_latency, error)
+                continue
+            for training_type in training_types:
+                splits.append({
+                    "split": len(splits),
+                    "training_type": training_type,
+                    "weeks_latency": weeks_latency,
+                    "min_date": min_date,
+                    "max_date": max_date,
+                    "begin_date": begin_date,
+                    "end_date": end_date,
+                })
+        begin += dateutil.relativedelta.relativedelta(weeks=step_weeks)
+    return splits
+
+
+def compute_metrics(y_true, y_pred):
+    """
+    returns the number of predictions, their mean absolute error, root mean squared error,
+    weighted precision and precision (see train.weighted_precision_calculus and train.precision_calculus)
+    """
+    errors = y_pred - y_true
+    return {
+        "nb_predictions": len(y_true),
+        "mae": np.abs(errors).mean(),
+        "rmse": math.sqrt((errors ** 2).mean()),
+        "weighted_precision": weighted_precision_calculus(y_true, y_pred),
+        "precision": precision_calculus(y_true, y_pred),
+    }
+
+
+def evaluate_split(split, preds, column_to_predict):
+    """
+    returns the metrics of the predictions `output` of preds for the split and for each cafeteria,
+    evaluated as train.finalize_predictions does: on working days of which column_to_predict is known
+    """
+    preds = preds.loc[(preds["working"] != 0) & (preds[column_to_predict] > 0)]
+    if len(preds) == 0:
+        raise MissingDataForPrediction(f"no value of {column_to_predict} to evaluate split {split['split']}")
+
+    by_split = dict(split, **compute_metrics(preds[column_to_predict], preds["output"]))
+    by_cafeteria = []
+    for (cantine_nom, cantine_type), dtf in preds.groupby(["cantine_nom", "cantine_type"], observed=True):
+        by_cafeteria.append(dict(split, cantine_nom=cantine_nom, cantine_type=cantine_type,
+                                 **compute_metrics(dtf[column_to_predict], dtf["output"])))
+    return by_split, by_cafeteria
+
+
+def split_statistics(lines, calendar, real_values, effectifs, max_date, date_format="%Y-%m-%d"):
+    """
+    returns lines with the statistical features and outliers tags of STATISTICS_COLUMNS computed as preprocessing
+    does (see preprocess.compute_aggregates) but from the real values up to max_date only, so that the lines
+    of a split do not depend on the real values of later prediction windows
+    - calendar: the `date_str`, `annee_scolaire` and `week` of the dates of the dataset
+    - real_values, effectifs: see preprocess.compute_datafiles_related_dataframes
+    """
+    calendar = calendar.loc[calendar["date_str"] <= max_date]
+    calendar = calendar.assign(day_number=day_numbers(calendar["date_str"], date_format))
+    stats, outliers = compute_aggregates(real_values, calendar, effectifs)
+    columns = list(lines.columns)
+    lines = lines.drop(columns=[col for col in STATISTICS_COLUMNS if col in columns])
+    lines = add_statistical_features(lines, ["cafeteria_id"], stats)
+    lines = tag_outliers(lines, "reel", 3, ["cafeteria_id"], outliers)
+    return lines[columns]
+
+
+def _init_worker(dataset, inputs):
+    global _DATASET, _INPUTS  # pylint: disable=global-statement
+    _DATASET = dataset
+    _INPUTS = inputs
+
+
+# pylint: disable=too-many-arguments
+def run_split(split, column_to_predict, remove_no_school, remove_outliers, data_path, confidence, n_threads=None):
+    """
+    trains the split's training type on the lines of the shared dataset between its min_date and max_date,
+    predicts the lines between its begin_date and end_date and returns their metrics, see evaluate_split
+    statistical features and outliers of those lines are computed from the real values up to max_date only,
+    see split_statistics
+    training curves are not plotted since concurrent splits would overwrite the same figures
+    """
+    dataset = _DATASET
+    in_training = (dataset["date_str"] >= split["min_date"]) & (dataset["date_str"] <= split["max_date"])
+    in_prediction = (dataset["date_str"] >= split["begin_date"]) & (dataset["date_str"] <= split["end_date"])
+    dataset = split_statistics(dataset.loc[in_training | in_prediction], *_INPUTS, split["max_date"])
+    train_data = dataset.loc[(dataset["date_str"] >= split["min_date"]) & (dataset["date_str"] <= split["max_date"])]
+    train_data = filter_data(train_data, remove_no_school, remove_outliers, split["begin_date"])
+    preds = dataset.loc[(dataset["date_str"] >= split["begin_date"]) & (dataset["date_str"] <= split["end_date"])]
+    if len(train_data) == 0:
+        raise EmptyTrainingSet(f"between {split['min_date']} and {split['max_date']}")
+    if len(preds) == 0:
+        raise MissingDataForPrediction(f"between {split['begin_date']} and {split['end_date']}")
+
+    preds = preds.copy()
+    if split["training_type"] == "xgb":
+        preds, _, _ = app.algorithms.xgb_train_and_predict(
+            column_to_predict, train_data, preds, data_path, n_threads=n_threads, plot=False)
+    elif split["training_type"] == "xgb_hist":
+        preds, _, _ = app.algorithms.xgb_hist_train_and_predict(
+            column_to_predict, train_data, preds, data_path, n_threads=n_threads, plot=False)
+    elif split["training_type"] == "xgb_interval":
+        preds, _, _ = app.algorithms.xgb_interval_train_and_predict(
+            column_to_predict, train_data, preds, confidence, data_path, n_threads=n_threads, plot=False)
+    else:
+        preds = app.algorithms.benchmark_train_and_predict(column_to_predict, train_data, preds)
+    preds.loc[preds["working"] == 0, "output"] = 0
+    preds["output"] = preds["output"].fillna(0)
+    return evaluate_split(split, preds, column_to_predict)
+
+
+# pylint: disable=too-many-arguments
+def run_backtest(splits, dataset, real_values, effectifs, column_to_predict, remove_no_school=True,
+                 remove_outliers=True, data_path="data", confidence=0.9, workers=None):
+    """
+    trains and evaluates each split on dataset in a pool of `workers` processes (all cpus if None)
+    sharing the cpus of the machine, splits which cannot be trained or evaluated are skipped
+    the statistical features of each split are computed from real_values and effectifs, see split_statistics
+    returns the metrics tables by split and by split and cafeteria
+    """
+    calendar = dataset[["date_str", "annee_scolaire", "week"]].drop_duplicates("date_str")
+    workers = workers or mp.cpu_count()
+    n_threads = max(1, mp.cpu_count() // workers)
+    logger.info("running %s splits in %s processes using %s threads each", len(splits), workers, n_threads)
+
+    by_split, by_cafeteria = [], []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(dataset, (calendar, real_values, effectifs))) as executor:
+        futures = [
+            executor.submit(run_split, split, column_to_predict, remove_no_school, remove_outliers, data_path,
+                            confidence, n_threads)
+            for split in splits]
+        for split, future in zip(splits, futures):
+            try:
+                split_metrics, cafeterias_metrics = future.result()
+            except (EmptyTrainingSet, MissingDataForPrediction) as error:
+                logger.info("skipping split %s: %s", split["split"], error)
+                continue
+            by_split.append(split_metrics)
+            by_cafeteria += cafeterias_metrics
+
+    if not by_split:
+        raise MissingDataForPrediction("no split could be evaluated")
+    return pd.DataFrame(by_split), pd.DataFrame(by_cafeteria)
+
+
+def write_backtest(by_split, by_cafeteria, column_to_predict, directory=BACKTEST_DIR):
+    """
+    writes the metrics tables by split and by cafeteria as csv files in directory, returns their paths
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name, metrics in [("by_split", by_split), ("by_cafeteria", by_cafeteria)]:
+        file_path = os.path.join(directory, f"backtest_{name}_{column_to_predict}.csv")
+        metrics.to_csv(file_path, index=False)
+        logger.info("backtest metrics exported to %s", file_path)
+        paths.append(file_path)
+    return paths
@@ -7,6 +7,10 @@ from .expand_dates import generate_dates_df
 from .holidays_in_ago import add_feature_holidays_in_ago
 from .non_working_days_in_ago import add_feature_non_working_days_in_ago
 from .school_year import add_feature_school_year
-from .process_menu import add_feature_special_meals
-from .events_countdown import add_feature_events_countdown
+from .process_menu import add_feature_special_meals, read_meals_dictionary
+from .events_countdown import add_feature_events_countdown, events_countdown_columns
 from .strikes import add_feature_strikes
+from .interval_join import interval_left_join
+from .countdown import countdown_ago, countdown_in, find_runs
+from .menu_classifier import classify_dishes, compile_menu_categories
+from .runner import Calculator, calculators_levels, run_calculators
@@ -0,0 +1,56 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------
+# Countdown primitives shared by the calendar calculators
+# -----------------------------------------------------------
+import numpy as np
+
+
+def find_runs(mask):
+    """
+    given a boolean array mask, returns two arrays with the positions of
+    the first and the last element of every run of consecutive True values
+    """
+    padded = np.concatenate([[False], np.asarray(mask, dtype=bool), [False]])
+    changes = np.diff(padded.astype(np.int8))
+    run_starts = np.where(changes == 1)[0]
+    run_ends = np.where(changes == -1)[0] - 1
+    return run_starts, run_ends
+
+
+def countdown_in(positions, events, strict=True, default=0):
+    """
+    given an array of positions and an array of events positions (both as integers e.g. day numbers)
+    compute for each position the distance until the next event:
+    - strictly after the position if strict is True, else the event may be the position itself
+    - default when there is no such event
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    events = np.sort(np.asarray(events, dtype=np.int64))
+    next_index = np.searchsorted(events, positions, side="right" if strict else "left")
+    found = next_index < len(events)
+    countdown = np.full(len(positions), default, dtype=np.int64)
+    countdown[found] = events[next_index[found]] - positions[found]
+    return countdown
+
+
+def countdown_ago(positions, events, strict=True, default=0):
+    """
+    given an array of positions and an array of events positions (both as integers e.g. day numbers)
+    compute for each position the distance since the previous event:
+    - strictly before the position if strict is True, else the event may be the position itself
+    - default when there is no such event
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    events = np.sort(np.asarray(events, dtype=np.int64))
+    previous_index = np.searchsorted(events, positions, side="left" if strict else "right") - 1
+    found = previous_index >= 0
+    countdown = np.full(len(positions), default, dtype=np.int64)
+    countdown[found] = positions[found] - events[previous_index[found]]
+    return countdown
+
+
+def to_day_numbers(dates):
+    """
+    given dates (datetime-like array or list of datetime.date), returns the number of days since epoch as integers
+    """
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
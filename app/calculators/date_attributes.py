@@ -4,49 +4,60 @@
 # -----------------------------------------------------------
 import datetime
 
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype as is_datetime, is_float_dtype, is_object_dtype
 
-# pylint: disable=too-many-return-statements
-def _calc_date_attribute(dte, attribute, date_format):
+
+DATE_ATTRIBUTES = {
+    "year": lambda dates: dates.year,
+    "month": lambda dates: dates.month,
+    "day": lambda dates: dates.day,
+    "weekday": lambda dates: dates.weekday,
+    "week": lambda dates: dates.isocalendar().week,
+}
+
+
+def _parse_dates(dates, date_format):
     """
-    Extract date attributes from date (year, month, day, week, and/or weekday) given a format
+    Parse once a series of dates given as strings or datetimes using date_format
+    and returns them as a DatetimeIndex, raises a ValueError for invalid dates or format
     """
-
-    if not dte or isinstance(dte, float):
-        raise ValueError(f"Invalid date: '{dte}'")
     try:
         datetime.datetime.now().strftime(date_format)
     except ValueError:
         raise ValueError(f"Invalid format: '{date_format}'") from None
 
-    if isinstance(dte, str):
-        dte = datetime.datetime.strptime(dte, date_format)
+    if is_float_dtype(dates) and len(dates):
+        raise ValueError(f"Invalid date: '{dates.iloc[0]}'")
+    invalid = dates.isnull()
+    if is_object_dtype(dates):
+        invalid = invalid | (dates == "")
+    if invalid.any():
+        raise ValueError(f"Invalid date: '{dates[invalid].iloc[0]}'")
 
-    if dte.year < 2000:
-        raise ValueError(f"Incoherent date: '{dte}'", )
+    if not is_datetime(dates):
+        # numbers are parsed as timestamps close to epoch and then rejected as incoherent dates
+        dates = pd.to_datetime(dates, format=date_format)
 
-    if attribute == "month":
-        return dte.month
-    if attribute == "day":
-        return dte.day
-    if attribute == "weekday":
-        return dte.weekday()
-    if attribute == "week":
-        return dte.isocalendar()[1]
-    if attribute == "year":
-        return dte.year
-
-    raise ValueError(f"Unrecognized attribute '{attribute}'")
+    dates = pd.DatetimeIndex(dates)
+    if (dates.year < 2000).any():
+        raise ValueError(f"Incoherent date: '{dates[dates.year < 2000][0]}'", )
+    return dates
 
 
 def add_feature_date_attributes(dtf, date_col, attributes_list, date_format):
     """
     Given a dataframe dtf, a date column date_col and it's date format date_format
     extract date attributes (attributes_list) from date_col (within year, month, day, week, and/or weekday)
+    date_col is parsed only once and all attributes are computed on the whole column at once
     """
     for attribute in attributes_list:
-        # pylint: disable=cell-var-from-loop
-        def _calculator(row):
-            return _calc_date_attribute(row[date_col], attribute, date_format)
-        dtf[attribute] = dtf[[date_col]].apply(_calculator, axis=1)
+        if attribute not in DATE_ATTRIBUTES:
+            raise ValueError(f"Unrecognized attribute '{attribute}'")
+
+    dates = _parse_dates(dtf[date_col], date_format)
+    for attribute in attributes_list:
+        dtf[attribute] = np.asarray(DATE_ATTRIBUTES[attribute](dates), dtype=np.int64)
 
     return dtf
@@ -5,12 +5,15 @@
 import calendar
 import datetime
 from enum import Enum
+import functools
 import dateutil
 import lunardate
 import convertdate
 import pandas as pd
 from pandas.api.types import is_datetime64_any_dtype as is_datetime
 
+from app.calculators.countdown import countdown_ago, countdown_in, to_day_numbers
+
 
 class Events(Enum):
     """
@@ -48,41 +51,50 @@ def compute_first_weekday_of_a_month(year, month, weekday):
     return datetime.date(year, month, first_day)
 
 
-def compute_events_dates(years):
+@functools.lru_cache(maxsize=None)
+def compute_ramadan_date(year):
+    """
+    given a gregorian year, returns the first day of the ramadan of the islamic year starting in this year
+    """
+    islamic_year = convertdate.islamic.from_gregorian(year, 1, 1)[0]
+    return datetime.date(*convertdate.islamic.to_gregorian(islamic_year, 9, 1))
+
+
+@functools.lru_cache(maxsize=None)
+def compute_event_date(event, year):
+    """
+    given an event and a year, returns the date of this event during this year
+    dates are memoized by (event, year) since lunar calendars conversions are costly
+    """
+    if event == Events.EPIPHANIE:
+        return datetime.date(year, 1, 6)
+    if event == Events.CHANDELEUR:
+        return datetime.date(year, 2, 2)
+    if event == Events.MARDI_GRAS:
+        return dateutil.easter.easter(year, 3) - datetime.timedelta(days=47)
+    if event == Events.HALLOWEEN:
+        return datetime.date(year, 10, 31)
+    if event == Events.RAMADAN:
+        return compute_ramadan_date(year)
+    if event == Events.AID:
+        return compute_ramadan_date(year) + datetime.timedelta(days=30)
+    if event == Events.NOUVEL_AN_CHINOIS:
+        return lunardate.LunarDate(year, 1, 1, 0).toSolarDate()
+
+    raise ValueError(f"Unrecognized event '{event}'")
+
+
+def compute_events_dates(years, events=None):
     """
     For a given list of years compute a dict of events with a list of dates for each event
+    events can be restricted to a list of Events, all Events are used by default
     """
+    if events is None:
+        events = list(Events)
 
     events_dates_by_event = {}
-    for event in Events:
-        events_dates_by_event[event] = []
-
-    for year in years:
-        # epiphanie
-        events_dates_by_event[Events.EPIPHANIE].append(datetime.date(year, 1, 6))
-        # chandeleur
-        events_dates_by_event[Events.CHANDELEUR].append(datetime.date(year, 2, 2))
-        # date_easter = easter(year)
-        date_easter = dateutil.easter.easter(year, 3)
-        # mardi_gras 
-        events_dates_by_event[Events.MARDI_GRAS].append(date_easter - datetime.timedelta(days=47))
-
-        # Halloween : 31/10
-        events_dates_by_event[Events.HALLOWEEN].append(datetime.date(year, 10, 31))
-
-        # Ramadan
-        islamic_year = convertdate.islamic.from_gregorian(year, 1, 1)[0]
-        ramadan = datetime.datetime(
-            convertdate.islamic.to_gregorian(islamic_year, 9, 1)[0],
-            convertdate.islamic.to_gregorian(islamic_year, 9, 1)[1],
-            convertdate.islamic.to_gregorian(islamic_year, 9, 1)[2],
-        )
-        events_dates_by_event[Events.RAMADAN].append(ramadan.date())
-        # aid
-        events_dates_by_event[Events.AID].append((ramadan + datetime.timedelta(days=30)).date())
-        
-        # chinese new year
-        events_dates_by_event[Events.NOUVEL_AN_CHINOIS].append(lunardate.LunarDate(year, 1, 1, 0).toSolarDate())
+    for event in events:
+        events_dates_by_event[event] = [compute_event_date(event, year) for year in years]
 
     return events_dates_by_event
 
@@ -115,8 +127,17 @@ def add_countdown_in(date, event, events_dates_per_event):
     return min(countdown)
 
 
+def events_countdown_columns(events=None):
+    """
+    returns the names of the countdown columns generated for a list of Events (all Events by default)
+    """
+    if events is None:
+        events = list(Events)
+    return [str(event) + suffix for event in events for suffix in ["_in", "_ago"]]
+
+
 # pylint: disable=W0613
-def add_feature_events_countdown(dtf, date_col, date_format):
+def add_feature_events_countdown(dtf, date_col, date_format, columns=None):
     """
     Given a dataframe dtf, a date_col and its format date_format generate two cols:
     - number of days before next event occurence
@@ -129,7 +150,15 @@ def add_feature_events_countdown(dtf, date_col, date_format):
     - nouvel_an_chinois
     - aid
     - ramadan
+    columns can restrict the generated columns to a list of names e.g. ["Events.RAMADAN_ago"]
     """
+    all_columns = events_countdown_columns()
+    if columns is None:
+        columns = all_columns
+    unknown_columns = [col for col in columns if col not in all_columns]
+    if unknown_columns:
+        raise ValueError(f"Unrecognized events countdown columns {unknown_columns}")
+
     col_retyped = False
     if not is_datetime(dtf[date_col]):
         new_date_col = f'{date_col}_retyped'
@@ -138,15 +167,16 @@ def add_feature_events_countdown(dtf, date_col, date_format):
         col_retyped = True
 
     years = range(dtf[date_col].min().year - 2, dtf[date_col].max().year + 2)
-    events_dates = compute_events_dates(years)
-
-    for event in Events:
-        dtf[str(event) + "_in"] = dtf.apply(
-            lambda row, evt=event: add_countdown_ago(row[date_col].date(), evt, events_dates),
-            axis=1)
-        dtf[str(event) + "_ago"] = dtf.apply(
-            lambda row, evt=event: add_countdown_in(row[date_col].date(), evt, events_dates),
-            axis=1)
+    events = [event for event in Events if set(events_countdown_columns([event])).intersection(columns)]
+    events_dates = compute_events_dates(years, events)
+
+    days = to_day_numbers(dtf[date_col])
+    for event in events:
+        event_days = to_day_numbers(events_dates[event])
+        if str(event) + "_in" in columns:
+            dtf[str(event) + "_in"] = countdown_ago(days, event_days, strict=False)
+        if str(event) + "_ago" in columns:
+            dtf[str(event) + "_ago"] = countdown_in(days, event_days, strict=False)
     if col_retyped:
         dtf.drop(date_col, inplace=True, axis=1)
 
@@ -5,6 +5,9 @@
 import pandas as pd
 import numpy as np
 
+from app.calculators.countdown import countdown_ago, countdown_in, find_runs
+from app.calculators.interval_join import interval_left_join
+
 
 # pylint: disable=too-many-locals
 def add_feature_holidays_in_ago(dataset, date_col, date_format, data_path):
@@ -32,48 +35,17 @@ def add_feature_holidays_in_ago(dataset, date_col, date_format, data_path):
     fr_holidays = fr_holidays[["vacances_nom", "date_debut", "date_fin", "zone", "vacances"]]
     fr_holidays = fr_holidays.drop_duplicates()
 
-    # simulate an interval based left join using pandas
-    # 1/ perform a cross join using const __magic_key
-    up_bound = "date_fin"
-    low_bound = "date_debut"
+    # interval based left join: low_bound <= key <= up_bound
     key = "date"
-    dtf = all_dates
-    additional_data = fr_holidays
-
-    dtf['__magic_key'] = 1
-    additional_data['__magic_key'] = 1
-    crossjoindf = pd.merge(dtf, additional_data, on=['__magic_key'])
-    dtf.drop(columns=['__magic_key'], inplace=True)
-    crossjoindf.drop(columns=['__magic_key'], inplace=True)
-    # 2/ filter this cross join using lower_bound <= key <= upper_bound
-    conditionnal_join_df = crossjoindf[
-        (crossjoindf[key] >= crossjoindf[low_bound]) & (crossjoindf[key] <= crossjoindf[up_bound])]
-    # 3/ merge this conditionnal join on the original DF uing all cols as keys to simulate left join
-    dtf_columns = dtf.columns.values.tolist()
-    conditionnal_join_df.set_index(dtf_columns, inplace=True)
-    dtf = dtf.merge(conditionnal_join_df, left_on=dtf_columns, right_index=True, how='left')
-    # find rows index corresponding to holidays
-    holidays_index = np.where(~dtf['vacances_nom'].isnull())[0]
-
-    # compute arrays of first day of holiday and last day of holidays
-    holidays_min_index = []
-    holidays_max_index = []
-    i = 0
-    while i < len(holidays_index):
-        j = 0
-        while i + j < len(holidays_index) and (holidays_index[i] + j) == holidays_index[i + j]:
-            j += 1
-        holidays_min_index.append(holidays_index[i])
-        holidays_max_index.append(holidays_index[i + j - 1])
-        i += j
+    dtf = interval_left_join(all_dates, key, fr_holidays, "date_debut", "date_fin")
+    # compute first and last rows index of each period of consecutive holiday days
+    holidays_min_index, holidays_max_index = find_runs(~dtf['vacances_nom'].isnull())
 
-    indexes = range(0, len(dtf))
+    indexes = np.arange(0, len(dtf))
     # compute for each index row the distance with the nearest upcoming holidays
-    index_holidays_in = [min([i - x for i in holidays_min_index if i > x], default=0) for x in indexes]
-    dtf['holidays_in'] = index_holidays_in
+    dtf['holidays_in'] = countdown_in(indexes, holidays_min_index)
     # compute for each index row the distance with the latest past holidays
-    index_holidays_ago = [min([x - i for i in holidays_max_index if i < x], default=0) for x in indexes]
-    dtf['holidays_ago'] = index_holidays_ago
+    dtf['holidays_ago'] = countdown_ago(indexes, holidays_max_index)
 
     # set holidays_in and holidays_ago to 0 during effective holidays
     dtf.loc[~dtf['vacances_nom'].isnull(), 'holidays_in'] = 0
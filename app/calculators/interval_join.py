@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------
+# Interval based left join used by the calendar calculators
+# -----------------------------------------------------------
+import numpy as np
+import pandas as pd
+
+
+def interval_left_join(dtf, key, intervals, low_bound, up_bound):
+    """
+    given a dataframe dtf with a datetime column `key` and a dataframe `intervals` with datetime columns
+    `low_bound` and `up_bound`, returns the left join of dtf and intervals such that
+    low_bound <= key <= up_bound (bounds included, `low_bound` and `up_bound` may be the same column)
+
+    rows are ordered as a cross join filtered on the bounds and merged back on dtf would order them:
+    dtf order first, then intervals order when a key belongs to several intervals
+
+    intervals are sorted once on `low_bound` and matched with a binary search,
+    so that the cost grows as (len(dtf) + len(intervals)) * log(len(intervals)) instead of their product
+    """
+    intervals = intervals.reset_index(drop=True)
+    keys = dtf[key].values.astype("datetime64[ns]")
+    lows = intervals[low_bound].values.astype("datetime64[ns]")
+    ups = intervals[up_bound].values.astype("datetime64[ns]")
+
+    # sort intervals by lower bound, the longest interval bounds how far back a candidate may start
+    order = np.argsort(lows, kind="mergesort")
+    sorted_lows = lows[order]
+    sorted_ups = ups[order]
+    max_length = (ups - lows).max() if len(intervals) else np.timedelta64(0, "ns")
+
+    # candidates of each key are the intervals starting within [key - max_length, key]
+    first = np.searchsorted(sorted_lows, keys - max_length, side="left")
+    last = np.searchsorted(sorted_lows, keys, side="right")
+    nb_candidates = np.maximum(last - first, 0)
+
+    left_pos = np.repeat(np.arange(len(dtf)), nb_candidates)
+    offsets = np.arange(nb_candidates.sum()) - np.repeat(np.cumsum(nb_candidates) - nb_candidates, nb_candidates)
+    sorted_pos = np.repeat(first, nb_candidates) + offsets
+
+    # keep candidates whose upper bound is not exceeded
+    matched = sorted_ups[sorted_pos] >= keys[left_pos]
+    left_pos = left_pos[matched]
+    right_pos = order[sorted_pos[matched]]
+
+    # restore the order of a cross join and add unmatched keys as a left join does
+    unmatched = np.setdiff1d(np.arange(len(dtf)), left_pos, assume_unique=False)
+    left_pos = np.concatenate([left_pos, unmatched])
+    right_pos = np.concatenate([right_pos, np.full(len(unmatched), -1)])
+    sort_index = np.lexsort((right_pos, left_pos))
+    left_pos = left_pos[sort_index]
+    right_pos = right_pos[sort_index]
+
+    joined_left = dtf.iloc[left_pos].reset_index(drop=True)
+    right_columns = [col for col in intervals.columns if col not in joined_left.columns]
+    joined_right = intervals[right_columns].reindex(right_pos).reset_index(drop=True)
+    return pd.concat([joined_left, joined_right], axis=1)
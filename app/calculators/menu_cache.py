@@ -0,0 +1,131 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------
+# Persistent cache of meals features computed from menus files
+# -----------------------------------------------------------
+import glob
+import json
+import os
+
+import pandas as pd
+
+from app.calculators.menu_classifier import classify_dishes, compile_menu_categories
+from app.fingerprint import file_fingerprint, object_fingerprint
+from app.log import logger
+
+
+MANIFEST_FILE = "manifest.json"
+
+
+def terms_fingerprint(terms):
+    """
+    returns the sha256 hex digest of a list of terms of the dictionnary of meals
+    """
+    return object_fingerprint(terms)
+
+
+def _read_menus_file(file_path):
+    """
+    reads a menus csv file of which dates use the format "%d/%m/%Y"
+    """
+    menus = pd.read_csv(file_path)
+    menus['date'] = pd.to_datetime(menus['date'], format="%d/%m/%Y")
+    return menus
+
+
+def compute_menus_features(menus, dict_special_dishes):
+    """
+    given a dataframe of dishes `menus` and the dictionnary of meals,
+    returns a dataframe with one line per date flagging the categories served this day and `info_menu`
+    """
+    special_meals = classify_dishes(menus['plat'], compile_menu_categories(dict_special_dishes))
+    special_meals['info_menu'] = menus['plat'].fillna('').astype(bool)
+    special_meals['date'] = menus['date']
+    features = special_meals.groupby('date').any().astype(int).reset_index()
+    return features[['date', 'info_menu'] + list(dict_special_dishes.keys())]
+
+
+def _load_manifest(cache_dir):
+    """
+    returns the manifest of the menus cache: {file hash: {"file": file name, "categories": {category: terms hash}}}
+    """
+    manifest_path = os.path.join(cache_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as f_in:
+        return json.load(f_in)
+
+
+def _save_manifest(cache_dir, manifest):
+    """
+    writes the manifest of the menus cache
+    """
+    manifest_path = os.path.join(cache_dir, MANIFEST_FILE)
+    with open(manifest_path + ".tmp", "w") as f_out:
+        json.dump(manifest, f_out, indent=2, sort_keys=True)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def _load_or_compute_file_features(file_path, dict_special_dishes, cache_dir, manifest):
+    """
+    returns the menus features of a single menus file, using and updating the cache stored in cache_dir
+    only categories of which terms changed since the file was cached are recomputed
+    """
+    file_hash = file_fingerprint(file_path)
+    features_path = os.path.join(cache_dir, f"{file_hash}.csv")
+    categories_hash = {category: terms_fingerprint(terms) for category, terms in dict_special_dishes.items()}
+
+    cached_categories = manifest.get(file_hash, {}).get("categories", {})
+    features = None
+    if file_hash in manifest and os.path.exists(features_path):
+        features = pd.read_csv(features_path, parse_dates=['date'])
+
+    stale_categories = [
+        category for category, terms_hash in categories_hash.items()
+        if features is None or cached_categories.get(category) != terms_hash]
+    if stale_categories:
+        logger.info("computing menus features %s of %s", stale_categories, file_path)
+        stale_dishes = {category: dict_special_dishes[category] for category in stale_categories}
+        stale_features = compute_menus_features(_read_menus_file(file_path), stale_dishes)
+        if features is None:
+            features = stale_features
+        else:
+            features = features.drop(columns=stale_categories, errors='ignore')
+            features = features.merge(stale_features.drop(columns=['info_menu']), on='date', how='outer')
+
+    features = features[['date', 'info_menu'] + list(dict_special_dishes.keys())]
+    if stale_categories or set(cached_categories) != set(categories_hash):
+        features.to_csv(features_path, index=False, date_format="%Y-%m-%d")
+        manifest[file_hash] = {"file": os.path.basename(file_path), "categories": categories_hash}
+    return file_hash, features
+
+
+def load_menus_features(data_path, dict_special_dishes, cache_path=None):
+    """
+    returns the menus features (see compute_menus_features) of all files `data_path/raw/menus_*.csv`
+    when cache_path is provided, features are cached in `cache_path/menus` by file content and by
+    terms of each category of the dictionnary of meals, thus only new or changed files are parsed
+    """
+    menus_files = sorted(glob.glob(os.path.join(data_path, "raw", "menus_*.csv")))
+
+    if cache_path is None:
+        menus = pd.concat([_read_menus_file(file_path) for file_path in menus_files], ignore_index=True)
+        return compute_menus_features(menus, dict_special_dishes)
+
+    cache_dir = os.path.join(cache_path, "menus")
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = _load_manifest(cache_dir)
+
+    files_features = {}
+    for file_path in menus_files:
+        file_hash, features = _load_or_compute_file_features(file_path, dict_special_dishes, cache_dir, manifest)
+        files_features[file_hash] = features
+
+    # forget files which are not part of the menus anymore
+    for file_hash in set(manifest) - set(files_features):
+        manifest.pop(file_hash)
+        if os.path.exists(os.path.join(cache_dir, f"{file_hash}.csv")):
+            os.remove(os.path.join(cache_dir, f"{file_hash}.csv"))
+    _save_manifest(cache_dir, manifest)
+
+    features = pd.concat(list(files_features.values()), ignore_index=True)
+    return features.groupby('date').max().reset_index()
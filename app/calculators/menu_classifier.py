@@ -0,0 +1,61 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------
+# Compile the dictionnary of meals and classify dishes with it
+# -----------------------------------------------------------
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# chars which make a term of menus.json a regular expression,
+# `*`, `+` and `.` are frequent in dishes names thus they are not considered as regex markers
+REGEX_MARKERS = set("()[]{}|^$?\\")
+
+
+def is_regex(term):
+    """
+    given a term of the dictionnary of meals, returns True if it must be used as a regular expression:
+    it contains regex markers and is a valid regular expression
+    """
+    if not REGEX_MARKERS.intersection(term):
+        return False
+    try:
+        re.compile(term)
+    except re.error:
+        return False
+    return True
+
+
+def compile_menu_categories(dict_special_dishes):
+    """
+    given the dictionnary of meals {category: [terms]}, returns a dict {category: compiled pattern}
+    all literal terms of a category are merged in a single alternation
+    and terms detected as regular expressions are added as they are
+    """
+    compiled_categories = {}
+    for category, terms in dict_special_dishes.items():
+        literals = sorted({re.escape(term) for term in terms if not is_regex(term)}, key=len, reverse=True)
+        regexes = [f"(?:{term})" for term in terms if is_regex(term)]
+        alternatives = literals + regexes
+        # a category without terms never matches
+        compiled_categories[category] = re.compile("|".join(alternatives) if alternatives else r"(?!)")
+    return compiled_categories
+
+
+def classify_dishes(dishes, compiled_categories):
+    """
+    given a series of dishes and compiled categories (see compile_menu_categories)
+    returns a boolean DataFrame with one row per dish and one column per category
+    dishes are lowercased once and each distinct dish is classified only once
+    """
+    codes, unique_dishes = pd.factorize(dishes.str.lower())
+    unique_dishes = pd.Series(unique_dishes)
+
+    matrix = np.zeros((len(unique_dishes), len(compiled_categories)), dtype=bool)
+    for position, pattern in enumerate(compiled_categories.values()):
+        matrix[:, position] = unique_dishes.str.contains(pattern).values
+
+    # dishes missing in the input (code -1) do not belong to any category
+    matrix = np.vstack([matrix, np.zeros((1, len(compiled_categories)), dtype=bool)])
+    return pd.DataFrame(matrix[codes], index=dishes.index, columns=list(compiled_categories.keys()))
@@ -5,6 +5,9 @@
 import pandas as pd
 import numpy as np
 
+from app.calculators.countdown import countdown_ago, countdown_in, find_runs
+from app.calculators.interval_join import interval_left_join
+
 
 # pylint: disable=too-many-locals
 def add_feature_non_working_days_in_ago(dataset, date_col, date_format, data_path):
@@ -28,52 +31,19 @@ def add_feature_non_working_days_in_ago(dataset, date_col, date_format, data_pat
 
     fr_non_working = pd.read_csv(f'{data_path}/calculators/jours_feries.csv', parse_dates=['date'], date_parser=_parser)
     fr_non_working = fr_non_working[["date", "nom_jour_ferie"]]
-    # TODO FILTER THIS DATAFRAME TO IMPROVE PERFORMACE
 
-    # simulate an interval based left join using pandas
-    # 1/ perform a cross join using const __magic_key
-    low_bound = "date"
+    # left join on the non working days, seen as one day long intervals
     key = "_date"
-    dtf = all_dates
-    additional_data = fr_non_working
-
-    dtf['__magic_key'] = 1
-    additional_data['__magic_key'] = 1
-    # DO A SIMPLE JOIN TO IMPROVE PERFORMACE
-    crossjoindf = pd.merge(dtf, additional_data, on=['__magic_key'])
-    dtf.drop(columns=['__magic_key'], inplace=True)
-    crossjoindf.drop(columns=['__magic_key'], inplace=True)
-    # 2/ filter this cross join using lower_bound <= key <= upper_bound
-    conditionnal_join_df = crossjoindf[(crossjoindf[key] == crossjoindf[low_bound])]
-    # 3/ merge this conditionnal join on the original DF uing all cols as keys to simulate left join
-    dtf_columns = dtf.columns.values.tolist()
-    conditionnal_join_df.set_index(dtf_columns, inplace=True)
-    dtf = dtf.merge(conditionnal_join_df, left_on=dtf_columns, right_index=True, how='left')
-
-    # find rows index corresponding to non_working
-    non_working_index = np.where(~dtf['nom_jour_ferie'].isnull())[0]
+    dtf = interval_left_join(all_dates, key, fr_non_working, "date", "date")
 
-    # compute arrays of first day of holiday and last day of non_working
-    non_working_min_index = []
-    non_working_max_index = []
-    i = 0
-    while i < len(non_working_index):
-        j = 0
-        while i + j < len(non_working_index) and (non_working_index[i] + j) == non_working_index[i + j]:
-            j += 1
-        non_working_min_index.append(non_working_index[i])
-        non_working_max_index.append(non_working_index[i + j - 1])
-        i += j
-
-    indexes = range(0, len(dtf))
+    # compute first and last rows index of each period of consecutive non working days
+    non_working_min_index, non_working_max_index = find_runs(~dtf['nom_jour_ferie'].isnull())
 
+    indexes = np.arange(0, len(dtf))
     # compute for each index row the distance with the nearest upcoming non_working
-    index_non_working_in = [min([i - x for i in non_working_min_index if i > x], default=0) for x in indexes]
-    dtf['non_working_in'] = index_non_working_in
-
+    dtf['non_working_in'] = countdown_in(indexes, non_working_min_index)
     # compute for each index row the distance with the latest past non_working
-    index_non_working_ago = [min([x - i for i in non_working_max_index if i < x], default=0) for x in indexes]
-    dtf['non_working_ago'] = index_non_working_ago
+    dtf['non_working_ago'] = countdown_ago(indexes, non_working_max_index)
 
     # set non_working_in and non_working_ago to 0 during effective non_working
     dtf.loc[~dtf['nom_jour_ferie'].isnull(), 'non_working_in'] = 0
@@ -3,6 +3,8 @@
 # Calculator to add meals description features to a dataset
 # -----------------------------------------------------------
 from collections import Counter
+import copy
+import functools
 import json
 import os
 import re
@@ -10,6 +12,8 @@ import re
 import dask.dataframe as dd
 import pandas as pd
 
+from app.calculators.menu_cache import load_menus_features
+
 
 def delete_special_char(text):
     """
@@ -25,29 +29,40 @@ def _parser(date):
     return pd.datetime.strptime(date, "%d/%m/%Y")
 
 
-def add_feature_special_meals(all_dates, col_to_merge, date_format, data_path):
+@functools.lru_cache(maxsize=8)
+def _load_meals_dictionary(file_path, mtime_ns, size):
+    """
+    parses the dictionnary of meals file_path once per version of the file (mtime_ns and size)
+    """
+    with open(file_path) as f_in:
+        return json.load(f_in)
+
+
+def read_meals_dictionary(data_path):
+    """
+    returns the dictionnary of meals {category: [terms]} stored in `data_path/calculators/menus.json`
+    the file is only parsed again once modified, callers get their own copy
+    """
+    file_path = os.path.join(data_path, "calculators/menus.json")
+    stat = os.stat(file_path)
+    return copy.deepcopy(_load_meals_dictionary(os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size))
+
+
+def add_feature_special_meals(all_dates, col_to_merge, date_format, data_path, cache_path=None, meals_dictionary=None):
     """"
     given a dataframe with a date_col `col_to_merge` of format date_format and a date index
     add a new columns based on:
     - the menus csv files in data_path using the same date_format
     - the dictionnary of meals to identify providen through app/data/calculators/menus.json
+      (terms are matched litteraly unless they are regular expressions, see menu_classifier.is_regex)
+    when cache_path is provided, menus features are cached there, see menu_cache.load_menus_features
+    meals_dictionary is the dictionnary of meals if already read, see read_meals_dictionary
     """
-    menus = dd.read_csv(f"{data_path}/raw/menus_*.csv", parse_dates=['date'], date_parser=_parser)
-    menus = menus.compute()
-    menus[col_to_merge] = menus['date'].apply(lambda x: pd.datetime.strftime(x, date_format))
-
-    dict_special_dishes = {}
-    with open(os.path.join(data_path, "calculators/menus.json")) as f_in:
-        dict_special_dishes = json.load(f_in)
-
-    for spcial_menu, list_of_food in dict_special_dishes.items():
-        menus[spcial_menu] = menus['plat']
-        menus[spcial_menu] = menus[spcial_menu].apply(lambda plat: any(re.search(re.escape(word), plat.lower()) for word in list_of_food))
+    dict_special_dishes = meals_dictionary or read_meals_dictionary(data_path)
 
-    menus['info_menu'] = menus['plat']
-    menus['info_menu'] = menus['info_menu'].apply(lambda plat: 1 if plat else 0)
-    keys_of_interest = [col_to_merge] + ['info_menu'] + list(dict_special_dishes.keys())
-    menus_features = menus[keys_of_interest].groupby([col_to_merge]).any().astype(int).reset_index()
+    menus_features = load_menus_features(data_path, dict_special_dishes, cache_path)
+    menus_features[col_to_merge] = menus_features['date'].dt.strftime(date_format)
+    menus_features = menus_features.drop(columns=['date'])
 
     all_dates = all_dates.merge(menus_features, left_on=[col_to_merge], right_on=[col_to_merge], how='left')
 
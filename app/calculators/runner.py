@@ -0,0 +1,86 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------
+# Runner of calculators ordered by the columns they depend on
+# -----------------------------------------------------------
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing as mp
+
+import pandas as pd
+
+from app.exceptions import InvalidCalculators
+
+
+# a calculator adds the columns outputs to a dataframe with a date index and the columns inputs:
+# function(dataset) returns the dataset with the new columns, possibly with another index but in the same order
+Calculator = namedtuple("Calculator", ["name", "function", "inputs", "outputs"])
+
+
+def calculators_levels(calculators, columns):
+    """
+    given calculators and the columns of the dataframe of dates, returns the list of levels of calculators:
+    calculators of a level only depend on the columns and on the outputs of calculators of previous levels
+    raises InvalidCalculators if outputs overlap or if some inputs cannot be computed
+    """
+    names = [calculator.name for calculator in calculators]
+    if len(set(names)) != len(names):
+        raise InvalidCalculators(f"calculators names are not unique {names}")
+    known = set(columns)
+    for calculator in calculators:
+        overlapping = known.intersection(calculator.outputs)
+        if overlapping:
+            raise InvalidCalculators(f"{calculator.name} computes existing columns {sorted(overlapping)}")
+        known.update(calculator.outputs)
+
+    available = set(columns)
+    remaining = list(calculators)
+    levels = []
+    while remaining:
+        level = [calculator for calculator in remaining if available.issuperset(calculator.inputs)]
+        if not level:
+            missing = {calculator.name: sorted(set(calculator.inputs) - available) for calculator in remaining}
+            raise InvalidCalculators(f"inputs cannot be computed {missing}")
+        levels.append(level)
+        level_names = {calculator.name for calculator in level}
+        remaining = [calculator for calculator in remaining if calculator.name not in level_names]
+        for calculator in level:
+            available.update(calculator.outputs)
+    return levels
+
+
+def _run(calculator, dataset):
+    """
+    returns the dataframe of the outputs of calculator on dataset, with the index of dataset
+    """
+    result = calculator.function(dataset.copy())
+    if len(result) != len(dataset):
+        raise InvalidCalculators(f"{calculator.name} returned {len(result)} lines instead of {len(dataset)}")
+    features = result[list(calculator.outputs)]
+    features.index = dataset.index
+    return features
+
+
+def run_calculators(dates, calculators, workers=None, processes=False):
+    """
+    given a dataframe of dates with a date index and a list of calculators, returns dates with the outputs of all
+    calculators, in the order of the list of calculators
+    calculators which do not depend on each other run concurrently in a pool of workers threads,
+    or processes if processes is True (workers is the number of cpus if None), each one on the columns of dates
+    and the outputs of the calculators it depends on, then all outputs are joined on the date index once
+    """
+    levels = calculators_levels(calculators, dates.columns)
+    workers = min(workers or mp.cpu_count(), max(len(level) for level in levels)) if levels else 1
+    outputs = {}
+    executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        available = dates
+        for level in levels:
+            futures = {}
+            for calculator in level:
+                dependencies = [col for col in calculator.inputs if col not in dates.columns]
+                dataset = dates.join(available[dependencies]) if dependencies else dates
+                futures[calculator.name] = executor.submit(_run, calculator, dataset)
+            for name, future in futures.items():
+                outputs[name] = future.result()
+            available = pd.concat([available] + [outputs[calculator.name] for calculator in level], axis=1)
+    return pd.concat([dates] + [outputs[calculator.name] for calculator in calculators], axis=1)
@@ -4,6 +4,8 @@
 # -----------------------------------------------------------
 import pandas as pd
 
+from app.calculators.interval_join import interval_left_join
+
 
 # pylint: disable=too-many-locals
 def add_feature_school_year(dataset, date_col, date_format, data_path):
@@ -27,28 +29,9 @@ def add_feature_school_year(dataset, date_col, date_format, data_path):
     fr_holidays = fr_holidays[["annee_scolaire", "date_debut", "date_fin"]]
     fr_holidays = fr_holidays.drop_duplicates()
 
-    # simulate an interval based left join using pandas
-    # 1/ perform a cross join using const __magic_key
-    up_bound = "date_fin"
-    low_bound = "date_debut"
+    # interval based left join: low_bound <= key <= up_bound
     key = "date"
-    dtf = all_dates
-    additional_data = fr_holidays
-
-    dtf['__magic_key'] = 1
-    additional_data['__magic_key'] = 1
-    crossjoindf = pd.merge(dtf, additional_data, on=['__magic_key'])
-
-    dtf.drop(columns=['__magic_key'], inplace=True)
-    crossjoindf.drop(columns=['__magic_key'], inplace=True)
-    # 2/ filter this cross join using lower_bound <= key <= upper_bound
-    conditionnal_join_df = crossjoindf[
-        (crossjoindf[key] >= crossjoindf[low_bound]) & (crossjoindf[key] <= crossjoindf[up_bound])]
-
-    # 3/ merge this conditionnal join on the original DF uing all cols as keys to simulate left join
-    dtf_columns = dtf.columns.values.tolist()
-    conditionnal_join_df.set_index(dtf_columns, inplace=True)
-    dtf = dtf.merge(conditionnal_join_df, left_on=dtf_columns, right_index=True, how='left')
+    dtf = interval_left_join(all_dates, key, fr_holidays, "date_debut", "date_fin")
     dtf.set_index(key, inplace=True)
     cols_to_use = ['annee_scolaire']
     dataset = dataset.merge(dtf[cols_to_use], left_index=True, right_index=True, how='left')
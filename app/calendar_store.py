@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------
+# Persistent store of dates related features
+# -----------------------------------------------------------
+import glob
+import os
+
+import pandas as pd
+
+from app.fingerprint import files_fingerprint
+from app.log import logger
+
+
+# number of days recomputed on each side of the stored range when it is extended,
+# countdowns to holidays and non working days computed close to the bounds of a range
+# are only known once the next (or previous) period is part of the range
+OVERLAP_DAYS = 183
+
+
+def calendar_files(data_path):
+    """
+    returns the list of files the dates related features are computed from
+    """
+    files = [
+        os.path.join(data_path, "calculators", file_name)
+        for file_name in ["annees_scolaires.csv", "greves.csv", "jours_feries.csv", "vacances.csv", "menus.json"]]
+    return files + sorted(glob.glob(os.path.join(data_path, "raw", "menus_*.csv")))
+
+
+def _store_path(store_dir, fingerprint):
+    return os.path.join(store_dir, f"calendar_{fingerprint}.csv")
+
+
+def _read_store(store_dir, fingerprint, date_col, date_format):
+    """
+    returns the stored features and their dates, or (None, None) if nothing is stored for this fingerprint
+    """
+    store_path = _store_path(store_dir, fingerprint)
+    if not os.path.exists(store_path):
+        return None, None
+    features = pd.read_csv(store_path)
+    return features, pd.to_datetime(features[date_col], format=date_format)
+
+
+def _write_store(store_dir, fingerprint, features):
+    """
+    writes the features stored for this fingerprint and removes the ones stored for outdated fingerprints
+    """
+    store_path = _store_path(store_dir, fingerprint)
+    features.to_csv(store_path + ".tmp", index=False)
+    os.replace(store_path + ".tmp", store_path)
+    for outdated_path in glob.glob(os.path.join(store_dir, "calendar_*.csv")):
+        if outdated_path != store_path:
+            os.remove(outdated_path)
+
+
+def _extend(features, dates, first, last, compute_features, date_col, date_format, overlap):
+    """
+    extends the stored `features` (of which dates are `dates`) such that they cover [first, last]
+    the `overlap` days of the stored range closest to each new range are recomputed,
+    using `overlap` more days as context, so that countdowns match a computation over the whole range
+    """
+    stored_first, stored_last = dates.min(), dates.max()
+
+    if first < stored_first:
+        window_last = min(stored_first + 2 * overlap, stored_last)
+        cut = stored_first + overlap if window_last < stored_last else stored_last
+        logger.info("computing dates features from %s to %s", first.date(), window_last.date())
+        new_features = compute_features(first, window_last)
+        new_dates = pd.to_datetime(new_features[date_col], format=date_format)
+        features = pd.concat([new_features[new_dates <= cut], features[dates > cut]], ignore_index=True)
+        dates = pd.to_datetime(features[date_col], format=date_format)
+        stored_first = first
+
+    if last > stored_last:
+        window_first = max(stored_last - 2 * overlap, stored_first)
+        cut = stored_last - overlap if window_first > stored_first else stored_first
+        logger.info("computing dates features from %s to %s", window_first.date(), last.date())
+        new_features = compute_features(window_first, last)
+        new_dates = pd.to_datetime(new_features[date_col], format=date_format)
+        features = pd.concat([features[dates < cut], new_features[new_dates >= cut]], ignore_index=True)
+
+    return features
+
+
+def load_calendar_features(first, last, date_col, date_format, data_path, store_dir, compute_features,
+                           overlap_days=OVERLAP_DAYS):
+    """
+    returns the dates related features of every day between first and last (Timestamps, both included)
+    - compute_features(first, last) computes the features between two Timestamps, each row holding its date
+      in the column `date_col` formatted with `date_format`
+    - features are stored in `store_dir` and keyed by a fingerprint of the calculators files of data_path,
+      only the dates which are not stored yet are computed
+
+    Note that stored features are those of a computation over the whole stored range, every stored day
+    but the ones closest to its bounds having at least overlap_days days of context on each side:
+    only the days at least overlap_days away from first and last match a computation over [first, last],
+    see preprocess.compute_dates_dataframe which pads the dates it needs accordingly
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    fingerprint = files_fingerprint(calendar_files(data_path), {"date_format": date_format})
+    features, dates = _read_store(store_dir, fingerprint, date_col, date_format)
+
+    if features is None:
+        logger.info("computing dates features from %s to %s", first.date(), last.date())
+        features = compute_features(first, last)
+        _write_store(store_dir, fingerprint, features)
+    elif first < dates.min() or last > dates.max():
+        features = _extend(
+            features, dates, first, last, compute_features, date_col, date_format, pd.Timedelta(days=overlap_days))
+        _write_store(store_dir, fingerprint, features)
+
+    dates = pd.to_datetime(features[date_col], format=date_format)
+    return features[(dates >= first) & (dates <= last)].reset_index(drop=True)
@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------
+# Integer surrogate keys of dates and cafeterias
+# -----------------------------------------------------------
+import os
+
+import numpy as np
+import pandas as pd
+
+from app.calculators.countdown import to_day_numbers
+
+
+CAFETERIA_COLUMNS = ["cantine_nom", "cantine_type"]
+
+
+def day_numbers(dates, date_format):
+    """
+    given a series of dates formatted using date_format, returns the number of days since epoch as int32
+    invalid dates get -1 like unknown cafeterias (see encode_cafeterias)
+    """
+    dates = pd.to_datetime(dates, format=date_format, errors="coerce")
+    numbers = np.full(len(dates), -1, dtype=np.int32)
+    valid = np.asarray(dates.notnull())
+    numbers[valid] = to_day_numbers(dates[valid])
+    return numbers
+
+
+def day_strings(numbers, date_format):
+    """
+    given an array of numbers of days since epoch, returns the dates formatted using date_format
+    each distinct day is formatted only once
+    """
+    unique_numbers, positions = np.unique(np.asarray(numbers, dtype=np.int64), return_inverse=True)
+    return np.asarray(pd.to_datetime(unique_numbers, unit="D").strftime(date_format))[positions]
+
+
+def load_cafeterias_dictionary(cafeterias, dictionary_path=None):
+    """
+    given a dataframe of cafeterias (CAFETERIA_COLUMNS), returns the dictionary of cafeterias:
+    a dataframe with a column `cafeteria_id` (int32) and the CAFETERIA_COLUMNS
+    cafeterias stored in the dictionary file `dictionary_path` keep their id, new cafeterias
+    get the following ids by names order, then the dictionary file is updated
+    """
+    dictionary = pd.DataFrame({"cafeteria_id": np.array([], dtype=np.int32), "cantine_nom": [], "cantine_type": []})
+    if dictionary_path is not None and os.path.exists(dictionary_path):
+        dictionary = pd.read_csv(dictionary_path, dtype={"cafeteria_id": np.int32, "cantine_nom": str,
+                                                         "cantine_type": str}, keep_default_na=False)
+
+    new_cafeterias = cafeterias[CAFETERIA_COLUMNS].astype(str).drop_duplicates()
+    new_cafeterias = new_cafeterias[encode_cafeterias(new_cafeterias, dictionary) == -1]
+    if len(new_cafeterias):
+        new_cafeterias = new_cafeterias.sort_values(CAFETERIA_COLUMNS).reset_index(drop=True)
+        next_id = dictionary["cafeteria_id"].max() + 1 if len(dictionary) else 0
+        new_cafeterias.insert(0, "cafeteria_id", np.arange(next_id, next_id + len(new_cafeterias), dtype=np.int32))
+        dictionary = pd.concat([dictionary, new_cafeterias], ignore_index=True)
+        dictionary["cafeteria_id"] = dictionary["cafeteria_id"].astype(np.int32)
+        if dictionary_path is not None:
+            dictionary.to_csv(dictionary_path + ".tmp", index=False)
+            os.replace(dictionary_path + ".tmp", dictionary_path)
+    return dictionary
+
+
+def encode_cafeterias(dtf, dictionary):
+    """
+    returns the ids (int32) of the cafeterias (CAFETERIA_COLUMNS) of dtf in dictionary, -1 for unknown cafeterias
+    """
+    known = pd.MultiIndex.from_arrays([dictionary[col].astype(str) for col in CAFETERIA_COLUMNS])
+    positions = known.get_indexer(pd.MultiIndex.from_arrays([dtf[col].astype(str) for col in CAFETERIA_COLUMNS]))
+    # unknown cafeterias (position -1) get the last id: -1
+    ids = np.append(np.asarray(dictionary["cafeteria_id"], dtype=np.int32), np.int32(-1))
+    return ids[positions]
+
+
+def decode_cafeterias(ids, dictionary):
+    """
+    returns a dataframe with the CAFETERIA_COLUMNS of the cafeterias `ids` of dictionary as categories
+    """
+    positions = pd.Index(dictionary["cafeteria_id"]).get_indexer(np.asarray(ids))
+    names = {}
+    for col in CAFETERIA_COLUMNS:
+        values = dictionary[col].astype("category")
+        codes = np.append(values.cat.codes.values, np.int8(-1)).astype(np.int32)
+        names[col] = pd.Categorical.from_codes(codes[positions], values.cat.categories)
+    return pd.DataFrame(names)
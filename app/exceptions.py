@@ -39,3 +39,41 @@ class MissingDataForPrediction(Exception):
         msg = f"Prediction set is empty, \
                 please check your prediction dates regarding to your data files {str(error_details)}"
         super().__init__(msg)
+
+
+class MissingModelArtifacts(Exception):
+    """
+    Exception for missing trained models when predicting without training
+    """
+    def __init__(self, error_details):
+        msg = f"No trained model found, \
+                please train a model with the same training type and column to predict first {str(error_details)}"
+        super().__init__(msg)
+
+
+class InvalidForecastRequest(Exception):
+    """
+    Exception for forecast requests the forecast service cannot answer
+    """
+    def __init__(self, error_details):
+        msg = f"Invalid forecast request: {str(error_details)}"
+        super().__init__(msg)
+
+
+class InvalidCalculators(Exception):
+    """
+    Exception for calculators of which outputs overlap or inputs cannot be computed
+    """
+    def __init__(self, error_details):
+        msg = f"Invalid calculators: {str(error_details)}"
+        super().__init__(msg)
+
+
+class IncompleteDataset(Exception):
+    """
+    Exception for preprocessed datasets lacking columns, e.g. preprocessed for another training type
+    """
+    def __init__(self, error_details):
+        msg = f"Preprocessed dataset lacks columns, \
+                please preprocess it again without --training-columns-only {str(error_details)}"
+        super().__init__(msg)
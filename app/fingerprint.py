@@ -0,0 +1,33 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------
+# Fingerprints of files and parameters used to key caches
+# -----------------------------------------------------------
+import hashlib
+import json
+import os
+
+
+def file_fingerprint(file_path):
+    """
+    returns the sha256 hex digest of the content of the file `file_path`
+    """
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f_in:
+        for chunk in iter(lambda: f_in.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def object_fingerprint(obj):
+    """
+    returns the sha256 hex digest of a json serializable object (e.g. parameters, list of terms)
+    """
+    return hashlib.sha256(json.dumps(obj, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def files_fingerprint(file_paths, parameters=None):
+    """
+    returns the sha256 hex digest of the names and contents of a list of files and of optional parameters
+    """
+    contents = sorted((os.path.basename(file_path), file_fingerprint(file_path)) for file_path in file_paths)
+    return object_fingerprint({"files": contents, "parameters": parameters})
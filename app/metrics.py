@@ -0,0 +1,112 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------
+# Evaluation metrics of predictions computed for many groups at once
+# -----------------------------------------------------------
+import os
+
+import numpy as np
+import pandas as pd
+
+from app.log import logger
+
+
+METRICS = ["r2", "mae", "mse", "weighted_precision", "precision"]
+
+
+def grouped_metrics(y_true, y_pred, codes, nb_groups):
+    """
+    given the arrays y_true and y_pred and the group of each line (codes between 0 and nb_groups - 1)
+    returns {metric: array of its value per group} for the number of predictions, the sums of expected
+    and predicted values and the METRICS, each one computed with a few bincounts over all the lines:
+    - r2, mae and mse as sklearn.metrics (r2 is nan for less than 2 predictions)
+    - weighted_precision and precision as train.weighted_precision_calculus and train.precision_calculus
+    """
+    y_true = np.asarray(y_true, dtype=np.float64)
+    y_pred = np.asarray(y_pred, dtype=np.float64)
+    codes = np.asarray(codes, dtype=np.int64)
+
+    def _sum(values):
+        return np.bincount(codes, weights=values, minlength=nb_groups)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        count = np.bincount(codes, minlength=nb_groups).astype(np.float64)
+        expected = _sum(y_true)
+        errors = y_pred - y_true
+        squared_errors = _sum(errors ** 2)
+        deviations = _sum((y_true - (expected / count)[codes]) ** 2)
+        r2 = np.where(deviations == 0, np.where(squared_errors == 0, 1.0, 0.0), 1 - squared_errors / deviations)
+
+        # precisions of lines without a true value (0 / 0) are ignored as pandas sums and means do
+        precision = np.maximum(1 - np.abs(errors) / y_true, 0)
+        known = ~np.isnan(precision)
+        precision = np.where(known, precision, 0)
+        return {
+            "nb_predictions": count.astype(np.int64),
+            "expected": expected,
+            "predicted": _sum(y_pred),
+            "r2": np.where(count < 2, np.nan, r2),
+            "mae": _sum(np.abs(errors)) / count,
+            "mse": squared_errors / count,
+            "weighted_precision": _sum(precision * y_true) / expected,
+            "precision": _sum(precision) / _sum(known.astype(np.float64)),
+        }
+
+
+def metrics_by_resolution(dtf, column_to_predict, predicted_col, resolution=None):
+    """
+    returns the dataframe of the metrics (see grouped_metrics) of `predicted_col` regarding to the true values
+    `column_to_predict` of dtf for each group of lines of the list of columns `resolution`, indexed by group
+    all the lines are a single group if resolution is None
+    """
+    if resolution is None:
+        codes, index = np.zeros(len(dtf), dtype=np.int64), pd.Index([None], name="group")
+    else:
+        groups = dtf.groupby(resolution, observed=True, sort=True)
+        codes, index = groups.ngroup().values, groups.size().index
+    metrics = grouped_metrics(dtf[column_to_predict].values, dtf[predicted_col].values, codes, len(index))
+    return pd.DataFrame(metrics, index=index)
+
+
+def metrics_table(dtf, column_to_predict, predicted_cols, resolutions):
+    """
+    returns a single table of the metrics of each of predicted_cols for each resolution of the dict resolutions
+    {name: list of columns grouping the lines or None for all of them}, with a line per group and the columns:
+    resolution (its name), group (the values of its columns joined by '/', empty for all lines),
+    predicted_col and the metrics, see grouped_metrics
+    """
+    tables = []
+    for name, resolution in resolutions.items():
+        for predicted_col in predicted_cols:
+            metrics = metrics_by_resolution(dtf, column_to_predict, predicted_col, resolution)
+            if resolution is None:
+                groups = [""]
+            else:
+                groups = ["/".join(str(value) for value in np.atleast_1d(key)) for key in metrics.index]
+            metrics = metrics.reset_index(drop=True)
+            metrics.insert(0, "predicted_col", predicted_col)
+            metrics.insert(0, "group", groups)
+            metrics.insert(0, "resolution", name)
+            tables.append(metrics)
+    return pd.concat(tables, ignore_index=True)
+
+
+def log_metrics(metrics):
+    """
+    logs the metrics of a line of a metrics table, see metrics_by_resolution
+    """
+    logger.info("R2: %0.2f", metrics["r2"])
+    logger.info("MAE: %0.2f", metrics["mae"])
+    logger.info("MSE: %0.2f", metrics["mse"])
+    logger.info("weighted prec: %0.2f", metrics["weighted_precision"])
+    logger.info("prec: %0.2f", metrics["precision"])
+
+
+def write_metrics(table, output_dir, file_name):
+    """
+    writes the metrics table (see metrics_table) as a csv file in output_dir, returns its path
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    file_path = os.path.join(output_dir, file_name)
+    table.to_csv(file_path, index=False)
+    logger.info("metrics exported to %s", file_path)
+    return file_path
@@ -0,0 +1,101 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------
+# Cache of trained models keyed by their training inputs
+# -----------------------------------------------------------
+import hashlib
+import os
+import shutil
+
+import pandas as pd
+
+from app.fingerprint import object_fingerprint
+from app.log import logger
+
+
+MODEL_CACHE_DIR = "output/models/cache"
+# least recently used models are removed once the cache exceeds this size
+MAX_CACHE_BYTES = 500 * 1024 * 1024
+
+
+def frame_fingerprint(dtf):
+    """
+    returns the sha256 hex digest of the values of the dataframe dtf, lines order included
+    """
+    sha = hashlib.sha256(",".join(dtf.columns).encode())
+    sha.update(pd.util.hash_pandas_object(dtf, index=False).values.tobytes())
+    return sha.hexdigest()
+
+
+def training_fingerprint(training_type, column_to_predict, train_data, features, hyperparameters):
+    """
+    returns a fingerprint of everything a trained model depends on:
+    the training type, the training lines of the features and column_to_predict, and the hyperparameters
+    """
+    return object_fingerprint({
+        "training_type": training_type,
+        "column_to_predict": column_to_predict,
+        "features": features,
+        "hyperparameters": hyperparameters,
+        "data": frame_fingerprint(train_data[features + [column_to_predict]]),
+    })
+
+
+def _cache_dir(cache_dir):
+    return MODEL_CACHE_DIR if cache_dir is None else cache_dir
+
+
+def _directory_size(directory):
+    return sum(
+        os.path.getsize(os.path.join(root, file_name))
+        for root, _, file_names in os.walk(directory) for file_name in file_names)
+
+
+def lookup(fingerprint, cache_dir=None):
+    """
+    returns the folder of the models cached for fingerprint or None if they are not cached
+    the models are marked as used, see evict
+    """
+    directory = os.path.join(_cache_dir(cache_dir), fingerprint)
+    if not os.path.isdir(directory):
+        return None
+    os.utime(directory)
+    return directory
+
+
+def store(fingerprint, artifacts_directory, cache_dir=None, max_bytes=None):
+    """
+    copies the models saved in artifacts_directory (see artifacts.save_artifacts) to the cache for fingerprint
+    then evicts the least recently used models if the cache exceeds max_bytes (MAX_CACHE_BYTES if None)
+    """
+    cache_dir = _cache_dir(cache_dir)
+    directory = os.path.join(cache_dir, fingerprint)
+    os.makedirs(cache_dir, exist_ok=True)
+    if os.path.isdir(directory):
+        shutil.rmtree(directory)
+    shutil.copytree(artifacts_directory, directory + ".tmp")
+    os.replace(directory + ".tmp", directory)
+    os.utime(directory)
+    evict(cache_dir, MAX_CACHE_BYTES if max_bytes is None else max_bytes, keep=[fingerprint])
+    return directory
+
+
+def evict(cache_dir, max_bytes, keep=()):
+    """
+    removes the least recently used models of cache_dir until its size is below max_bytes
+    the models of the fingerprints `keep` are never removed
+    """
+    entries = []
+    for fingerprint in os.listdir(cache_dir):
+        directory = os.path.join(cache_dir, fingerprint)
+        if os.path.isdir(directory) and not fingerprint.endswith(".tmp"):
+            entries.append((os.path.getmtime(directory), fingerprint, _directory_size(directory)))
+
+    total_bytes = sum(size for _, _, size in entries)
+    for _, fingerprint, size in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        if fingerprint in keep:
+            continue
+        logger.info("removing models %s from the cache", fingerprint)
+        shutil.rmtree(os.path.join(cache_dir, fingerprint))
+        total_bytes -= size
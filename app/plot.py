@@ -53,7 +53,7 @@ def plot_error(dataset, name, resolution=None):
     Plot errors as bar chart
     """
     if resolution:
-        for res, data in dataset.groupby(resolution):
+        for res, data in dataset.groupby(resolution, observed=True):
             data_to_trace = data.groupby("date_str")["relative_error"].sum()
             _ = pyplot.figure(figsize=(20, 20))
             pyplot.bar(data_to_trace.index, data_to_trace)
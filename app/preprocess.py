@@ -3,6 +3,7 @@
 # Preprocess data to generate training and test datasets
 # -----------------------------------------------------------
 import datetime
+import functools
 import os
 
 import dateutil.relativedelta
@@ -10,8 +11,14 @@ import pandas as pd
 import numpy as np
 
 import app.calculators as calculators
+from app.calendar_store import OVERLAP_DAYS, load_calendar_features
+from app.encodings import CAFETERIA_COLUMNS, day_numbers, day_strings, decode_cafeterias, encode_cafeterias, \
+    load_cafeterias_dictionary
 from app.exceptions import OverlappingColumns, InconsistentDates
 from app.log import logger
+from app.schema import apply_schema, dataset_schema
+from app.staging import cafeterias_dictionary_path, write_staging
+from app import staging_store
 
 
 def compute_min_max_date(begin_training, begin_prediction, end_prediction, date_format, weeks_latency):
@@ -41,13 +48,113 @@ def compute_min_max_date(begin_training, begin_prediction, end_prediction, date_
     return (begin_training, end_training.strftime(date_format))
 
 
-def compute_dates_dataframe(start, end, date_format, data_path, include_wednesday):
+# calendar columns the lines of the dataset are computed with, see compute_lines
+PREPROCESSING_COLUMNS = ["annee_scolaire", "week", "working", "wednesday"]
+# calendar columns computed from other calendar columns, see compute_dates_dataframe
+DERIVED_COLUMNS = {
+    "working": ["weekday", "vacances_nom", "nom_jour_ferie"],
+    "wednesday": ["weekday"],
+}
+# calculators of the dates related features, whether they read the column of dates or only the date index
+CALENDAR_CALCULATORS = {
+    "school_year": True,
+    "strikes": False,
+    "date_attributes": True,
+    "holidays": True,
+    "non_working_days": True,
+    "events": True,
+    "special_meals": True,
+}
+
+
+def feature_registry(data_path):
+    """
+    returns {column: name of the calculator computing it} for the dates related features of the dataset
+    in the order of their columns, the columns derived from them being computed by `working_days`
+    (see compute_dates_dataframe)
+    """
+    calendar = [
+        ("school_year", ["annee_scolaire"]),
+        ("strikes", ["greve"]),
+        ("date_attributes", ["year", "month", "day", "week", "weekday"]),
+        ("holidays", ["holidays_in", "holidays_ago", "vacances_nom"]),
+        ("non_working_days", ["non_working_in", "non_working_ago", "nom_jour_ferie"]),
+        ("events", calculators.events_countdown_columns()),
+        ("special_meals", ["info_menu"] + list(calculators.read_meals_dictionary(data_path))),
+        ("working_days", list(DERIVED_COLUMNS)),
+    ]
+    return {col: name for name, outputs in calendar for col in outputs}
+
+
+def calendar_calculators(date_col, date_format, data_path, cache_path=None, columns=None):
+    """
+    returns the calculators of the dates related features (see calculators.runner) in the order of their columns
+    all of them only depend on the dates, thus run concurrently
+    only the calculators of columns in the feature registry run, restricted to them (all columns if None)
+    """
+    outputs = {}
+    for col, name in feature_registry(data_path).items():
+        if name in CALENDAR_CALCULATORS and (columns is None or col in columns):
+            outputs.setdefault(name, []).append(col)
+
+    functions = {
+        "school_year": functools.partial(
+            calculators.add_feature_school_year, date_col=date_col, date_format=date_format, data_path=data_path),
+        "strikes": functools.partial(
+            calculators.add_feature_strikes, date_format=date_format, data_path=data_path),
+        "date_attributes": functools.partial(
+            calculators.add_feature_date_attributes, date_col=date_col, attributes_list=outputs.get("date_attributes"),
+            date_format=date_format),
+        "holidays": functools.partial(
+            calculators.add_feature_holidays_in_ago, date_col=date_col, date_format=date_format, data_path=data_path),
+        "non_working_days": functools.partial(
+            calculators.add_feature_non_working_days_in_ago, date_col=date_col, date_format=date_format,
+            data_path=data_path),
+        "events": functools.partial(
+            calculators.add_feature_events_countdown, date_col=date_col, date_format=date_format,
+            columns=outputs.get("events")),
+        "special_meals": functools.partial(
+            calculators.add_feature_special_meals, col_to_merge=date_col, date_format=date_format,
+            data_path=data_path, cache_path=cache_path, meals_dictionary=calculators.read_meals_dictionary(data_path)),
+    }
+    return [
+        calculators.Calculator(name, functions[name], [date_col] if CALENDAR_CALCULATORS[name] else [], name_outputs)
+        for name, name_outputs in outputs.items()]
+
+
+def calendar_columns(columns):
+    """
+    returns the calendar columns to compute for columns (all columns if None): columns and the ones they derive from
+    """
+    if columns is None:
+        return None
+    derived_from = [col for derived in columns for col in DERIVED_COLUMNS.get(derived, [])]
+    return list(dict.fromkeys(list(columns) + derived_from))
+
+
+def add_calendar_features(all_dates, date_col, date_format, data_path, cache_path=None, workers=None, columns=None):
+    """
+    given a dataframe of dates with a `date_index` and a column `date_col` formatted using date_format
+    add various dates related features computed from the calculators files of data_path
+    calculators run concurrently in workers threads (see calculators.run_calculators)
+    only the features among columns are added (all features if None)
+    """
+    all_dates = calculators.run_calculators(
+        all_dates, calendar_calculators(date_col, date_format, data_path, cache_path, columns), workers=workers)
+    return all_dates.reset_index(drop=True)
+
+
+def compute_dates_dataframe(start, end, date_format, data_path, include_wednesday, cache_path=None, columns=None):
     """
     generates a dataframe of dates between start and end at day resolution
     with:
         - a `date_index`
         - a column `date_str` formatted using date_format
-        - various dates related features
+        - various dates related features, only the ones among columns if not None
+    cache_path is the folder where intermediate features can be cached, no cache is used if None
+    when a cache is used, dates related features are read from the calendar store of cache_path and only
+    the dates not stored yet are computed (see calendar_store.load_calendar_features), features being the same
+    in both cases, otherwise only the calculators of columns run
     """
 
     date_col = "date_str"
@@ -55,15 +162,31 @@ def compute_dates_dataframe(start, end, date_format, data_path, include_wednesda
     # generate dates rows
     all_dates = calculators.generate_dates_df(start, end, date_format, date_col)
 
-    # add dates related features
-    all_dates = calculators.add_feature_school_year(all_dates, date_col, date_format, data_path)
-    all_dates = calculators.add_feature_strikes(all_dates, date_format, data_path)
-    time_data = ["year", "month", "day", "week", "weekday"]
-    all_dates = calculators.add_feature_date_attributes(all_dates, date_col, time_data, date_format)
-    all_dates = calculators.add_feature_holidays_in_ago(all_dates, date_col, date_format, data_path)
-    all_dates = calculators.add_feature_non_working_days_in_ago(all_dates, date_col, date_format, data_path)
-    all_dates = calculators.add_feature_events_countdown(all_dates, date_col, date_format)
-    all_dates = calculators.add_feature_special_meals(all_dates, date_col, date_format, data_path)
+    # dates related features are computed with OVERLAP_DAYS more days on each side, as the calendar store
+    # extends its range, so that countdowns close to start and end do not depend on what is stored
+    first, last = all_dates.index.min(), all_dates.index.max()
+    padding = pd.Timedelta(days=OVERLAP_DAYS)
+
+    def _compute_features(first, last, features_columns=None):
+        dates = pd.date_range(first, last, freq="D")
+        dates_df = pd.DataFrame({"date_index": dates, date_col: dates.strftime(date_format)})
+        dates_df = dates_df.set_index("date_index")
+        return add_calendar_features(dates_df, date_col, date_format, data_path, cache_path, columns=features_columns)
+
+    # stored features are computed for all columns to be shared by any dataset, columns are selected below
+    if cache_path is None:
+        features = _compute_features(first - padding, last + padding, calendar_columns(columns))
+    else:
+        features = load_calendar_features(
+            first - padding,
+            last + padding,
+            date_col,
+            date_format,
+            data_path,
+            os.path.join(cache_path, "calendar"),
+            _compute_features)
+    dates = pd.to_datetime(features[date_col], format=date_format)
+    all_dates = features[(dates >= first) & (dates <= last)].reset_index(drop=True)
 
     mask_working = (all_dates["weekday"] != 5) & \
         (all_dates["weekday"] != 6) & \
@@ -81,20 +204,26 @@ def compute_dates_dataframe(start, end, date_format, data_path, include_wednesda
     all_dates["wednesday"] = 0
     all_dates.loc[mask_wednesday, "wednesday"] = 1
 
+    if columns is not None:
+        all_dates = all_dates[[date_col] + [col for col in all_dates.columns if col in columns and col != date_col]]
+
     return all_dates, date_col
 
 
 def cross_product(dataframe_1, dataframe_2):
     """
     returns the cross product of dataframe_1 and dataframe_2 as a new dataset
+    rows of dataframe_1 are repeated len(dataframe_2) times and dataframe_2 is tiled len(dataframe_1) times,
+    thus neither a merge nor a temporary key is needed and input dataframes are left unchanged
     """
     common_columns = set(dataframe_1.columns.values).intersection(set(dataframe_2.columns.values))
     if common_columns:
         raise OverlappingColumns(common_columns)
-    dataframe_1['__magic_key'] = 1
-    dataframe_2['__magic_key'] = 1
-    cross_df = pd.merge(dataframe_1, dataframe_2, on=['__magic_key'])
-    cross_df.drop(columns=['__magic_key'], inplace=True)
+    positions_1 = np.repeat(np.arange(len(dataframe_1)), len(dataframe_2))
+    positions_2 = np.tile(np.arange(len(dataframe_2)), len(dataframe_1))
+    cross_df = pd.concat([
+        dataframe_1.take(positions_1).reset_index(drop=True),
+        dataframe_2.take(positions_2).reset_index(drop=True)], axis=1)
     return cross_df
 
 
@@ -154,15 +283,20 @@ def read_raw_input_files(data_path):
     return datasets, mappings
 
 
-def compute_datafiles_related_dataframes(data_path, school_cafeterias=None):
+def compute_datafiles_related_dataframes(data_path, school_cafeterias=None, date_format="%Y-%m-%d",
+                                         dictionary_path=None):
     """
     returns a tuple of DataFrames used for this project based on files stored in `data_path`
     DataFrames can be filtered to keep only school_cafeterias belonging to the parameter `school_cafeterias`
+    cafeterias are identified by their `cafeteria_id` in the dictionary of cafeterias stored at `dictionary_path`
+    (see encodings.load_cafeterias_dictionary) and dates of real values by their `day_number`
     """
     datasets, mappings = read_raw_input_files(data_path)
 
     # Read Canteens
-    all_school_cafeterias = datasets["cantines"]
+    all_school_cafeterias = apply_schema(datasets["cantines"], dataset_schema())
+    dictionary = load_cafeterias_dictionary(all_school_cafeterias, dictionary_path)
+    all_school_cafeterias.insert(0, "cafeteria_id", encode_cafeterias(all_school_cafeterias, dictionary))
     if school_cafeterias:
         logger.info('working only with school_cafeteria(s) %s', school_cafeterias)
         all_school_cafeterias = all_school_cafeterias[all_school_cafeterias["cantine_nom"].isin(school_cafeterias)]
@@ -178,63 +312,94 @@ def compute_datafiles_related_dataframes(data_path, school_cafeterias=None):
         right_on=["site_nom", "site_type"],
         how='left')
 
-    real_values = real_values[["cantine_nom", "cantine_type", "date", "prevision", "reel"]]
+    real_values["cafeteria_id"] = encode_cafeterias(real_values, dictionary)
+    real_values["day_number"] = day_numbers(real_values["date"], date_format)
+    real_values = real_values[(real_values["cafeteria_id"] != -1) & (real_values["day_number"] != -1)]
     # fix problem when two lines are used in real_values file with typo in the site_nom
-    real_values = real_values.groupby(["cantine_nom", "cantine_type", "date"])["prevision", "reel"].sum().reset_index()
+    real_values = real_values.groupby(["cafeteria_id", "day_number"])[["prevision", "reel"]].sum().reset_index()
 
     # Read effectifs data
     effectifs = datasets["effectifs"].merge(mappings['mapping_ecoles_cantines'],
                                             left_on="ecole",
                                             right_on="ecole",
                                             how='left')
-    effectifs = effectifs.groupby(['annee_scolaire', 'cantine_nom', 'cantine_type'])["effectif"].sum()
+    effectifs["cafeteria_id"] = encode_cafeterias(effectifs, dictionary)
+    effectifs = effectifs[effectifs["cafeteria_id"] != -1]
+    effectifs = effectifs.groupby(['annee_scolaire', 'cafeteria_id'])["effectif"].sum()
 
-    real_values.rename(columns={"date": "date_str"}, inplace=True)
     return all_school_cafeterias, real_values, effectifs
 
 
-def add_statistical_features(all_data):
+def statistical_features(all_data, cafeteria_key=None):
     """
-    compute statistical features using ratio, means etc
+    returns the statistical features of all_data (ratios, means etc) indexed by cafeteria_key and week
+    cafeteria_key is the list of columns identifying a cafeteria, CAFETERIA_COLUMNS if None
     """
+    cafeteria_key = cafeteria_key or CAFETERIA_COLUMNS
     # TODO improve filtering here and remove NANs
     remove_real_lines = all_data[(all_data["annee_scolaire"] != "2019-2020") & (all_data["annee_scolaire"] != "2018-2019")]
     # calculus
     remove_real_lines["frequentation_prevue"] = remove_real_lines["prevision"] / remove_real_lines["effectif"]
     remove_real_lines["frequentation_reel"] = remove_real_lines["reel"] / remove_real_lines["effectif"]
     # resolution and average manipulation
-    updated_resol = remove_real_lines.groupby(["cantine_nom", "cantine_type", "week", "annee_scolaire"])
+    updated_resol = remove_real_lines.groupby(cafeteria_key + ["week", "annee_scolaire"], observed=True)
     updated_resol = updated_resol['frequentation_prevue', 'frequentation_reel', 'prevision', 'reel'].mean().reset_index()
-    stats = updated_resol.groupby(["cantine_nom", "cantine_type", "week"])
+    stats = updated_resol.groupby(cafeteria_key + ["week"], observed=True)
     stats = stats['frequentation_prevue', 'frequentation_reel'].mean()
+    return stats
+
+
+def add_statistical_features(all_data, cafeteria_key=None, stats=None):
+    """
+    compute statistical features using ratio, means etc
+    cafeteria_key is the list of columns identifying a cafeteria, CAFETERIA_COLUMNS if None
+    stats are the statistical features to add, computed from all_data if None (see statistical_features)
+    """
+    cafeteria_key = cafeteria_key or CAFETERIA_COLUMNS
+    if stats is None:
+        stats = statistical_features(all_data, cafeteria_key)
 
     all_data = all_data.merge(
         stats,
-        left_on=["cantine_nom", "cantine_type", "week"],
+        left_on=cafeteria_key + ["week"],
         right_index=True,
         how='left')
 
     return all_data
 
 
-def tag_outliers(all_data, column, n_sigma):
+def outliers_bounds(all_data, column, n_sigma, cafeteria_key=None):
     """
-    Given a dataset all_date, a column and n_sigma
-    Create new columns upper_outlier and lower_outlier to identify all outliers of the column
-    using respectively the following classic filtering:
-    `mean + n_simga * std` and `mean - n_simga * std`
+    returns the mean, std, lower_bound and upper_bound of the non zero values of column of all_data
+    indexed by cafeteria_key and annee_scolaire, see tag_outliers
     """
+    cafeteria_key = cafeteria_key or CAFETERIA_COLUMNS
     outliers = all_data[(all_data[column] != 0)]
-    outliers = outliers.groupby(["cantine_nom", "cantine_type", "annee_scolaire"])
+    outliers = outliers.groupby(cafeteria_key + ["annee_scolaire"], observed=True)
     outliers = outliers[column].agg(["mean", "std"])
 
     outliers['lower_bound'] = outliers['mean'] - (n_sigma * outliers['std'])
     outliers['upper_bound'] = outliers['mean'] + (n_sigma * outliers['std'])
+    return outliers
+
+
+def tag_outliers(all_data, column, n_sigma, cafeteria_key=None, outliers=None):
+    """
+    Given a dataset all_date, a column and n_sigma
+    Create new columns upper_outlier and lower_outlier to identify all outliers of the column
+    using respectively the following classic filtering:
+    `mean + n_simga * std` and `mean - n_simga * std`
+    cafeteria_key is the list of columns identifying a cafeteria, CAFETERIA_COLUMNS if None
+    outliers are the bounds to use, computed from all_data if None (see outliers_bounds)
+    """
+    cafeteria_key = cafeteria_key or CAFETERIA_COLUMNS
+    if outliers is None:
+        outliers = outliers_bounds(all_data, column, n_sigma, cafeteria_key)
 
     # TODO merge and then filter
     all_data = all_data.merge(
         outliers,
-        left_on=["cantine_nom", "cantine_type", "annee_scolaire"],
+        left_on=cafeteria_key + ["annee_scolaire"],
         right_index=True,
         how='left')
     all_data["upper_outlier"] = all_data[column] > all_data['upper_bound']
@@ -243,43 +408,38 @@ def tag_outliers(all_data, column, n_sigma):
     return all_data
 
 
-def smarter_process_data(data_path, start, end, school_cafeterias, include_wednesday, date_format):
+def compute_lines(all_dates_keys, all_school_cafeterias, real_values, effectifs, date_col, date_format,
+                  aggregates=None):
     """
-    Computes dataset based on datafiles stored in `data_path` such that:
-        - one line by date and school_cafeteria
-        - dates belong to [start, end]
-        - school_cafeterias belong to `school_cafeterias`
+    computes the lines of the dataset for the dates of all_dates_keys (identified by their `day_number`)
+    and the cafeterias of all_school_cafeterias (identified by their `cafeteria_id`), see smarter_process_data
+    aggregates are the (statistical features, outliers bounds) of the cafeterias, computed from the lines if None
     """
-
-    # generate dataframes based on input datafiles
-    all_school_cafeterias, real_values, effectifs = compute_datafiles_related_dataframes(data_path, school_cafeterias)
-
-    # generate dates rows
-    all_dates, date_col = compute_dates_dataframe(start, end, date_format, data_path, include_wednesday)
+    # dates and school_cafeterias are joined and grouped on their integer keys,
+    # their names are restored only when the dataset is staged
+    all_school_cafeterias_keys = all_school_cafeterias.drop(columns=CAFETERIA_COLUMNS)
 
     # cross product school_cafeterias x dates
-    all_dates_x_all_school_cafeterias = cross_product(all_dates, all_school_cafeterias)
+    all_data = cross_product(all_dates_keys, all_school_cafeterias_keys)
 
     # join real values
-    all_data = all_dates_x_all_school_cafeterias.merge(
+    all_data = all_data.merge(
         real_values,
-        left_on=[date_col, "cantine_nom", "cantine_type"],
-        right_on=[date_col, "cantine_nom", "cantine_type"],
+        left_on=["day_number", "cafeteria_id"],
+        right_on=["day_number", "cafeteria_id"],
         how='left')
 
     # join effectif values
     all_data = all_data.merge(
         effectifs,
-        left_on=["annee_scolaire", "cantine_nom", "cantine_type"],
+        left_on=["annee_scolaire", "cafeteria_id"],
         right_index=True,
         how='left')
 
     # compute statistical features
-    all_data = add_statistical_features(all_data)
-    all_data = tag_outliers(all_data, 'reel', 3)
-
-    for resolution, dtf in all_data.groupby(['cantine_nom', 'cantine_type']):
-        logger.info("dataset for school_cafeteria %s generated contains %s days", str(resolution), str(len(dtf)))
+    stats, outliers = aggregates or (None, None)
+    all_data = add_statistical_features(all_data, ["cafeteria_id"], stats)
+    all_data = tag_outliers(all_data, 'reel', 3, ["cafeteria_id"], outliers)
 
     # fillnans with 0
     all_data.loc[(all_data["working"] == 0) & np.isnan(all_data["reel"]), 'reel'] = 0
@@ -288,4 +448,107 @@ def smarter_process_data(data_path, start, end, school_cafeterias, include_wedne
     all_data.loc[(all_data["wednesday"] == 1) & np.isnan(all_data["reel"]), 'reel'] = 0
     all_data.loc[(all_data["wednesday"] == 1) & np.isnan(all_data["prevision"]), 'prevision'] = 0
 
-    all_data.to_csv(f'output/staging/prepared_data_{start}_{end}.csv', index=False)
+    # restore names of dates and school_cafeterias
+    all_data.insert(0, date_col, day_strings(all_data["day_number"], date_format))
+    names = decode_cafeterias(all_data["cafeteria_id"], all_school_cafeterias)
+    position = all_data.columns.get_loc("cafeteria_id") + 1
+    for offset, col in enumerate(CAFETERIA_COLUMNS):
+        all_data.insert(position + offset, col, names[col].values)
+    return all_data
+
+
+def compute_aggregates(real_values, all_dates_keys, effectifs):
+    """
+    returns the statistical features and the outliers bounds of the cafeterias computed from their real values
+    only, which equal the ones computed from all the lines of the dataset as lines without values are ignored
+    """
+    observations = real_values.merge(all_dates_keys[["day_number", "annee_scolaire", "week"]], on="day_number")
+    observations = observations.merge(
+        effectifs,
+        left_on=["annee_scolaire", "cafeteria_id"],
+        right_index=True,
+        how='left')
+    return statistical_features(observations, ["cafeteria_id"]), outliers_bounds(observations, 'reel', 3, ["cafeteria_id"])
+
+
+# pylint: disable=too-many-arguments
+def history_aggregates(start, end, date_format, data_path, include_wednesday, cache_path, real_values, effectifs,
+                       schema):
+    """
+    returns the statistical features and the outliers bounds (see compute_aggregates) of the cafeterias computed
+    from their real values between start and end, of which only the dates related features they need are computed
+    """
+    history, date_col = compute_dates_dataframe(start, end, date_format, data_path, include_wednesday, cache_path,
+                                                PREPROCESSING_COLUMNS)
+    history = apply_schema(history, schema)
+    history_keys = history.drop(columns=[date_col])
+    history_keys.insert(0, "day_number", day_numbers(history[date_col], date_format))
+    real_values = real_values[real_values["day_number"].isin(history_keys["day_number"])]
+    return compute_aggregates(real_values, history_keys, effectifs)
+
+
+def smarter_process_data(data_path, start, end, school_cafeterias, include_wednesday, date_format, cache_path=None,
+                         staging_format="parquet", columns=None, statistics_start=None):
+    """
+    Computes dataset based on datafiles stored in `data_path` such that:
+        - one line by date and school_cafeteria
+        - dates belong to [start, end]
+        - school_cafeterias belong to `school_cafeterias`
+    cache_path is the folder where intermediate features can be cached, no cache is used if None
+    the dataset is staged using staging_format ('parquet' or 'csv') with the compact dtypes of schema.dataset_schema
+    when a cache is used, datasets are also kept in the store of datasets keyed by their input files and
+    parameters (see staging_store), from which they are restored without being computed again
+    columns restricts the dates related features of the dataset to the ones among columns (all if None, see
+    train.training_columns), PREPROCESSING_COLUMNS being computed in any case, such a dataset is staged apart
+    from the complete one (see staging.staging_file_path)
+    statistical features and outliers bounds are computed from the real values between statistics_start and end
+    if statistics_start is before start (from the lines of the dataset otherwise): the lines of the dates to predict
+    then equal the ones of a dataset starting at statistics_start without computing the lines of the history
+    """
+    if statistics_start is not None and statistics_start >= start:
+        statistics_start = None
+    fingerprint = None
+    if cache_path is not None:
+        fingerprint = staging_store.preprocessing_fingerprint(
+            data_path, start, end, school_cafeterias, include_wednesday, date_format, staging_format, columns,
+            statistics_start)
+        file_path = staging_store.restore(fingerprint, start, end, staging_format, columns)
+        if file_path is not None:
+            logger.info("preprocessed dataset %s restored from the store", file_path)
+            return
+
+    schema = dataset_schema(calculators.read_meals_dictionary(data_path).keys())
+
+    # generate dataframes based on input datafiles
+    all_school_cafeterias, real_values, effectifs = compute_datafiles_related_dataframes(
+        data_path,
+        school_cafeterias,
+        date_format,
+        cafeterias_dictionary_path())
+
+    # generate dates rows
+    dates_columns = None if columns is None else list(columns) + PREPROCESSING_COLUMNS
+    all_dates, date_col = compute_dates_dataframe(start, end, date_format, data_path, include_wednesday, cache_path,
+                                                  dates_columns)
+    all_dates = apply_schema(all_dates, schema, report=True)
+    all_dates_keys = all_dates.drop(columns=[date_col])
+    all_dates_keys.insert(0, "day_number", day_numbers(all_dates[date_col], date_format))
+
+    aggregates = None
+    if statistics_start is not None:
+        aggregates = history_aggregates(
+            statistics_start, end, date_format, data_path, include_wednesday, cache_path,
+            real_values[real_values["cafeteria_id"].isin(all_school_cafeterias["cafeteria_id"])], effectifs, schema)
+
+    all_data = compute_lines(all_dates_keys, all_school_cafeterias, real_values, effectifs, date_col, date_format,
+                             aggregates)
+
+    cafeterias_names = all_school_cafeterias.set_index("cafeteria_id")[CAFETERIA_COLUMNS]
+    for cafeteria_id, dtf in all_data.groupby("cafeteria_id"):
+        resolution = tuple(cafeterias_names.loc[cafeteria_id])
+        logger.info("dataset for school_cafeteria %s generated contains %s days", str(resolution), str(len(dtf)))
+
+    all_data = apply_schema(all_data, schema, report=True)
+    file_path = write_staging(all_data, start, end, staging_format, columns=columns)
+    if fingerprint is not None:
+        staging_store.store(fingerprint, file_path, all_school_cafeterias, staging_format)
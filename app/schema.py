@@ -0,0 +1,138 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------
+# Compact dtypes of the preprocessed dataset
+# -----------------------------------------------------------
+import numpy as np
+import pandas as pd
+
+from app.calculators.events_countdown import events_countdown_columns
+from app.log import logger
+
+
+# strings repeated on every line of a cafeteria or of a date
+# note that `date_str` remains a string as it is compared to dates bounds given as strings
+CATEGORY_COLUMNS = [
+    "cantine_nom",
+    "cantine_type",
+    "secteur",
+    "vacances_nom",
+    "nom_jour_ferie",
+    "annee_scolaire",
+]
+
+# integer surrogate keys of dates and cafeterias, see encodings.py
+KEY_COLUMNS = [
+    "day_number",
+    "cafeteria_id",
+]
+
+# 0/1 flags, meals categories of menus.json are flags as well
+FLAG_COLUMNS = [
+    "greve",
+    "working",
+    "wednesday",
+    "info_menu",
+]
+
+# dates attributes and countdowns in days
+SMALL_INT_COLUMNS = [
+    "year",
+    "month",
+    "day",
+    "week",
+    "weekday",
+    "holidays_in",
+    "holidays_ago",
+    "non_working_in",
+    "non_working_ago",
+] + events_countdown_columns()
+
+# integer counts and statistics only used to tag outliers,
+# targets `prevision` and `reel` and ratios `frequentation_*` used by the models are kept as float64
+FLOAT32_COLUMNS = [
+    "effectif",
+    "mean",
+    "std",
+    "lower_bound",
+    "upper_bound",
+]
+
+
+def dataset_schema(flag_columns=()):
+    """
+    returns the schema {column: dtype} of the preprocessed dataset
+    flag_columns are additional 0/1 columns e.g. the meals categories of menus.json
+    """
+    schema = {col: "category" for col in CATEGORY_COLUMNS}
+    schema.update({col: "int32" for col in KEY_COLUMNS})
+    schema.update({col: "int8" for col in FLAG_COLUMNS + list(flag_columns)})
+    schema.update({col: "int16" for col in SMALL_INT_COLUMNS})
+    schema.update({col: "float32" for col in FLOAT32_COLUMNS})
+    return schema
+
+
+def _has_dtype(series, dtype):
+    """
+    returns True if series is already stored as dtype, categories of categorical series must be sorted
+    """
+    if dtype == "category":
+        return str(series.dtype) == dtype and series.cat.categories.is_monotonic_increasing
+    return str(series.dtype) == dtype
+
+
+def _can_cast(series, dtype):
+    """
+    returns True if series can be cast to dtype without loss
+    integer dtypes require values without nans and within the bounds of dtype
+    """
+    if dtype == "float32":
+        return True
+    if series.isnull().any():
+        return False
+    values = series.values
+    if len(values) == 0:
+        return True
+    if not np.array_equal(values, np.round(values)):
+        return False
+    bounds = np.iinfo(dtype)
+    return bounds.min <= values.min() and values.max() <= bounds.max
+
+
+def memory_report(before, after):
+    """
+    given the memory usage (series of bytes per column) of a dataset before and after applying the schema,
+    returns a DataFrame with the bytes used per column before, after, and saved
+    """
+    report = pd.DataFrame({"bytes_before": before, "bytes_after": after}).fillna(0).astype(np.int64)
+    report["bytes_saved"] = report["bytes_before"] - report["bytes_after"]
+    return report.sort_values("bytes_saved", ascending=False)
+
+
+def apply_schema(dtf, schema, report=False):
+    """
+    given a dataframe dtf and a schema {column: dtype} (see dataset_schema), returns dtf with compact dtypes
+    columns which are not part of dtf are ignored and columns are not cast when values would be lost
+    dtf is updated in place and returned, if report is True the bytes saved per column are logged
+    """
+    columns = [col for col, dtype in schema.items() if col in dtf.columns and not _has_dtype(dtf[col], dtype)]
+    if not columns:
+        return dtf
+    before = dtf[columns].memory_usage(index=False, deep=True) if report else None
+
+    for col in columns:
+        if schema[col] == "category":
+            # categories are sorted to keep the order of groupbys on strings
+            dtf[col] = dtf[col].astype("category")
+            dtf[col] = dtf[col].cat.reorder_categories(sorted(dtf[col].cat.categories))
+        elif _can_cast(dtf[col], schema[col]):
+            dtf[col] = dtf[col].astype(schema[col])
+        else:
+            logger.warning("column %s cannot be stored as %s", col, schema[col])
+
+    if report:
+        savings = memory_report(before, dtf[columns].memory_usage(index=False, deep=True))
+        for col, row in savings.iterrows():
+            logger.info("column %s: %s bytes saved (%s -> %s)", col, row["bytes_saved"], row["bytes_before"],
+                        row["bytes_after"])
+        logger.info("%s bytes saved by the dataset schema", savings["bytes_saved"].sum())
+    return dtf
@@ -0,0 +1,245 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------
+# Serve forecasts of the last trained models over HTTP
+# -----------------------------------------------------------
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import queue
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from app.artifacts import artifacts_dir, load_artifacts
+from app.exceptions import InvalidForecastRequest, MissingDataForPrediction
+from app.log import logger
+from app.schema import apply_schema, dataset_schema
+from app.staging import find_staging, read_staging
+from app.train import BASE_COLUMNS, encode_features, predict_with_models, staged_columns
+
+
+# columns of the staged dataset identifying a forecast
+KEY_COLUMNS = ["date_str", "cantine_nom", "cantine_type"]
+
+
+class PredictionBatcher:
+    """
+    gathers the lines requested concurrently to predict them with a single call to `predict`
+    - predict: function taking the array of indexes of lines to predict and returning a dataframe with this index
+    - max_delay: seconds to wait for other requests once a request is received
+    - max_batch: maximum number of requests predicted together
+    """
+    def __init__(self, predict, max_delay=0.01, max_batch=64):
+        self.predict = predict
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.requests = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, lines):
+        """
+        returns a future of the predictions of the lines of index `lines`
+        """
+        future = Future()
+        self.requests.put((np.asarray(lines), future))
+        return future
+
+    def _next_batch(self):
+        batch = [self.requests.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                predictions = self.predict(np.unique(np.concatenate([lines for lines, _ in batch])))
+            except Exception as error:  # pylint: disable=broad-except
+                for _, future in batch:
+                    future.set_exception(error)
+                continue
+            logger.info("%s forecast requests predicted together", len(batch))
+            for lines, future in batch:
+                future.set_result(predictions.loc[lines])
+
+
+class ForecastService:
+    """
+    predicts the lines of a preprocessed dataset with trained boosters kept in memory, see load_service
+    - metadata, boosters: models loaded by artifacts.load_artifacts
+    - dataset: lines of the preprocessed dataset which can be forecasted, with features encoded for the models
+    - timeout: seconds to wait for the predictions of a request
+    """
+    def __init__(self, metadata, boosters, dataset, max_delay=0.01, timeout=60):
+        self.metadata = metadata
+        self.boosters = boosters
+        self.timeout = timeout
+        self.dataset = dataset.reset_index(drop=True)
+        self.dates = (self.dataset["date_str"].min(), self.dataset["date_str"].max())
+        self.cafeterias = set(self.dataset["cantine_nom"].astype(str))
+        self.batcher = PredictionBatcher(self.predict, max_delay)
+
+    def predict(self, lines):
+        """
+        returns the forecasts of the lines `lines` of the dataset, 0 for non working days
+        """
+        preds = predict_with_models(self.metadata, self.boosters, self.dataset.loc[lines].copy())
+        preds.loc[preds["working"] == 0, "output"] = 0
+        return preds
+
+    def select(self, begin_date, end_date, cafeterias=None):
+        """
+        returns the index of the lines of the cafeterias `cafeterias` (all of them if empty) between the dates
+        """
+        if not begin_date or not end_date or begin_date > end_date:
+            raise InvalidForecastRequest(f"provide a begin_date and an end_date after it, got {begin_date}, {end_date}")
+        if begin_date < self.dates[0] or end_date > self.dates[1]:
+            raise InvalidForecastRequest(f"dates are served between {self.dates[0]} and {self.dates[1]}")
+        unknown = sorted(set(cafeterias or []) - self.cafeterias)
+        if unknown:
+            raise InvalidForecastRequest(f"unknown cafeterias {unknown}")
+
+        mask = (self.dataset["date_str"] >= begin_date) & (self.dataset["date_str"] <= end_date)
+        if cafeterias:
+            mask &= self.dataset["cantine_nom"].isin(cafeterias)
+        return self.dataset.index[mask].values
+
+    def forecast(self, begin_date, end_date, cafeterias=None):
+        """
+        returns the list of forecasts {date_str, cantine_nom, cantine_type, output, ...} of the cafeterias
+        between begin_date and end_date, predicted in batch with concurrent requests
+        raises concurrent.futures.TimeoutError if they are not predicted within self.timeout seconds
+        """
+        preds = self.batcher.submit(self.select(begin_date, end_date, cafeterias)).result(self.timeout)
+        columns = KEY_COLUMNS + ["output"] + sorted(col for col in preds.columns if col.startswith("pred_"))
+        preds = preds[columns].sort_values(KEY_COLUMNS).astype(object)
+        return preds.where(preds.notna(), None).to_dict(orient="records")
+
+    def describe(self):
+        """
+        returns what the service forecasts
+        """
+        return {
+            "training_type": self.metadata["training_type"],
+            "column_to_predict": self.metadata["column_to_predict"],
+            "training_dates": self.metadata["training_dates"],
+            "dates": list(self.dates),
+            "cafeterias": sorted(self.cafeterias),
+        }
+
+
+def load_service(training_type="xgb", column_to_predict="reel", begin_date=None, end_date=None,
+                 staging_format="parquet", max_delay=0.01):
+    """
+    returns a ForecastService predicting with the models last trained with training_type on column_to_predict
+    the lines between begin_date and end_date (not bounded if None) of the most recent preprocessed dataset
+    covering them are loaded once
+    """
+    metadata, boosters, dictionary = load_artifacts(artifacts_dir(training_type, column_to_predict))
+    columns = BASE_COLUMNS + [col for col in metadata["features"] if col not in BASE_COLUMNS]
+    staging = find_staging(begin_date, end_date, staging_format, columns)
+    if staging is None:
+        raise MissingDataForPrediction(f"no preprocessed dataset covers dates between {begin_date} and {end_date}")
+    start, end, staging_format = staging
+    dataset = read_staging(start, end, columns=columns, date_ranges=[(begin_date or start, end_date or end)],
+                           staging_format=staging_format, required_columns=staged_columns(columns))
+    if len(dataset) == 0:
+        raise MissingDataForPrediction(f"cannot build prediction set between {begin_date} and {end_date}")
+    dataset = apply_schema(dataset, dataset_schema(metadata["menus_categories"]))
+    dataset, _ = encode_features(dataset, metadata["encodings"], dictionary)
+    logger.info("serving forecasts of %s models between %s and %s for %s cafeterias",
+                training_type, dataset["date_str"].min(), dataset["date_str"].max(), dataset["cantine_nom"].nunique())
+    return ForecastService(metadata, boosters, dataset, max_delay)
+
+
+def _forecast_parameters(handler):
+    """
+    returns (begin_date, end_date, cafeterias) of a GET query string or of a POST json body
+    """
+    url = urlparse(handler.path)
+    if handler.command == "POST":
+        length = int(handler.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(handler.rfile.read(length) or b"{}")
+        except ValueError as error:
+            raise InvalidForecastRequest(f"body is not valid json: {error}") from error
+        if not isinstance(body, dict):
+            raise InvalidForecastRequest("body must be a json object")
+        cafeterias = body.get("cafeterias") or []
+        if isinstance(cafeterias, str):
+            cafeterias = [cafeterias]
+        if not isinstance(cafeterias, list) or not all(isinstance(cafeteria, str) for cafeteria in cafeterias):
+            raise InvalidForecastRequest(f"cafeterias must be a list of names, got {cafeterias}")
+        for date in [body.get("begin_date"), body.get("end_date")]:
+            if date is not None and not isinstance(date, str):
+                raise InvalidForecastRequest(f"dates must be strings formatted as YYYY-mm-dd, got {date}")
+        return body.get("begin_date"), body.get("end_date"), cafeterias
+    query = parse_qs(url.query)
+    return query.get("begin_date", [None])[0], query.get("end_date", [None])[0], query.get("cafeteria", [])
+
+
+def make_handler(service):
+    """
+    returns the request handler class answering with service:
+    - GET /health: what the service forecasts
+    - GET /forecast?begin_date=YYYY-mm-dd&end_date=YYYY-mm-dd&cafeteria=name&cafeteria=...
+    - POST /forecast {"begin_date": "YYYY-mm-dd", "end_date": "YYYY-mm-dd", "cafeterias": [name, ...]}
+    invalid requests are answered with a 400 status, predictions which fail with a 500 status
+    and predictions which take too long with a 504 status
+    """
+    class ForecastHandler(BaseHTTPRequestHandler):
+        def _send(self, status, content):
+            body = json.dumps(content, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _answer(self):
+            path = urlparse(self.path).path
+            if path == "/health" and self.command == "GET":
+                self._send(200, dict(service.describe(), status="ok"))
+                return
+            if path != "/forecast":
+                self._send(404, {"error": f"unknown path {path}"})
+                return
+            try:
+                begin_date, end_date, cafeterias = _forecast_parameters(self)
+                self._send(200, {"forecasts": service.forecast(begin_date, end_date, cafeterias)})
+            except InvalidForecastRequest as error:
+                self._send(400, {"error": str(error)})
+            except FutureTimeoutError:
+                logger.error("forecast request %s timed out", self.path)
+                self._send(504, {"error": "forecasts took too long to predict"})
+            except Exception as error:  # pylint: disable=broad-except
+                logger.exception("forecast request %s failed", self.path)
+                self._send(500, {"error": f"forecasts could not be predicted: {error}"})
+
+        do_GET = _answer
+        do_POST = _answer
+
+        def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+            logger.info("%s - %s", self.address_string(), format % args)
+
+    return ForecastHandler
+
+
+def serve(service, host="127.0.0.1", port=8000):
+    """
+    returns an http server answering forecast requests with service, see make_handler
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    return server
@@ -0,0 +1,151 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------
+# Write and read the preprocessed dataset
+# -----------------------------------------------------------
+import glob
+import os
+import re
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from app.exceptions import IncompleteDataset
+from app.fingerprint import object_fingerprint
+from app.log import logger
+
+
+STAGING_DIR = "output/staging"
+STAGING_FORMATS = {"parquet": "parquet", "csv": "csv"}
+# rows are sorted by date, thus row groups span a few weeks and can be skipped when reading a range of dates
+ROW_GROUP_SIZE = 50000
+
+
+def columns_suffix(columns=None):
+    """
+    returns the suffix of the name of a preprocessed dataset restricted to the dates related features among columns,
+    empty for a complete dataset (columns is None), see preprocess.smarter_process_data
+    """
+    if columns is None:
+        return ""
+    return f"_columns-{object_fingerprint(sorted(columns))[:12]}"
+
+
+def staging_file_path(start, end, staging_format="parquet", columns=None):
+    """
+    returns the path of the preprocessed dataset between start and end stored using staging_format,
+    datasets restricted to columns being stored apart from the complete one (see columns_suffix)
+    """
+    file_name = f"prepared_data_{start}_{end}{columns_suffix(columns)}.{STAGING_FORMATS[staging_format]}"
+    return os.path.join(STAGING_DIR, file_name)
+
+
+def cafeterias_dictionary_path():
+    """
+    returns the path of the dictionary of cafeterias ids used by the preprocessed datasets
+    """
+    return os.path.join(STAGING_DIR, "cafeterias.csv")
+
+
+def write_staging(all_data, start, end, staging_format="parquet", date_col="date_str", columns=None):
+    """
+    writes the preprocessed dataset between start and end using staging_format ('parquet' or 'csv'),
+    restricted to columns if not None (see staging_file_path)
+    parquet datasets are sorted by date to allow reading only the row groups of a range of dates
+    the file is replaced rather than rewritten, as it may be linked to the store of datasets (see staging_store)
+    """
+    file_path = staging_file_path(start, end, staging_format, columns)
+    if staging_format == "parquet":
+        all_data = all_data.sort_values(date_col, kind="mergesort")
+        all_data.to_parquet(file_path + ".tmp", index=False, row_group_size=ROW_GROUP_SIZE)
+    else:
+        all_data.to_csv(file_path + ".tmp", index=False)
+    os.replace(file_path + ".tmp", file_path)
+    logger.info("preprocessed dataset exported to %s", file_path)
+    return file_path
+
+
+def find_staging(first, last, staging_format="parquet", columns=None):
+    """
+    returns (start, end, staging_format) of the most recent preprocessed dataset of which dates cover [first, last]
+    first or last may be None to not constrain the beginning or the end of the dataset
+    complete datasets are searched, and the ones restricted to columns if not None (see staging_file_path)
+    datasets staged using staging_format are preferred, returns None if no dataset covers those dates
+    """
+    candidates = []
+    for file_path in glob.glob(os.path.join(STAGING_DIR, "prepared_data_*_*.*")):
+        match = re.match(r"prepared_data_([^_]+)_([^_]+)(_columns-\w+)?\.(\w+)$", os.path.basename(file_path))
+        if not match or match.group(4) not in STAGING_FORMATS.values():
+            continue
+        if match.group(3) and (columns is None or match.group(3) != columns_suffix(columns)):
+            continue
+        start, end, _, extension = match.groups()
+        if (first is None or start <= first) and (last is None or last <= end):
+            candidates.append((extension == STAGING_FORMATS[staging_format], os.path.getmtime(file_path),
+                               start, end, extension))
+    if not candidates:
+        return None
+    _, _, start, end, extension = max(candidates)
+    return start, end, {ext: name for name, ext in STAGING_FORMATS.items()}[extension]
+
+
+def _filter_dates(dataset, date_col, date_ranges):
+    """
+    keeps lines of dataset of which date_col belongs to one of the date_ranges [(first, last), ...]
+    """
+    mask = pd.Series(False, index=dataset.index)
+    for first, last in date_ranges:
+        mask = mask | ((dataset[date_col] >= first) & (dataset[date_col] <= last))
+    return dataset.loc[mask]
+
+
+def _check_columns(file_path, file_columns, required_columns):
+    """
+    raises IncompleteDataset if some of required_columns are not columns of the dataset file_path
+    """
+    missing_columns = [col for col in required_columns or [] if col not in set(file_columns)]
+    if missing_columns:
+        raise IncompleteDataset(f"{file_path} lacks {missing_columns}")
+
+
+def read_staging(start, end, columns=None, date_ranges=None, staging_format="parquet", date_col="date_str",
+                 required_columns=None):
+    """
+    reads the preprocessed dataset between start and end
+    - columns: list of columns to load, unknown columns are ignored, all columns are loaded if None
+    - required_columns: list of columns the dataset must have, raises IncompleteDataset otherwise
+    - date_ranges: list of (first, last) dates, only lines of which date_col belongs to one of them are loaded
+    the dataset is read using staging_format, or the other format if it has not been staged with this one
+    the most recent of the complete dataset and of the dataset restricted to columns (see staging_file_path) is read
+    """
+    candidates = []
+    for name in STAGING_FORMATS:
+        for candidate_columns in ([None] if columns is None else [None, columns]):
+            candidate_path = staging_file_path(start, end, name, candidate_columns)
+            if os.path.exists(candidate_path):
+                candidates.append((name == staging_format, os.path.getmtime(candidate_path), candidate_path, name))
+    file_path = staging_file_path(start, end, staging_format)
+    if candidates:
+        _, _, file_path, name = max(candidates)
+        if name != staging_format:
+            logger.info("no %s preprocessed dataset found, using the %s one", staging_format, name)
+            staging_format = name
+
+    if staging_format == "parquet":
+        file_columns = pq.read_schema(file_path).names
+        _check_columns(file_path, file_columns, required_columns)
+        if columns is not None:
+            columns = [col for col in file_columns if col in set(columns) | {date_col}]
+        filters = None
+        if date_ranges:
+            filters = [[(date_col, ">=", first), (date_col, "<=", last)] for first, last in date_ranges]
+        dataset = pq.read_table(file_path, columns=columns, filters=filters).to_pandas()
+    else:
+        file_columns = pd.read_csv(file_path, nrows=0).columns
+        _check_columns(file_path, file_columns, required_columns)
+        if columns is not None:
+            columns = [col for col in file_columns if col in set(columns) | {date_col}]
+        dataset = pd.read_csv(file_path, usecols=columns)
+
+    if date_ranges:
+        dataset = _filter_dates(dataset, date_col, date_ranges)
+    return dataset.reset_index(drop=True)
@@ -0,0 +1,161 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------
+# Store of preprocessed datasets keyed by their inputs
+# -----------------------------------------------------------
+import glob
+import json
+import os
+import shutil
+
+import pandas as pd
+
+from app.calendar_store import calendar_files
+from app.encodings import CAFETERIA_COLUMNS
+from app.fingerprint import files_fingerprint
+from app.log import logger
+from app import staging
+
+
+# increase when the preprocessing computes different datasets from the same input files and parameters
+PREPROCESSING_VERSION = 1
+# least recently used datasets are removed once the store exceeds this size
+MAX_STORE_BYTES = 2 * 1024 * 1024 * 1024
+
+
+def preprocessing_files(data_path):
+    """
+    returns the list of files the preprocessed datasets are computed from
+    """
+    files = [os.path.join(data_path, "mappings", file_name)
+             for file_name in ["mapping_ecoles_cantines.csv", "mapping_frequentation_cantines.csv"]]
+    files += [os.path.join(data_path, "raw", file_name)
+              for file_name in ["cantines.csv", "effectifs.csv", "frequentation.csv"]]
+    return calendar_files(data_path) + files
+
+
+def preprocessing_fingerprint(data_path, start, end, school_cafeterias, include_wednesday, date_format,
+                              staging_format="parquet", columns=None, statistics_start=None):
+    """
+    returns a fingerprint of everything a preprocessed dataset depends on:
+    the contents of the input files of data_path and the parameters of the preprocessing
+    """
+    return files_fingerprint(preprocessing_files(data_path), parameters={
+        "version": PREPROCESSING_VERSION,
+        "start": start,
+        "end": end,
+        "school_cafeterias": sorted(school_cafeterias or []),
+        "include_wednesday": include_wednesday,
+        "date_format": date_format,
+        "staging_format": staging_format,
+        "columns": None if columns is None else sorted(columns),
+        "statistics_start": statistics_start,
+    })
+
+
+def _store_dir():
+    return os.path.join(staging.STAGING_DIR, "store")
+
+
+def _entry_path(fingerprint, staging_format):
+    return os.path.join(_store_dir(), f"{fingerprint}.{staging.STAGING_FORMATS[staging_format]}")
+
+
+def _cafeterias_path(fingerprint):
+    return os.path.join(_store_dir(), f"{fingerprint}.json")
+
+
+def _link(source, destination):
+    """
+    hard links (copies on filesystems without hard links) the file source to destination, replacing it
+    datasets are always replaced, never rewritten in place, thus linked files are never modified
+    nothing is done if destination already is source: renaming a link over another link of the same file
+    does nothing, which would leave the temporary link behind
+    """
+    if os.path.exists(destination) and os.path.samefile(source, destination):
+        return
+    tmp_path = destination + ".tmp"
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.link(source, tmp_path)
+    except FileExistsError:
+        # another preprocessing is linking the same dataset, copying would not help
+        raise
+    except OSError:
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, destination)
+
+
+def _known_cafeterias(cafeterias):
+    """
+    whether the cafeterias [[cafeteria_id, cantine_nom, cantine_type], ...] have the same ids in the
+    dictionary of cafeterias, see encodings.load_cafeterias_dictionary
+    """
+    dictionary_path = staging.cafeterias_dictionary_path()
+    if not os.path.exists(dictionary_path):
+        return False
+    dictionary = pd.read_csv(dictionary_path, dtype=str, keep_default_na=False)
+    known = set(dictionary[["cafeteria_id"] + CAFETERIA_COLUMNS].itertuples(index=False, name=None))
+    return all(tuple(str(value) for value in cafeteria) in known for cafeteria in cafeterias)
+
+
+def restore(fingerprint, start, end, staging_format="parquet", columns=None):
+    """
+    restores the dataset stored for fingerprint as the preprocessed dataset between start and end, restricted to
+    columns if not None (see staging.staging_file_path), returns its path or None if no valid dataset is stored
+    stored datasets are only valid if their cafeterias ids still match the dictionary of cafeterias
+    """
+    entry_path = _entry_path(fingerprint, staging_format)
+    cafeterias_path = _cafeterias_path(fingerprint)
+    if not os.path.exists(entry_path) or not os.path.exists(cafeterias_path):
+        return None
+    with open(cafeterias_path) as f_in:
+        if not _known_cafeterias(json.load(f_in)["cafeterias"]):
+            logger.info("preprocessed dataset %s does not match the dictionary of cafeterias", fingerprint)
+            return None
+    os.utime(entry_path)
+    file_path = staging.staging_file_path(start, end, staging_format, columns)
+    _link(entry_path, file_path)
+    return file_path
+
+
+def store(fingerprint, file_path, cafeterias, staging_format="parquet", max_bytes=None):
+    """
+    stores the preprocessed dataset file_path for fingerprint, along with its cafeterias (a dataframe with a column
+    cafeteria_id and the CAFETERIA_COLUMNS), then evicts the least recently used datasets if the store
+    exceeds max_bytes (MAX_STORE_BYTES if None)
+    """
+    os.makedirs(_store_dir(), exist_ok=True)
+    cafeterias_path = _cafeterias_path(fingerprint)
+    with open(cafeterias_path + ".tmp", "w") as f_out:
+        json.dump({"cafeterias": cafeterias[["cafeteria_id"] + CAFETERIA_COLUMNS].astype(str).values.tolist()}, f_out)
+    os.replace(cafeterias_path + ".tmp", cafeterias_path)
+    entry_path = _entry_path(fingerprint, staging_format)
+    _link(file_path, entry_path)
+    os.utime(entry_path)
+    evict(MAX_STORE_BYTES if max_bytes is None else max_bytes, keep=[fingerprint])
+    return entry_path
+
+
+def evict(max_bytes, keep=()):
+    """
+    removes the least recently used datasets of the store until its size is below max_bytes
+    the datasets of the fingerprints `keep` are never removed
+    """
+    entries = []
+    for entry_path in glob.glob(os.path.join(_store_dir(), "*.*")):
+        fingerprint, extension = os.path.basename(entry_path).split(".", 1)
+        if extension in staging.STAGING_FORMATS.values():
+            entries.append((os.path.getmtime(entry_path), fingerprint, entry_path, os.path.getsize(entry_path)))
+
+    total_bytes = sum(size for _, _, _, size in entries)
+    for _, fingerprint, entry_path, size in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        if fingerprint in keep:
+            continue
+        logger.info("removing preprocessed dataset %s from the store", fingerprint)
+        # fingerprints account for the staging format, thus each one has a single dataset
+        os.remove(entry_path)
+        os.remove(_cafeterias_path(fingerprint))
+        total_bytes -= size
@@ -4,31 +4,129 @@
 # -----------------------------------------------------------
 import math
 import os
+import shutil
 
+import numpy as np
 import pandas as pd
+import xgboost
 from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
 
 from app.log import logger
+from app.metrics import log_metrics, metrics_by_resolution, metrics_table, write_metrics
 import app.algorithms
+import app.model_cache
+from app.artifacts import CAFETERIAS_FILE, artifacts_dir, load_artifacts, predict_with_artifacts, save_artifacts
+from app.calculators import read_meals_dictionary
+from app.encodings import CAFETERIA_COLUMNS, encode_cafeterias, load_cafeterias_dictionary
 from app.exceptions import EmptyTrainingSet, MissingDataForPrediction
 from app.plot import plot_error
+from app.schema import apply_schema, dataset_schema
+from app.staging import cafeterias_dictionary_path, find_staging, read_staging
+
+
+# columns used to filter, evaluate and export predictions whatever the algorithm
+BASE_COLUMNS = [
+    "date_str",
+    "cafeteria_id",
+    "cantine_nom",
+    "cantine_type",
+    "secteur",
+    "annee_scolaire",
+    "week",
+    "working",
+    "wednesday",
+    "prevision",
+    "reel",
+    "greve",
+    "upper_outlier",
+    "lower_outlier",
+]
+
+
+def training_features(training_type, data_path):
+    """
+    returns the list of features used by `training_type` or None if unknown
+    """
+    if training_type == 'xgb':
+        return app.algorithms.xgb_features(data_path)
+    if training_type == 'xgb_interval':
+        return app.algorithms.xgb_interval_features(data_path)
+    if training_type == 'xgb_hist':
+        return app.algorithms.xgb_hist_features(data_path)
+    if training_type == 'benchmark':
+        return ["frequentation_prevue", "frequentation_reel", "effectif"]
+    return None
 
 
-def split_train_predict(min_date, max_date, begin_date, end_date):
+def training_columns(training_type, data_path):
+    """
+    returns the list of columns of the preprocessed dataset needed to train and predict with `training_type`
+    or None if all columns are needed
+    """
+    features = training_features(training_type, data_path)
+    if features is None:
+        return None
+    return BASE_COLUMNS + [col for col in features if col not in BASE_COLUMNS]
+
+
+# features numerizing string columns, see encode_features
+ENCODED_FEATURES = {
+    "site_type_cat": "cantine_type",
+    "secteur_cat": "secteur",
+    "school_year_cat": "annee_scolaire",
+}
+
+
+def staged_columns(columns):
+    """
+    returns the columns among columns which are read from the preprocessed dataset,
+    the other ones being computed once it is read (see encode_features)
+    """
+    return [col for col in columns if col != "site_id" and col not in ENCODED_FEATURES]
+
+
+def encode_features(dataset, encodings=None, dictionary=None):
+    """
+    numerize string columns of dataset using codes which do not depend on the order of lines:
+    - `site_id` is the id of the cafeteria in the dictionary of cafeterias
+      (`dictionary` if providen, else the one the dataset has been preprocessed with)
+    - ENCODED_FEATURES are the codes of the categories `encodings` {column: list of categories},
+      sorted categories of the dataset if None or if a column is missing (see schema.apply_schema)
+    returns dataset and the encodings used
+    """
+    if dictionary is not None:
+        dataset["cafeteria_id"] = encode_cafeterias(dataset, dictionary)
+    elif "cafeteria_id" not in dataset.columns:
+        dictionary = load_cafeterias_dictionary(dataset[CAFETERIA_COLUMNS], cafeterias_dictionary_path())
+        dataset["cafeteria_id"] = encode_cafeterias(dataset, dictionary)
+    dataset['site_id'] = dataset['cafeteria_id']
+
+    if encodings is None:
+        encodings = {col: list(dataset[col].cat.categories) for col in ENCODED_FEATURES.values()}
+    for feature, col in ENCODED_FEATURES.items():
+        dataset[feature] = pd.Categorical(dataset[col], categories=encodings.get(col)).codes
+    return dataset, encodings
+
+
+def split_train_predict(min_date, max_date, begin_date, end_date, columns=None, staging_format="parquet",
+                        schema=None):
     """
     split the dataset generated during preprocessing stage in a training set and a prediction set based on dates:
     - `min_date` to `max_date` defines the bounds of the training set
     - `begin_date` to `end_date` defines the bounds of the prediction set
+    only `columns` are loaded (all columns if None) and only lines of those two sets are read
+    the dataset is loaded with the compact dtypes of `schema` (see schema.dataset_schema)
     """
     logger.info("----------- read full dataset -------------")
-    dataset = pd.read_csv(f'output/staging/prepared_data_{min_date}_{end_date}.csv')
-    # numerize sring columns
-    dataset['site_id_built_in'] = pd.Categorical((pd.factorize(dataset.cantine_nom)[0] + 1))
-    dataset['site_id'] = dataset['site_id_built_in'].cat.codes
-    dataset['site_type_built_in'] = pd.Categorical((pd.factorize(dataset.cantine_type)[0] + 1))
-    dataset['site_type_cat'] = dataset['site_type_built_in'].cat.codes
-    dataset['secteur_built_in'] = pd.Categorical((pd.factorize(dataset.secteur)[0] + 1))
-    dataset['secteur_cat'] = dataset['secteur_built_in'].cat.codes
+    dataset = read_staging(
+        min_date,
+        end_date,
+        columns=columns,
+        date_ranges=[(min_date, max_date), (begin_date, end_date)],
+        staging_format=staging_format,
+        required_columns=None if columns is None else staged_columns(columns))
+    dataset = apply_schema(dataset, schema or dataset_schema(), report=True)
+    dataset, _ = encode_features(dataset)
 
     # split predict/train based on dates
     logger.info("----------- isolate train data and predict data among all dataset -------------")
@@ -37,6 +135,30 @@ def split_train_predict(min_date, max_date, begin_date, end_date):
     return (train_data, prediction_input_data)
 
 
+def load_preprocessed_dataset(start, end, data_path, training_types, staging_format="parquet"):
+    """
+    returns the lines between start and end of the most recent preprocessed dataset covering them
+    with the columns needed by all training_types, encoded as for train_and_predict
+    """
+    columns = []
+    for training_type in training_types:
+        type_columns = training_columns(training_type, data_path)
+        if type_columns is None:
+            columns = None
+            break
+        columns += [col for col in type_columns if col not in columns]
+
+    staging = find_staging(start, end, staging_format, columns)
+    if staging is None:
+        raise MissingDataForPrediction(f"no preprocessed dataset covers dates between {start} and {end}")
+    dataset = read_staging(staging[0], staging[1], columns=columns, date_ranges=[(start, end)],
+                           staging_format=staging[2],
+                           required_columns=None if columns is None else staged_columns(columns))
+    dataset = apply_schema(dataset, dataset_schema(read_meals_dictionary(data_path).keys()), report=True)
+    dataset, _ = encode_features(dataset)
+    return dataset
+
+
 def filter_data(dataset, remove_no_school, remove_outliers, begin_date):
     """
     filter lines out of dataset:
@@ -94,28 +216,45 @@ def evaluate_predictions(reference_data, ref_to_beat, prediction):
     logger.info("prec: %0.2f", precision_calculus(reference_data, prediction))
 
 
+# resolutions of the metrics table other than all the predictions, see evaluation_metrics
+METRICS_RESOLUTIONS = {
+    "cantine_nom": ["cantine_nom"],
+    "date_str": ["date_str"],
+}
+
+
 def evaluate_predictions_by_resolution(column_to_predict, complete_pred_df, predicted_col, resolution):
     """
     evaluates `predicted_col` within dataframe `complete_pred_df` regarding to true_values `column_to_predict`
     after aggregating the values predicting using the list of columns `resolution` to group lines
+    returns the metrics of each group (see metrics.metrics_by_resolution), only their averages are logged
     """
-    logger.info("OURS BY RESOLUTION %s:", resolution)
-    for res, data in complete_pred_df.groupby(resolution):
-        logger.info("***************************")
-        logger.info("res: %s", res)
-        logger.info("expected: %0.2f, predicted: %0.2f", data[column_to_predict].sum(), data[predicted_col].sum())
-        logger.info("R2: %0.2f", r2_score(data[column_to_predict], data[predicted_col]))
-        logger.info("MAE: %0.2f", mean_absolute_error(data[column_to_predict], data[predicted_col]))
-        logger.info("MSE: %0.2f", mean_squared_error(data[column_to_predict], data[predicted_col]))
-        logger.info("weighted prec: %0.2f", weighted_precision_calculus(data[column_to_predict], data[predicted_col]))
-        logger.info("prec: %0.2f", precision_calculus(data[column_to_predict], data[predicted_col]))
+    metrics = metrics_by_resolution(complete_pred_df, column_to_predict, predicted_col, resolution)
+    logger.info("OURS BY RESOLUTION %s: average of %s groups", resolution, len(metrics))
+    log_metrics(metrics.mean())
+    return metrics
+
+
+def evaluation_metrics(preds, column_to_predict):
+    """
+    returns the metrics table (see metrics.metrics_table) of the predictions `output` and `prevision` of preds
+    regarding to column_to_predict for all of them (resolution `all`), for their sums by day (resolution `days`)
+    and for each group of METRICS_RESOLUTIONS
+    """
+    predicted_cols = ["prevision", "output"]
+    by_day = preds.groupby("date_str", observed=True)[[column_to_predict] + predicted_cols].sum()
+    return pd.concat([
+        metrics_table(preds, column_to_predict, predicted_cols, {"all": None}),
+        metrics_table(by_day, column_to_predict, predicted_cols, {"days": None}),
+        metrics_table(preds, column_to_predict, predicted_cols, METRICS_RESOLUTIONS),
+    ], ignore_index=True)
 
 
 def weighted_precision_calculus(ytrue, y_pred):
     """
     computes the weighted precision
     """
-    precision = (1 - abs(y_pred - ytrue) / ytrue).apply(lambda x: max(x, 0))
+    precision = (1 - abs(y_pred - ytrue) / ytrue).clip(lower=0)
     score = ((precision * ytrue).sum()) / (ytrue.sum())
     return score
 
@@ -124,14 +263,63 @@ def precision_calculus(ytrue, y_pred):
     """
     computes the precision
     """
-    precision = (1 - abs(y_pred - ytrue) / ytrue).apply(lambda x: max(x, 0))
+    precision = (1 - abs(y_pred - ytrue) / ytrue).clip(lower=0)
     score = precision.mean()
     return score
 
 
+def model_hyperparameters(training_type, confidence, quantiles=None, eval_metric="numpy", hyperparameters=None):
+    """
+    returns the parameters, other than the training data, which define the models trained with training_type
+    hyperparameters are the ones overriding the default parameters of the xgb model
+    """
+    if training_type == 'xgb':
+        return {"params": dict(app.algorithms.xgb_model.PARAMS, **(hyperparameters or {})), "eval_metric": eval_metric}
+    if training_type == 'xgb_hist':
+        return {
+            "params": app.algorithms.xgb_hist.PARAMS,
+            "categorical_features": app.algorithms.xgb_hist.CATEGORICAL_FEATURES,
+            "native_categorical": app.algorithms.xgb_hist.native_categorical_supported(),
+            "eval_metric": eval_metric,
+        }
+    return {
+        "params": app.algorithms.xgb_interval_prediction.PARAMS,
+        "quantiles": app.algorithms.interval_quantiles(confidence, quantiles),
+        "eval_metric": eval_metric,
+    }
+
+
+def write_feature_importance(feature_importance, column_to_predict, begin_date, end_date):
+    """
+    writes the list of (feature, importance) to the folder output/variables_explicatives
+    """
+    file_fi = f'output/variables_explicatives/{column_to_predict}_{begin_date}_{end_date}.txt'
+    file = open(file_fi, 'w+')
+    for element in feature_importance:
+        file.write(f'{element[0]}: {element[1]}')
+        file.write('\n')
+    file.close()
+
+
+def predict_with_models(metadata, boosters, preds):
+    """
+    adds to preds the predictions `output` of the boosters loaded by artifacts.load_artifacts
+    and the predicted quantiles for xgb_interval models
+    """
+    predictions = predict_with_artifacts(metadata, boosters, preds)
+    if metadata["training_type"] == 'xgb_interval':
+        return app.algorithms.add_quantiles_predictions(
+            preds,
+            metadata["quantiles"],
+            [predictions[app.algorithms.quantile_column(quantile)] for quantile in metadata["quantiles"]])
+    preds['output'] = np.ceil(predictions["model"])
+    return preds
+
+
 # pylint: disable=too-many-statements
 def train_and_predict(column_to_predict, training_type, min_date, max_date, begin_date, end_date,
-                      remove_no_school, remove_outliers, data_path, confidence):
+                      remove_no_school, remove_outliers, data_path, confidence, staging_format="parquet",
+                      quantiles=None, eval_metric="numpy", use_model_cache=True, hyperparameters_path=None):
     """
     performs training and prediction
 
@@ -145,9 +333,27 @@ def train_and_predict(column_to_predict, training_type, min_date, max_date, begi
     remove_outliers: bool, wether of not non outliers days are removed from training set
     data_path: str, folder where data files are stored
     confidence: float, between 0 and 1
+    staging_format: str, format of the preprocessed dataset ('parquet' or 'csv')
+    quantiles: list of floats between 0 and 1, quantiles predicted by xgb_interval instead of confidence bounds
+    eval_metric: str, metric used for early stopping by xgb algorithms ('numpy', 'sklearn' or 'xgboost')
+    use_model_cache: bool, whether models trained on the same data with the same hyperparameters are reused
+    from the folder model_cache.MODEL_CACHE_DIR instead of being trained again
+    hyperparameters_path: str, file of the hyperparameters of the xgb model found by tune.py, default ones if None
     """
+    hyperparameters = None
+    if training_type == 'xgb' and hyperparameters_path:
+        hyperparameters = app.algorithms.load_hyperparameters(hyperparameters_path)
+        logger.info("training with the hyperparameters of %s: %s", hyperparameters_path, hyperparameters)
+
     # split prediction_input/train based on dates
-    train_data, prediction_input_data = split_train_predict(min_date, max_date, begin_date, end_date)
+    train_data, prediction_input_data = split_train_predict(
+        min_date,
+        max_date,
+        begin_date,
+        end_date,
+        training_columns(training_type, data_path),
+        staging_format,
+        dataset_schema(read_meals_dictionary(data_path).keys()))
     train_data = filter_data(train_data, remove_no_school, remove_outliers, begin_date)
 
     if len(train_data) == 0:
@@ -156,41 +362,122 @@ def train_and_predict(column_to_predict, training_type, min_date, max_date, begi
     if len(prediction_input_data) == 0:
         raise MissingDataForPrediction(f"cannot build prediction set between {begin_date} and {end_date}")
 
+    if training_type == "benchmark":
+        preds = app.algorithms.benchmark_train_and_predict(
+            column_to_predict,
+            train_data,
+            prediction_input_data)
+        return finalize_predictions(preds, column_to_predict, begin_date, end_date)
+
+    fingerprint = None
+    if use_model_cache:
+        fingerprint = app.model_cache.training_fingerprint(
+            training_type,
+            column_to_predict,
+            train_data,
+            training_features(training_type, data_path),
+            model_hyperparameters(training_type, confidence, quantiles, eval_metric, hyperparameters))
+        cached_models = app.model_cache.lookup(fingerprint)
+        if cached_models is not None:
+            logger.info("reusing the models %s trained on the same data", fingerprint)
+            metadata, boosters, _ = load_artifacts(cached_models)
+            preds = predict_with_models(metadata, boosters, prediction_input_data)
+            write_feature_importance(metadata["feature_importance"], column_to_predict, begin_date, end_date)
+            directory = artifacts_dir(training_type, column_to_predict)
+            shutil.rmtree(directory, ignore_errors=True)
+            shutil.copytree(cached_models, directory)
+            if os.path.exists(cafeterias_dictionary_path()):
+                shutil.copyfile(cafeterias_dictionary_path(), os.path.join(directory, CAFETERIAS_FILE))
+            return finalize_predictions(preds, column_to_predict, begin_date, end_date)
+
     if training_type == 'xgb':
-        preds, feature_importance = app.algorithms.xgb_train_and_predict(
+        preds, feature_importance, models = app.algorithms.xgb_train_and_predict(
             column_to_predict,
             train_data,
             prediction_input_data,
-            data_path)
-
-        file_fi = f'output/variables_explicatives/{column_to_predict}_{begin_date}_{end_date}.txt'
-        file = open(file_fi, 'w+')
-        for element in feature_importance:
-            file.write(f'{element[0]}: {element[1]}')
-            file.write('\n')
-        file.close()
+            data_path,
+            eval_metric,
+            hyperparameters=hyperparameters)
 
     if training_type == 'xgb_interval':
-        preds, feature_importance = app.algorithms.xgb_interval_train_and_predict(
+        preds, feature_importance, models = app.algorithms.xgb_interval_train_and_predict(
             column_to_predict,
             train_data,
             prediction_input_data,
             confidence,
-            data_path)
-
-        file_fi = f'output/variables_explicatives/{column_to_predict}_{begin_date}_{end_date}.txt'
-        file = open(file_fi, 'w+')
-        for element in feature_importance:
-            file.write(f'{element[0]}: {element[1]}')
-            file.write('\n')
-        file.close()
-
-    if training_type == "benchmark":
-        preds = app.algorithms.benchmark_train_and_predict(
+            data_path,
+            quantiles,
+            eval_metric=eval_metric)
+
+    if training_type == 'xgb_hist':
+        categories = app.algorithms.xgb_hist.feature_categories(
+            train_data, training_features(training_type, data_path))
+        preds, feature_importance, models = app.algorithms.xgb_hist_train_and_predict(
             column_to_predict,
             train_data,
-            prediction_input_data)
+            prediction_input_data,
+            data_path,
+            eval_metric,
+            categories=categories)
+
+    write_feature_importance(feature_importance, column_to_predict, begin_date, end_date)
+
+    metadata = {
+        "training_type": training_type,
+        "column_to_predict": column_to_predict,
+        "training_dates": [min_date, max_date],
+        "features": training_features(training_type, data_path),
+        "menus_categories": list(read_meals_dictionary(data_path).keys()),
+        "encodings": {col: list(train_data[col].cat.categories) for col in ENCODED_FEATURES.values()},
+        "xgboost_version": xgboost.__version__,
+        "feature_importance": [[name, float(importance)] for name, importance in feature_importance],
+    }
+    if training_type == 'xgb':
+        metadata["hyperparameters"] = hyperparameters or {}
+    if training_type == 'xgb_hist':
+        metadata["categorical_features"] = app.algorithms.xgb_hist.CATEGORICAL_FEATURES
+        metadata["categories"] = categories
+    if training_type == 'xgb_interval':
+        metadata["quantiles"] = app.algorithms.interval_quantiles(confidence, quantiles)
+    directory = artifacts_dir(training_type, column_to_predict)
+    save_artifacts(directory, models, metadata, cafeterias_dictionary_path())
+    if fingerprint is not None:
+        app.model_cache.store(fingerprint, directory)
+
+    return finalize_predictions(preds, column_to_predict, begin_date, end_date)
+
 
+def predict_only(column_to_predict, training_type, begin_date, end_date, staging_format="parquet"):
+    """
+    generates predictions between begin_date and end_date with the models last trained with training_type
+    on column_to_predict (see artifacts.save_artifacts), without training
+    only the lines of those dates are read from a preprocessed dataset covering them
+    """
+    metadata, boosters, dictionary = load_artifacts(artifacts_dir(training_type, column_to_predict))
+    logger.info("predicting with %s models trained between %s and %s",
+                training_type, metadata["training_dates"][0], metadata["training_dates"][1])
+
+    columns = BASE_COLUMNS + [col for col in metadata["features"] if col not in BASE_COLUMNS]
+    staging = find_staging(begin_date, end_date, staging_format, columns)
+    if staging is None:
+        raise MissingDataForPrediction(f"no preprocessed dataset covers dates between {begin_date} and {end_date}")
+    start, end, staging_format = staging
+    preds = read_staging(start, end, columns=columns, date_ranges=[(begin_date, end_date)],
+                         staging_format=staging_format, required_columns=staged_columns(columns))
+    if len(preds) == 0:
+        raise MissingDataForPrediction(f"cannot build prediction set between {begin_date} and {end_date}")
+    preds = apply_schema(preds, dataset_schema(metadata["menus_categories"]))
+    preds, _ = encode_features(preds, metadata["encodings"], dictionary)
+
+    preds = predict_with_models(metadata, boosters, preds)
+    return finalize_predictions(preds, column_to_predict, begin_date, end_date)
+
+
+def finalize_predictions(preds, column_to_predict, begin_date, end_date):
+    """
+    forces predictions of non working days to 0, exports predictions `output` of `preds`
+    and evaluates them when the real values of column_to_predict are known
+    """
     # force week_ends, wednesday and holidays to 0 and complete nans
     mask = (preds["working"] == 0)
     preds.loc[mask, "output"] = 0
@@ -211,7 +498,7 @@ def train_and_predict(column_to_predict, training_type, min_date, max_date, begi
         "output",
         f"results_global_{column_to_predict}_{begin_date}_{end_date}.csv")
     export_predictions(
-        preds.groupby(["date_str", "cantine_nom", "cantine_type"])['output'].agg('sum'),
+        preds.groupby(["date_str", "cantine_nom", "cantine_type"], observed=True)['output'].agg('sum').sort_index(),
         "output",
         f"results_by_cafeteria_{column_to_predict}_{begin_date}_{end_date}.csv")
 
@@ -228,10 +515,12 @@ def train_and_predict(column_to_predict, training_type, min_date, max_date, begi
             preds.groupby("date_str")[column_to_predict].sum(),
             preds.groupby("date_str")["prevision"].sum(),
             preds.groupby("date_str")['output'].sum())
-        print("-------- BY CAFETERIAS DETAILS:")
+        print("-------- AVERAGE OF METRICS BY CAFETERIA AND BY DAY")
         evaluate_predictions_by_resolution(column_to_predict, preds, 'output', ['cantine_nom'])
-        print("-------- BY DAY DETAILS:")
         evaluate_predictions_by_resolution(column_to_predict, preds, 'output', ['date_str'])
+        metrics_path = write_metrics(evaluation_metrics(preds, column_to_predict), "output",
+                                     f"metrics_{column_to_predict}_{begin_date}_{end_date}.csv")
+        logger.info("metrics of each cafeteria and of each day are detailed in %s", metrics_path)
 
         preds["relative_error"] = preds["output"] - preds[column_to_predict]
 
@@ -0,0 +1,176 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------
+# run a rolling-origin backtest of school meal forecast app
+# -----------------------------------------------------------
+
+import argparse
+import os
+import sys
+
+from app.backtest import backtest_splits, run_backtest, write_backtest
+from app.exceptions import InconsistentDates
+from app.log import logger
+from app.preprocess import compute_datafiles_related_dataframes, smarter_process_data
+from app.staging import cafeterias_dictionary_path
+from app.train import load_preprocessed_dataset
+from main import prepare_arborescence
+
+
+def load_arguments(args):
+    """
+    Loads arguments from user input through command line
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--data-path",
+        default="data",
+        help="the folder containing data files")
+
+    parser.add_argument(
+        "--start-training-date",
+        default="2012-09-01",
+        help="begin date of all training sets using date format 'YYYY-MM-DD'")
+
+    parser.add_argument(
+        "--first-begin-date",
+        required=True,
+        help="begin date of the first prediction window using date format 'YYYY-MM-DD'")
+
+    parser.add_argument(
+        "--last-begin-date",
+        required=True,
+        help="latest begin date of the prediction windows using date format 'YYYY-MM-DD'")
+
+    parser.add_argument(
+        "--step-weeks",
+        type=int,
+        default=4,
+        help="number of weeks between the begin dates of two prediction windows")
+
+    parser.add_argument(
+        "--horizon-weeks",
+        type=int,
+        default=2,
+        help="number of weeks predicted by each split")
+
+    parser.add_argument(
+        "--week-latency",
+        dest="weeks_latencies",
+        type=int,
+        nargs="+",
+        default=[10],
+        help="the numbers of weeks between the end of training and the beginning of predictions to compare")
+
+    parser.add_argument(
+        "--training-type",
+        dest="training_types",
+        nargs="+",
+        default=["xgb"],
+        choices=["xgb", "xgb_interval", "xgb_hist", "benchmark"],
+        help="the algorithms to compare")
+
+    parser.add_argument(
+        "--column-to-predict",
+        default="reel",
+        choices=["reel", "prevision"],
+        help="the column to predict")
+
+    parser.add_argument(
+        "--confidence",
+        type=float,
+        default=0.90,
+        help="When using xgb_interval, the confidence interval to use for prediction bounds")
+
+    parser.add_argument(
+        "--train-on-no-school-days",
+        dest="remove_no_school",
+        default=True,
+        action="store_false",
+        help="whether no school days should be removed from training sets")
+
+    parser.add_argument(
+        "--train-on-outliers",
+        dest="remove_outliers",
+        default=True,
+        action="store_false",
+        help="whether to include outliers in training sets")
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="number of splits trained concurrently, the number of cpus by default")
+
+    parser.add_argument(
+        "--no-preprocessing",
+        dest="preprocessing",
+        default=True,
+        action="store_false",
+        help="whether the preprocessed dataset covering all splits already exists")
+
+    parser.add_argument(
+        "--staging-format",
+        default="parquet",
+        choices=["parquet", "csv"],
+        help="the format of the preprocessed dataset among 'parquet' or 'csv'")
+
+    return parser.parse_args(args)
+
+
+def main():
+    """
+    preprocesses the dataset covering all splits once then trains and evaluates every split
+    """
+    date_format = "%Y-%m-%d"
+    prepare_arborescence()
+    args = load_arguments(sys.argv[1:])
+
+    splits = backtest_splits(
+        args.start_training_date,
+        args.first_begin_date,
+        args.last_begin_date,
+        args.step_weeks,
+        args.horizon_weeks,
+        args.weeks_latencies,
+        args.training_types,
+        date_format)
+    if not splits:
+        raise InconsistentDates(
+            f"no prediction window between {args.first_begin_date} and {args.last_begin_date} can be trained "
+            f"from {args.start_training_date} with weeks latencies {args.weeks_latencies}")
+    start, end = args.start_training_date, max(split["end_date"] for split in splits)
+
+    if args.preprocessing:
+        logger.info("------------- preprocessing ----------------")
+        smarter_process_data(
+            args.data_path,
+            start,
+            end,
+            [],
+            False,
+            date_format,
+            os.path.join(args.data_path, "cache"),
+            args.staging_format)
+
+    logger.info("------------- backtest of %s splits ----------------", len(splits))
+    dataset = load_preprocessed_dataset(start, end, args.data_path, args.training_types, args.staging_format)
+    # statistical features of each split are computed from the real values of its training set only
+    _, real_values, effectifs = compute_datafiles_related_dataframes(
+        args.data_path, [], date_format, cafeterias_dictionary_path())
+    by_split, by_cafeteria = run_backtest(
+        splits,
+        dataset,
+        real_values,
+        effectifs,
+        args.column_to_predict,
+        args.remove_no_school,
+        args.remove_outliers,
+        args.data_path,
+        args.confidence,
+        args.workers)
+    write_backtest(by_split, by_cafeteria, args.column_to_predict)
+    logger.info("------------- finished ----------------")
+
+
+if __name__ == "__main__":
+    main()
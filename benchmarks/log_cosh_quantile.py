@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------
+# Benchmark the log cosh quantile objective of xgb_interval
+# -----------------------------------------------------------
+import argparse
+import sys
+import timeit
+
+import numpy as np
+from xgboost import XGBRegressor
+
+from app.algorithms.xgb_interval_prediction import log_cosh_quantile
+
+
+def reference_log_cosh_quantile(alpha):
+    """
+    former implementation of the objective, the hessian is computed element by element
+    """
+    def _log_cosh_quantile(y_true, y_pred):
+        err = np.float64(y_pred - y_true)
+        err = np.where(err < 0, np.float64(alpha * err), np.float64((1 - alpha) * err))
+
+        def _f_hess(error):
+            if abs(error) > 350:
+                return 0
+            return 1 / np.cosh(error)**2
+        v_hess = np.vectorize(_f_hess)
+        hess = v_hess(err)
+
+        grad = np.float64(np.tanh(err))
+        return grad, hess
+    return _log_cosh_quantile
+
+
+def load_arguments(args):
+    """
+    Loads arguments from user input through command line
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", dest="lines", type=int, default=100000, help="number of training lines")
+    parser.add_argument("--rounds", dest="rounds", type=int, default=100, help="number of boosting rounds")
+    parser.add_argument("--alpha", dest="alpha", type=float, default=0.95, help="quantile of the objective")
+    return parser.parse_args(args)
+
+
+def time_objective(objective, y_true, y_pred, repeat):
+    """
+    returns the average duration in seconds of a call to objective
+    """
+    return timeit.timeit(lambda: objective(y_true, y_pred), number=repeat) / repeat
+
+
+def time_training(objective, x_data, y_data, rounds):
+    """
+    returns the average duration in seconds of a boosting round using objective
+    """
+    model = XGBRegressor(objective=objective, n_estimators=rounds, max_depth=5, learning_rate=0.09, verbosity=0)
+    duration = timeit.timeit(lambda: model.fit(x_data, y_data), number=1)
+    return duration / rounds
+
+
+def main():
+    """
+    compares the cost per boosting round of the former and the vectorized objectives
+    """
+    args = load_arguments(sys.argv[1:])
+    rng = np.random.RandomState(0)
+    x_data = rng.rand(args.lines, 10)
+    y_data = 500 * x_data[:, 0] + 50 * rng.randn(args.lines)
+    y_pred = y_data + 400 * rng.randn(args.lines)
+
+    reference = reference_log_cosh_quantile(args.alpha)
+    vectorized = log_cosh_quantile(args.alpha)
+
+    grad_ref, hess_ref = reference(y_data, y_pred)
+    grad, hess = vectorized(y_data, y_pred)
+    assert np.allclose(grad_ref, grad) and np.allclose(hess_ref, hess)
+
+    print(f"objective call on {args.lines} lines:")
+    objective_ref = time_objective(reference, y_data, y_pred, 10)
+    objective_vec = time_objective(vectorized, y_data, y_pred, 10)
+    print(f"  former:     {1000 * objective_ref:.3f} ms")
+    print(f"  vectorized: {1000 * objective_vec:.3f} ms ({objective_ref / objective_vec:.1f}x faster)")
+
+    print(f"boosting round on {args.lines} lines ({args.rounds} rounds):")
+    round_ref = time_training(reference, x_data, y_data, args.rounds)
+    round_vec = time_training(vectorized, x_data, y_data, args.rounds)
+    print(f"  former:     {1000 * round_ref:.3f} ms")
+    print(f"  vectorized: {1000 * round_vec:.3f} ms ({round_ref / round_vec:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------
+# Benchmark the xgb_hist model against the xgb model
+# -----------------------------------------------------------
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from app.algorithms import xgb_hist_features, xgb_hist_train_and_predict, xgb_train_and_predict
+from app.algorithms.xgb_hist import native_categorical_supported
+
+
+def load_arguments(args):
+    """
+    Loads arguments from user input through command line
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cafeterias", dest="cafeterias", type=int, default=200, help="number of cafeterias")
+    parser.add_argument("--days", dest="days", type=int, default=800, help="number of days per cafeteria")
+    parser.add_argument("--data-path", dest="data_path", default="tests/data", help="folder of menus.json")
+    return parser.parse_args(args)
+
+
+def scaled_dataset(nb_cafeterias, nb_days, features, seed=0):
+    """
+    returns a dataset of nb_cafeterias x nb_days lines with the features of the models, of which attendance `reel`
+    depends on the cafeteria, its sector, the school year, the headcount and the calendar
+    """
+    rng = np.random.RandomState(seed)
+    dates = pd.date_range("2012-09-03", periods=nb_days, freq="B")
+    dataset = pd.DataFrame({
+        "date_str": np.repeat(dates.strftime("%Y-%m-%d"), nb_cafeterias),
+        "site_id": np.tile(np.arange(nb_cafeterias), nb_days),
+    })
+    dataset["cantine_nom"] = "cafeteria_" + dataset["site_id"].astype(str)
+    dataset["cantine_type"] = "M/E"
+    dataset["secteur_cat"] = dataset["site_id"] % 8
+    dataset["school_year_cat"] = np.repeat((dates - pd.DateOffset(months=8)).year - 2012, nb_cafeterias)
+    for feature in features:
+        if feature not in dataset.columns:
+            dataset[feature] = rng.randint(0, 10, len(dataset))
+    dataset["week"] = np.repeat(dates.isocalendar().week.values.astype(int), nb_cafeterias)
+    dataset["effectif"] = np.tile(rng.randint(50, 400, nb_cafeterias), nb_days) + 10 * dataset["school_year_cat"]
+
+    cafeteria_rate = rng.uniform(0.5, 0.95, nb_cafeterias)
+    sector_shift = rng.normal(0, 20, 8)
+    dataset["reel"] = (
+        cafeteria_rate[dataset["site_id"]] * dataset["effectif"]
+        + sector_shift[dataset["secteur_cat"]]
+        - 3 * dataset["holidays_in"]
+        + 10 * np.sin(dataset["week"] / 52 * 2 * np.pi)
+        + rng.normal(0, 10, len(dataset)))
+    return dataset
+
+
+def time_model(train_and_predict, dataset, end_training, data_path):
+    """
+    returns the duration in seconds of the training and prediction of train_and_predict,
+    and the mean absolute error of its predictions after end_training
+    """
+    train_data = dataset.loc[dataset["date_str"] <= end_training]
+    evaluation_data = dataset.loc[dataset["date_str"] > end_training].copy()
+    result = {}
+
+    def _train():
+        result["preds"], _, _ = train_and_predict("reel", train_data, evaluation_data, data_path)
+    duration = timeit.timeit(_train, number=1)
+    return duration, np.abs(result["preds"]["output"] - result["preds"]["reel"]).mean()
+
+
+def main():
+    """
+    compares the duration and the accuracy of the xgb and xgb_hist models on a scaled-up dataset
+    """
+    args = load_arguments(sys.argv[1:])
+    os.makedirs("output/figs", exist_ok=True)
+    dataset = scaled_dataset(args.cafeterias, args.days, xgb_hist_features(args.data_path))
+    dates = np.sort(dataset["date_str"].unique())
+    end_training = dates[int(len(dates) * 0.9)]
+
+    print(f"training on {(dataset['date_str'] <= end_training).sum()} lines, "
+          f"predicting {(dataset['date_str'] > end_training).sum()} lines after {end_training}")
+    print(f"native categorical features: {native_categorical_supported()}")
+    xgb_duration, xgb_mae = time_model(xgb_train_and_predict, dataset, end_training, args.data_path)
+    hist_duration, hist_mae = time_model(xgb_hist_train_and_predict, dataset, end_training, args.data_path)
+    print(f"  xgb:      {xgb_duration:.2f} s, MAE {xgb_mae:.2f}")
+    print(f"  xgb_hist: {hist_duration:.2f} s ({xgb_duration / hist_duration:.1f}x faster), MAE {hist_mae:.2f}")
+
+
+if __name__ == "__main__":
+    main()
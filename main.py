@@ -12,7 +12,8 @@ from pathlib import Path
 
 from app.log import logger
 from app.preprocess import compute_min_max_date, smarter_process_data
-from app.train import train_and_predict
+from app.staging import find_staging
+from app.train import predict_only, train_and_predict, training_columns
 
 
 def load_arguments(args):
@@ -27,6 +28,37 @@ def load_arguments(args):
         action='store_false',
         help="whether features should be recaulated or not")
 
+    parser.add_argument(
+        "--predict-only",
+        dest='predict_only',
+        default=False,
+        action='store_true',
+        help="whether predictions should be generated with the last trained models instead of training new ones")
+
+    parser.add_argument(
+        "--training-columns-only",
+        dest='training_columns_only',
+        default=False,
+        action='store_true',
+        help="whether preprocessing should only compute the dates related features used by the training type")
+
+    parser.add_argument(
+        "--no-cache",
+        dest='use_cache',
+        default=True,
+        action='store_false',
+        help="whether intermediate features should not be cached in the folder {data-path}/cache"
+             " and trained models not reused from the folder output/models/cache")
+
+    parser.add_argument(
+        "--staging-format",
+        dest='staging_format',
+        type=str,
+        nargs='?',
+        default='parquet',
+        choices=['parquet', 'csv'],
+        help="the format of the preprocessed dataset among 'parquet' or 'csv'")
+
     parser.add_argument(
         "--train-on-no-school-days",
         dest='remove_no_school',
@@ -47,7 +79,7 @@ def load_arguments(args):
         type=str,
         nargs='?',
         default='xgb',
-        help="the algo type to train among 'xgb' or 'prophet'")
+        help="the algo type to train among 'xgb', 'xgb_interval', 'xgb_hist' or 'benchmark'")
 
     parser.add_argument(
         "--confidence",
@@ -57,6 +89,31 @@ def load_arguments(args):
         default=0.90,
         help="When using xgb_interval, the confidence interval to use for prediction bounds")
 
+    parser.add_argument(
+        "--quantiles",
+        dest='quantiles',
+        type=float,
+        nargs='+',
+        default=None,
+        help="When using xgb_interval, the quantiles to predict instead of the bounds of the confidence interval")
+
+    parser.add_argument(
+        "--eval-metric",
+        dest='eval_metric',
+        type=str,
+        nargs='?',
+        default='numpy',
+        choices=['numpy', 'sklearn', 'xgboost'],
+        help="the implementation of the metrics used for early stopping among 'numpy', 'sklearn' or 'xgboost'")
+
+    parser.add_argument(
+        "--xgb-hyperparameters",
+        dest='hyperparameters_path',
+        type=str,
+        nargs='?',
+        default=None,
+        help="When using xgb, the file of the hyperparameters found by tune.py to train with instead of the default ones")
+
     parser.add_argument(
         "--start-training-date",
         dest='start_training_date',
@@ -131,6 +188,8 @@ def prepare_arborescence():
         "staging": "output/staging",
         "figures": "output/figs",
         "features_importance": "output/variables_explicatives",
+        "models": "output/models",
+        "backtest": "output/backtest",
     }
     for _, directory in project_directories.items():
         Path(directory).mkdir(parents=True, exist_ok=True)
@@ -143,12 +202,15 @@ def run(args):
     date_format = '%Y-%m-%d'
     include_wednesday = False
 
-    min_date, max_date = compute_min_max_date(
-        args.start_training_date,
-        args.begin_date,
-        args.end_date,
-        date_format,
-        args.weeks_latency)
+    # arguments providen by the shiny app may not define the most recent options
+    cache_path = os.path.join(args.data_path, "cache") if getattr(args, "use_cache", True) else None
+    staging_format = getattr(args, "staging_format", "parquet")
+    quantiles = getattr(args, "quantiles", None)
+    eval_metric = getattr(args, "eval_metric", "numpy")
+    predict_only_mode = getattr(args, "predict_only", False)
+    use_model_cache = getattr(args, "use_cache", True)
+    hyperparameters_path = getattr(args, "hyperparameters_path", None)
+    training_columns_only = getattr(args, "training_columns_only", False)
 
     if args.school_cafeteria:
         school_cafeterias = [args.school_cafeteria]
@@ -178,13 +240,60 @@ def run(args):
     if missing_calculator_data or missing_mapping_data or missing_raw_data:
         return
 
+    # predictions of already trained models do not depend on training dates
+    min_date, max_date = None, None
+    if not predict_only_mode:
+        min_date, max_date = compute_min_max_date(
+            args.start_training_date,
+            args.begin_date,
+            args.end_date,
+            date_format,
+            args.weeks_latency)
+
     # start computation
-    if args.preprocessing:
+    if args.preprocessing and predict_only_mode:
+        staging = find_staging(args.begin_date, args.end_date, staging_format,
+                               training_columns(args.training_type, args.data_path))
+        if staging is not None:
+            logger.info("predicting the lines of the preprocessed dataset between %s and %s", staging[0], staging[1])
+        else:
+            logger.info("------------- preprocessing of the predicted dates ----------------")
+            smarter_process_data(
+                args.data_path,
+                args.begin_date,
+                args.end_date,
+                school_cafeterias,
+                include_wednesday,
+                date_format,
+                cache_path,
+                staging_format,
+                columns=training_columns(args.training_type, args.data_path) if training_columns_only else None,
+                statistics_start=args.start_training_date)
+            logger.info("------------- preprocessing finished ----------------")
+    elif args.preprocessing:
         logger.info("------------- preprocessing ----------------")
-        smarter_process_data(args.data_path, min_date, args.end_date, school_cafeterias, include_wednesday, date_format)
+        smarter_process_data(
+            args.data_path,
+            min_date,
+            args.end_date,
+            school_cafeterias,
+            include_wednesday,
+            date_format,
+            cache_path,
+            staging_format,
+            training_columns(args.training_type, args.data_path) if training_columns_only else None)
         logger.info("------------- preprocessing finished ----------------")
 
-    if args.prediction_mode and args.training_type:
+    if args.prediction_mode and args.training_type and predict_only_mode:
+        logger.info("------------- prediction step ----------------")
+        _ = predict_only(
+            args.column_to_predict,
+            args.training_type,
+            args.begin_date,
+            args.end_date,
+            staging_format)
+        logger.info("------------- finished ----------------")
+    elif args.prediction_mode and args.training_type:
         logger.info("------------- train & prediction step ----------------")
         _ = train_and_predict(
             args.column_to_predict,
@@ -196,7 +305,12 @@ def run(args):
             args.remove_no_school,
             args.remove_outliers,
             args.data_path,
-            args.confidence)
+            args.confidence,
+            staging_format,
+            quantiles,
+            eval_metric,
+            use_model_cache,
+            hyperparameters_path)
         logger.info("------------- finished ----------------")
 
 
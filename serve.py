@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------
+# run the forecast service of school meal forecast app
+# -----------------------------------------------------------
+
+import argparse
+import sys
+
+from app.log import logger
+from app.server import load_service, serve
+
+
+def load_arguments(args):
+    """
+    Loads arguments from user input through command line
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="address the service listens to")
+
+    parser.add_argument(
+        "--port",
+        default=8000,
+        type=int,
+        help="port the service listens to")
+
+    parser.add_argument(
+        "--training-type",
+        default="xgb",
+        choices=["xgb", "xgb_interval", "xgb_hist"],
+        help="forecasts are generated by the models last trained with this training type")
+
+    parser.add_argument(
+        "--column-to-predict",
+        default="reel",
+        choices=["reel", "prevision"],
+        help="forecasts are generated by the models last trained on this column")
+
+    parser.add_argument(
+        "--begin-date",
+        default=None,
+        help="first date which can be forecasted, first date of the preprocessed dataset if not providen")
+
+    parser.add_argument(
+        "--end-date",
+        default=None,
+        help="last date which can be forecasted, last date of the preprocessed dataset if not providen")
+
+    parser.add_argument(
+        "--staging-format",
+        default="parquet",
+        choices=["parquet", "csv"],
+        help="preferred format of the preprocessed dataset to load")
+
+    parser.add_argument(
+        "--batch-delay",
+        default=10,
+        type=float,
+        help="milliseconds to wait for concurrent requests to predict them together")
+
+    return parser.parse_args(args)
+
+
+def main():
+    """
+    loads the models and the features once then answers forecast requests until interrupted
+    """
+    args = load_arguments(sys.argv[1:])
+    service = load_service(
+        args.training_type,
+        args.column_to_predict,
+        args.begin_date,
+        args.end_date,
+        args.staging_format,
+        args.batch_delay / 1000)
+    server = serve(service, args.host, args.port)
+    logger.info("forecast service listening on http://%s:%s", args.host, server.server_address[1])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
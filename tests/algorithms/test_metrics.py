@@ -0,0 +1,36 @@
+#!/usr/bin/python3
+import unittest
+
+import numpy as np
+from xgboost import DMatrix
+
+from app.algorithms.metrics import early_stopping_metric, multi_custom_metrics, numpy_metrics
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.y_true = rng.randint(0, 500, size=1000).astype(np.float32)
+        self.y_pred = (self.y_true + 30 * rng.randn(1000)).astype(np.float32)
+        self.dtrain = DMatrix(np.zeros((1000, 1)), label=self.y_true)
+
+    def test_numpy_metrics(self):
+        expected = multi_custom_metrics(self.y_pred, self.dtrain)
+        result = numpy_metrics(self.y_pred, self.dtrain)
+        self.assertEqual([name for name, _ in result], [name for name, _ in expected])
+        for (_, value), (_, expected_value) in zip(result, expected):
+            self.assertAlmostEqual(value, expected_value, places=4)
+
+    def test_early_stopping_metric(self):
+        metric, timer = early_stopping_metric("numpy")
+        metric(self.y_pred, self.dtrain)
+        metric(self.y_pred, self.dtrain)
+        self.assertEqual(timer["calls"], 2)
+        self.assertGreater(timer["seconds"], 0)
+
+        self.assertEqual(early_stopping_metric("xgboost")[0], ["mae", "rmse"])
+        self.assertRaises(ValueError, early_stopping_metric, "r2")
+
+
+if __name__ == '__main__':
+    unittest.main()
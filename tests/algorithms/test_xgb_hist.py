@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import xgboost
+
+from app.algorithms.xgb_hist import CATEGORICAL_FEATURES, feature_categories, feature_matrix, \
+    native_categorical_supported, xgb_hist_features, xgb_hist_train_and_predict
+from app.algorithms.xgb_model import xgb_features
+from app.artifacts import load_artifacts, predict_with_artifacts, save_artifacts
+
+
+class TestXgbHist(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_xgb_hist_features(self):
+        features = xgb_hist_features("tests/data")
+        self.assertEqual(sorted(features), sorted(xgb_features("tests/data") + ["school_year_cat"]))
+        for feature in CATEGORICAL_FEATURES:
+            self.assertIn(feature, features)
+
+    def test_feature_matrix(self):
+        dataset = pd.DataFrame({"site_id": [0, 1, 2], "week": [1.0, np.nan, 3.0], "other": ["a", "b", "c"]})
+        matrix = feature_matrix(dataset, ["site_id", "week"], CATEGORICAL_FEATURES, label=[1, 2, 3])
+        self.assertEqual((matrix.num_row(), matrix.num_col()), (3, 2))
+        self.assertEqual(matrix.feature_names, ["site_id", "week"])
+        np.testing.assert_array_equal(matrix.get_label(), [1, 2, 3])
+
+    def test_xgb_hist_train_and_predict(self):
+        rng = np.random.RandomState(0)
+        features = xgb_hist_features("tests/data")
+        train_data = pd.DataFrame(rng.randint(0, 5, size=(300, len(features))), columns=features)
+        train_data["reel"] = 100 + 20 * train_data["site_id"] + rng.randint(0, 10, size=300)
+        train_data.loc[0, "week"] = np.nan
+        train_data["cantine_nom"] = "A"
+        train_data["cantine_type"] = "M"
+        train_data["date_str"] = "2017-01-02"
+        evaluation_data = train_data.iloc[:20].copy()
+
+        with mock.patch("app.algorithms.xgb_hist.plot_curve"):
+            preds, feature_importance, models = xgb_hist_train_and_predict(
+                "reel", train_data, evaluation_data, "tests/data", n_threads=1)
+        self.assertEqual(feature_importance[0][0], "site_id")
+        self.assertAlmostEqual(sum(importance for _, importance in feature_importance), 1)
+        errors = (preds["output"] - preds["reel"]).abs()
+        self.assertLess(errors.mean(), 10)
+
+        # the booster is saved and predicts the same values once loaded
+        save_artifacts(self.directory, models, {"features": features, "categorical_features": CATEGORICAL_FEATURES})
+        metadata, boosters, _ = load_artifacts(self.directory)
+        predictions = predict_with_artifacts(metadata, boosters, evaluation_data)
+        np.testing.assert_array_equal(np.ceil(predictions["model"]), preds["output"])
+
+    @unittest.skipUnless(native_categorical_supported(), "xgboost does not split on categories")
+    def test_save_and_load_categorical_splits(self):
+        rng = np.random.RandomState(0)
+        dataset = pd.DataFrame({"site_id": rng.randint(0, 10, 200), "week": rng.randint(1, 53, 200)})
+        label = 10 * (dataset["site_id"] % 3) + rng.rand(200)
+        categories = feature_categories(dataset, ["site_id", "week"])
+        self.assertEqual(categories, {"site_id": list(range(10))})
+        matrix = feature_matrix(dataset, ["site_id", "week"], CATEGORICAL_FEATURES, label=label, categories=categories)
+        booster = xgboost.train({"tree_method": "hist", "max_cat_to_onehot": 1}, matrix, num_boost_round=5)
+
+        save_artifacts(self.directory, {"model": booster}, {
+            "features": ["site_id", "week"], "categorical_features": CATEGORICAL_FEATURES, "categories": categories})
+        metadata, boosters, _ = load_artifacts(self.directory)
+        # lines of a few sites only, their codes would differ from the ones of the training categories
+        subset = dataset.loc[dataset["site_id"].isin([4, 7, 9])].reset_index(drop=True)
+        predictions = predict_with_artifacts(metadata, boosters, subset)
+        lines = np.flatnonzero(dataset["site_id"].isin([4, 7, 9]))
+        np.testing.assert_array_equal(predictions["model"], booster.predict(matrix)[lines])
+        self.assertGreater(len(np.unique(predictions["model"][subset["site_id"] != 7])), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from app.algorithms.xgb_interval_prediction import interval_quantiles, log_cosh_quantile, quantile_column, \
+    thread_budget, xgb_interval_features, xgb_interval_train_and_predict
+
+
+class TestLogCoshQuantile(unittest.TestCase):
+    def test_log_cosh_quantile(self):
+        alpha = 0.9
+        y_true = np.array([10.0, 10.0, 10.0, 0.0, 5000.0])
+        y_pred = np.array([12.0, 10.0, 9.0, 4000.0, 0.0])
+        grad, hess = log_cosh_quantile(alpha)(y_true, y_pred)
+
+        err = np.array([(1 - alpha) * 2, 0, alpha * -1, (1 - alpha) * 4000, alpha * -5000])
+        np.testing.assert_allclose(grad, np.tanh(err))
+        # hessian is approximated by 0 for large errors
+        np.testing.assert_allclose(hess, [1 / np.cosh(err[0])**2, 1, 1 / np.cosh(err[2])**2, 0, 0])
+        self.assertEqual(hess.dtype, np.float64)
+
+    def test_log_cosh_quantile_clipped_first(self):
+        # the hessian remains a float array when its first value is clipped
+        _, hess = log_cosh_quantile(0.5)(np.array([0.0, 0.0]), np.array([1000.0, 0.5]))
+        np.testing.assert_allclose(hess, [0, 1 / np.cosh(0.25)**2])
+
+
+class TestXgbInterval(unittest.TestCase):
+    def test_interval_quantiles(self):
+        np.testing.assert_allclose(interval_quantiles(0.9), [0.05, 0.95])
+        self.assertEqual(interval_quantiles(0.9, [0.95, 0.05, 0.5, 0.95]), [0.05, 0.5, 0.95])
+        self.assertRaises(ValueError, interval_quantiles, 0.9, [0.5, 1.5])
+
+    def test_thread_budget(self):
+        self.assertEqual(thread_budget(3, 8), (3, 2))
+        self.assertEqual(thread_budget(2, 1), (1, 1))
+        self.assertEqual(thread_budget(5, 4), (4, 1))
+
+    def test_xgb_interval_train_and_predict(self):
+        rng = np.random.RandomState(0)
+        features = xgb_interval_features("tests/data")
+        train_data = pd.DataFrame(rng.randint(0, 5, size=(300, len(features))), columns=features)
+        train_data["reel"] = 100 + 20 * train_data["week"] + rng.randint(0, 10, size=300)
+        train_data["cantine_nom"] = "A"
+        train_data["cantine_type"] = "M"
+        train_data["date_str"] = "2017-01-02"
+        evaluation_data = train_data.iloc[:20].copy()
+
+        quantiles = [0.05, 0.5, 0.95]
+        with mock.patch("app.algorithms.xgb_interval_prediction.plot_curve"):
+            preds, _, models = xgb_interval_train_and_predict(
+                "reel", train_data, evaluation_data, 0.9, "tests/data", quantiles, n_threads=2)
+        self.assertEqual(list(models), [quantile_column(quantile) for quantile in quantiles])
+        for quantile in quantiles:
+            self.assertIn(quantile_column(quantile), preds.columns)
+        pd.testing.assert_series_equal(preds["pred_lower_bound"], preds[quantile_column(0.05)], check_names=False)
+        pd.testing.assert_series_equal(preds["pred_upper_bound"], preds[quantile_column(0.95)], check_names=False)
+        pd.testing.assert_series_equal(
+            preds["output"], preds[[quantile_column(quantile) for quantile in quantiles]].max(axis=1),
+            check_names=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
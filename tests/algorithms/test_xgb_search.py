@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.algorithms.xgb_model import PARAMS
+from app.algorithms.xgb_search import SEARCH_SPACE, load_hyperparameters, sample_candidates, save_hyperparameters, \
+    search_hyperparameters, time_split
+
+
+class TestXgbSearch(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        rng = np.random.RandomState(0)
+        dates = pd.date_range("2017-01-02", "2017-04-30").strftime("%Y-%m-%d")
+        self.train_data = pd.DataFrame({"date_str": np.repeat(dates, 3)})
+        self.train_data["week"] = rng.randint(1, 53, len(self.train_data))
+        self.train_data["effectif"] = rng.randint(50, 300, len(self.train_data)).astype(float)
+        self.train_data["reel"] = 0.8 * self.train_data["effectif"] + rng.randn(len(self.train_data))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_sample_candidates(self):
+        candidates = sample_candidates(5, seed=1)
+        self.assertEqual(len(candidates), 5)
+        self.assertEqual(candidates[0], {name: PARAMS[name] for name in SEARCH_SPACE})
+        self.assertEqual(candidates, sample_candidates(5, seed=1))
+        self.assertNotEqual(candidates[1:], sample_candidates(5, seed=2)[1:])
+
+    def test_time_split(self):
+        self.train_data.loc[0, "week"] = np.nan
+        train_x, train_y, validation_x, validation_y = time_split(self.train_data, ["week", "effectif"], "reel", 0.25)
+        self.assertEqual(len(train_x) + len(validation_x), len(self.train_data) - 1)
+        self.assertEqual(len(validation_y), 30 * 3)
+        self.assertEqual(train_x.dtype, np.float64)
+        # validation lines are the ones of the last dates
+        np.testing.assert_array_equal(validation_y, self.train_data["reel"].values[-90:])
+        self.assertEqual(len(train_y), len(train_x))
+
+    def test_search_hyperparameters(self):
+        split = time_split(self.train_data, ["week", "effectif"], "reel")
+        candidates = sample_candidates(4)
+        best, evaluations = search_hyperparameters(split, candidates, "halving", min_rounds=10, max_rounds=40,
+                                                   eta=2, workers=2)
+        self.assertEqual([evaluation["n_estimators"] for evaluation in evaluations], [10] * 4 + [20] * 2 + [40])
+        self.assertEqual(candidates[evaluations[-1]["candidate"]], best)
+        # the best candidate of each round is kept
+        self.assertEqual(evaluations[-1]["candidate"], min(evaluations[4:6], key=lambda e: e["rmse"])["candidate"])
+
+        _, evaluations = search_hyperparameters(split, candidates, "random", max_rounds=20, workers=1)
+        self.assertEqual([evaluation["n_estimators"] for evaluation in evaluations], [20] * 4)
+        self.assertRaises(ValueError, search_hyperparameters, split, candidates, "grid")
+
+    def test_save_and_load_hyperparameters(self):
+        file_path = os.path.join(self.directory, "hyperparameters.json")
+        save_hyperparameters({"max_depth": 3}, file_path, method="random")
+        self.assertEqual(load_hyperparameters(file_path), {"max_depth": 3})
+
+        with open(file_path, "w") as f_out:
+            json.dump({"hyperparameters": {"depth": 3}}, f_out)
+        self.assertRaises(ValueError, load_hyperparameters, file_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+#!/usr/bin/python3
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from xgboost import XGBRegressor
+
+from app.artifacts import load_artifacts, predict_with_artifacts, save_artifacts
+from app.exceptions import MissingDataForPrediction, MissingModelArtifacts
+
+
+class TestArtifacts(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        rng = np.random.RandomState(0)
+        self.dataset = pd.DataFrame({"week": rng.randint(1, 53, 200), "effectif": rng.randint(50, 300, 200)})
+        self.target = 0.8 * self.dataset["effectif"] + rng.randn(200)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_save_and_load_artifacts(self):
+        model = XGBRegressor(n_estimators=300, random_state=0)
+        model.fit(self.dataset, self.target, eval_set=[(self.dataset, self.target)], early_stopping_rounds=5,
+                  verbose=False)
+        save_artifacts(self.directory, {"model": model}, {"features": ["week", "effectif"]})
+
+        metadata, boosters, dictionary = load_artifacts(self.directory)
+        self.assertEqual(metadata["models"]["model"]["ntree_limit"], model.best_ntree_limit)
+        self.assertIsNone(dictionary)
+        # columns are selected by name
+        predictions = predict_with_artifacts(metadata, boosters, self.dataset[["effectif", "week"]])
+        np.testing.assert_array_equal(predictions["model"], model.predict(self.dataset))
+
+        self.assertRaises(MissingDataForPrediction, predict_with_artifacts, metadata, boosters,
+                          self.dataset[["week"]])
+
+    def test_missing_artifacts(self):
+        self.assertRaises(MissingModelArtifacts, load_artifacts, self.directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
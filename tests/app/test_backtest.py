@@ -0,0 +1,133 @@
+#!/usr/bin/python3
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import app.backtest
+from app.backtest import backtest_splits, evaluate_split, run_backtest, run_split, split_statistics
+from app.encodings import day_numbers
+
+
+def backtest_inputs(first, last, reel):
+    """
+    returns a dataset of two cafeterias between first and last of which real values are reel(dates),
+    with the real values and headcounts it has been preprocessed from
+    """
+    dates = pd.date_range(first, last)
+    dataset = pd.DataFrame([(date, cafeteria_id) for date in dates for cafeteria_id in [0, 1]],
+                           columns=["date", "cafeteria_id"])
+    dataset["date_str"] = dataset["date"].dt.strftime("%Y-%m-%d")
+    dataset["cantine_nom"] = np.where(dataset["cafeteria_id"] == 0, "A", "B")
+    dataset["cantine_type"] = "M"
+    year = dataset["date"].dt.year - (dataset["date"].dt.month < 9)
+    dataset["annee_scolaire"] = year.astype(str) + "-" + (year + 1).astype(str)
+    dataset["week"] = dataset["date"].dt.isocalendar().week.astype(int)
+    dataset["working"] = 1
+    dataset["effectif"] = 100
+    dataset["reel"] = pd.Series(reel(dataset["date"]), index=dataset.index, dtype=float)
+    dataset["prevision"] = dataset["reel"]
+    for col in ["greve", "upper_outlier", "lower_outlier"]:
+        dataset[col] = 0
+    # statistics of the whole dataset, computed again for each split
+    dataset["frequentation_reel"] = dataset["reel"].mean() / 100
+    dataset["frequentation_prevue"] = dataset["frequentation_reel"]
+    dataset = dataset.drop(columns=["date"])
+
+    real_values = dataset[["cafeteria_id", "prevision", "reel"]].copy()
+    real_values.insert(1, "day_number", day_numbers(dataset["date_str"], "%Y-%m-%d"))
+    effectifs = dataset.groupby(["annee_scolaire", "cafeteria_id"])["effectif"].first()
+    return dataset, real_values, effectifs
+
+
+class TestBacktest(unittest.TestCase):
+    def test_backtest_splits(self):
+        splits = backtest_splits("2016-09-01", "2017-09-04", "2017-10-02", step_weeks=2, horizon_weeks=1,
+                                 weeks_latencies=[2, 10], training_types=["xgb", "benchmark"])
+        self.assertEqual(len(splits), 3 * 2 * 2)
+        self.assertEqual(splits[0], {
+            "split": 0,
+            "training_type": "xgb",
+            "weeks_latency": 2,
+            "min_date": "2016-09-01",
+            "max_date": "2017-08-21",
+            "begin_date": "2017-09-04",
+            "end_date": "2017-09-10",
+        })
+        self.assertEqual([split["begin_date"] for split in splits[::4]], ["2017-09-04", "2017-09-18", "2017-10-02"])
+        self.assertEqual(splits[3]["max_date"], "2017-06-26")
+
+    def test_inconsistent_windows_are_skipped(self):
+        # training sets of the first two windows would end before start_training_date
+        splits = backtest_splits("2017-09-10", "2017-09-04", "2017-10-02", step_weeks=2, horizon_weeks=1,
+                                 weeks_latencies=[2])
+        self.assertEqual([(split["split"], split["begin_date"]) for split in splits], [(0, "2017-10-02")])
+        self.assertEqual(backtest_splits("2017-09-10", "2017-09-04", "2017-09-05"), [])
+
+    def test_run_split_does_not_plot(self):
+        dataset, real_values, effectifs = backtest_inputs("2017-01-02", "2017-01-15", lambda dates: 100)
+        split = {"split": 0, "training_type": "xgb", "weeks_latency": 1, "min_date": "2017-01-02",
+                 "max_date": "2017-01-02", "begin_date": "2017-01-09", "end_date": "2017-01-15"}
+        calendar = dataset[["date_str", "annee_scolaire", "week"]]
+        app.backtest._init_worker(dataset, (calendar, real_values, effectifs))  # pylint: disable=protected-access
+        with mock.patch("app.algorithms.xgb_train_and_predict",
+                        side_effect=lambda *args, **kwargs: (args[2].assign(output=90.0), [], {})) as train:
+            by_split, _ = run_split(split, "reel", False, False, "tests/data", 0.9)
+        self.assertFalse(train.call_args[1]["plot"])
+        self.assertAlmostEqual(by_split["mae"], 10)
+
+    def test_split_statistics_do_not_depend_on_later_values(self):
+        dataset, real_values, effectifs = backtest_inputs(
+            "2016-01-04", "2017-03-26", lambda dates: np.where(dates.dt.year == 2016, 80, 60 + dates.dt.day))
+        calendar = dataset[["date_str", "annee_scolaire", "week"]].drop_duplicates("date_str")
+        lines = dataset[dataset["date_str"] >= "2017-01-02"]
+        statistics = split_statistics(lines, calendar, real_values, effectifs, "2017-02-19")
+        self.assertEqual(list(statistics.columns), list(lines.columns))
+        # weeks predicted after the training set only have the values of 2016
+        predicted = statistics[statistics["date_str"] >= "2017-03-06"]
+        np.testing.assert_allclose(predicted["frequentation_reel"], 0.8)
+
+        later = day_numbers(pd.Series(["2017-02-20"]), "%Y-%m-%d")[0]
+        changed = real_values.assign(reel=np.where(real_values["day_number"] >= later, 500, real_values["reel"]))
+        pd.testing.assert_frame_equal(split_statistics(lines, calendar, changed, effectifs, "2017-02-19"), statistics)
+        self.assertFalse(split_statistics(lines, calendar, changed, effectifs, "2017-03-05").equals(statistics))
+
+    def test_evaluate_split(self):
+        preds = pd.DataFrame({
+            "cantine_nom": ["A", "A", "B", "B", "B"],
+            "cantine_type": "M",
+            "working": [1, 1, 1, 0, 1],
+            "reel": [100.0, 200.0, 50.0, 80.0, 0.0],
+            "output": [110.0, 200.0, 100.0, 0.0, 10.0],
+        })
+        by_split, by_cafeteria = evaluate_split({"split": 3}, preds, "reel")
+        self.assertEqual(by_split["split"], 3)
+        self.assertEqual(by_split["nb_predictions"], 3)
+        self.assertAlmostEqual(by_split["mae"], 20)
+        self.assertAlmostEqual(by_split["weighted_precision"], (90 + 200) / 350)
+        self.assertAlmostEqual(by_split["precision"], 0.9 / 3 + 1 / 3)
+        self.assertEqual([(metrics["cantine_nom"], metrics["nb_predictions"]) for metrics in by_cafeteria],
+                         [("A", 2), ("B", 1)])
+
+    def test_run_backtest(self):
+        rng = np.random.RandomState(0)
+        # the benchmark predicts the values of 2016 for the same weeks
+        dataset, real_values, effectifs = backtest_inputs(
+            "2016-01-04", "2017-03-26", lambda dates: np.where(dates.dt.year == 2016, 80, rng.randint(70, 90, len(dates))))
+
+        splits = backtest_splits("2017-01-02", "2017-02-27", "2017-03-13", step_weeks=2, horizon_weeks=2,
+                                 weeks_latencies=[1], training_types=["benchmark"])
+        # the prediction window of the last split is after the dataset
+        splits.append(dict(splits[0], split=2, begin_date="2017-04-03", end_date="2017-04-16"))
+        by_split, by_cafeteria = run_backtest(splits, dataset, real_values, effectifs, "reel", data_path="tests/data",
+                                              workers=2)
+        self.assertEqual(list(by_split["split"]), [0, 1])
+        self.assertEqual(list(by_split["nb_predictions"]), [28, 28])
+        self.assertEqual(len(by_cafeteria), 4)
+        expected = dataset.loc[dataset["date_str"] >= "2017-02-27", "reel"]
+        self.assertAlmostEqual(by_split["mae"].mean(), (expected - 80).abs().mean())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from app.calendar_store import load_calendar_features
+from app.preprocess import compute_dates_dataframe
+
+
+class TestCalendarStore(unittest.TestCase):
+    def setUp(self):
+        self.cache_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_path)
+
+    def test_compute_dates_dataframe_extends_store(self):
+        date_format = "%Y-%m-%d"
+        reference, _ = compute_dates_dataframe("2015-06-01", "2018-10-22", date_format, "tests/data", False)
+
+        compute_dates_dataframe("2016-10-01", "2017-03-01", date_format, "tests/data", False, self.cache_path)
+        all_data, _ = compute_dates_dataframe("2015-06-01", "2018-10-22", date_format, "tests/data", False, self.cache_path)
+        pd.testing.assert_frame_equal(reference, all_data, check_dtype=False)
+
+        # dates already stored are read from the store
+        all_data, _ = compute_dates_dataframe("2016-01-01", "2017-01-01", date_format, "tests/data", False, self.cache_path)
+        expected = reference[(reference["date_str"] >= "2016-01-01") & (reference["date_str"] <= "2017-03-12")]
+        pd.testing.assert_frame_equal(expected.reset_index(drop=True), all_data, check_dtype=False)
+
+    def test_cached_features_equal_uncached_ones(self):
+        date_format = "%Y-%m-%d"
+        compute_dates_dataframe("2016-01-01", "2018-12-31", date_format, "tests/data", False, self.cache_path)
+        for start, end in [("2017-01-01", "2017-06-30"), ("2015-03-01", "2016-02-01"), ("2018-09-01", "2019-03-01")]:
+            cached, _ = compute_dates_dataframe(start, end, date_format, "tests/data", False, self.cache_path)
+            uncached, _ = compute_dates_dataframe(start, end, date_format, "tests/data", False)
+            pd.testing.assert_frame_equal(uncached, cached, check_dtype=False)
+
+    def test_restricted_columns_are_read_from_the_store(self):
+        date_format = "%Y-%m-%d"
+        columns = ["week", "working", "noel"]
+        compute_dates_dataframe("2017-01-01", "2017-06-30", date_format, "tests/data", False, self.cache_path)
+        with mock.patch("app.preprocess.add_calendar_features") as compute:
+            cached, _ = compute_dates_dataframe("2017-01-01", "2017-06-30", date_format, "tests/data", False,
+                                                self.cache_path, columns)
+        compute.assert_not_called()
+        uncached, _ = compute_dates_dataframe("2017-01-01", "2017-06-30", date_format, "tests/data", False,
+                                              columns=columns)
+        self.assertEqual(list(cached.columns), ["date_str", "week", "noel", "working"])
+        pd.testing.assert_frame_equal(uncached, cached)
+
+    def test_load_calendar_features_computes_missing_dates_only(self):
+        computed_ranges = []
+
+        def _compute_features(first, last):
+            computed_ranges.append((first, last))
+            dates = pd.date_range(first, last, freq="D")
+            return pd.DataFrame({"date_str": dates.strftime("%Y-%m-%d"), "day": dates.day})
+
+        def _load(first, last):
+            return load_calendar_features(
+                pd.Timestamp(first), pd.Timestamp(last), "date_str", "%Y-%m-%d", "tests/data", self.cache_path,
+                _compute_features, overlap_days=10)
+
+        _load("2020-01-01", "2020-03-31")
+        features = _load("2020-02-01", "2020-02-29")
+        self.assertEqual(len(computed_ranges), 1)
+        self.assertEqual(list(features["day"]), list(range(1, 30)))
+
+        features = _load("2020-02-01", "2020-05-31")
+        self.assertEqual(computed_ranges[-1], (pd.Timestamp("2020-03-11"), pd.Timestamp("2020-05-31")))
+        self.assertEqual(len(features), 29 + 31 + 30 + 31)
+        self.assertEqual(features["date_str"].iloc[-1], "2020-05-31")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/python3
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.encodings import day_numbers, day_strings, decode_cafeterias, encode_cafeterias, load_cafeterias_dictionary
+
+
+class TestEncodings(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dictionary_path = os.path.join(self.tmp_dir, "cafeterias.csv")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_day_numbers(self):
+        dates = pd.Series(["2017-01-01", "2017-01-02", "invalid", "2016-12-31"])
+        numbers = day_numbers(dates, "%Y-%m-%d")
+        self.assertEqual(numbers.dtype, np.int32)
+        self.assertEqual(list(numbers), [17167, 17168, -1, 17166])
+        self.assertEqual(list(day_strings(numbers[[0, 1, 3, 0]], "%Y-%m-%d")),
+                         ["2017-01-01", "2017-01-02", "2016-12-31", "2017-01-01"])
+
+    def test_cafeterias_dictionary_is_stable(self):
+        cafeterias = pd.DataFrame({"cantine_nom": ["B", "A", "B"], "cantine_type": ["M", "E", "E"]})
+        dictionary = load_cafeterias_dictionary(cafeterias, self.dictionary_path)
+        self.assertEqual(list(encode_cafeterias(cafeterias, dictionary)), [2, 0, 1])
+
+        # known cafeterias keep their ids whatever the order of lines, new ones get the next ids
+        cafeterias = pd.DataFrame({"cantine_nom": ["C", "B", "AA", "A"], "cantine_type": ["M", "M", "M", "E"]})
+        dictionary = load_cafeterias_dictionary(cafeterias, self.dictionary_path)
+        self.assertEqual(list(encode_cafeterias(cafeterias, dictionary)), [4, 2, 3, 0])
+        self.assertEqual(list(dictionary["cafeteria_id"]), [0, 1, 2, 3, 4])
+        pd.testing.assert_frame_equal(dictionary, load_cafeterias_dictionary(cafeterias, self.dictionary_path))
+
+        unknown = pd.DataFrame({"cantine_nom": ["Z", "A"], "cantine_type": ["M", "E"]})
+        self.assertEqual(list(encode_cafeterias(unknown, dictionary)), [-1, 0])
+
+    def test_decode_cafeterias(self):
+        cafeterias = pd.DataFrame({"cantine_nom": ["B", "A"], "cantine_type": ["M", "E"]})
+        dictionary = load_cafeterias_dictionary(cafeterias)
+        names = decode_cafeterias(np.array([1, 0, 1], dtype=np.int32), dictionary)
+        self.assertEqual(list(names["cantine_nom"]), ["B", "A", "B"])
+        self.assertEqual(list(names["cantine_type"]), ["M", "E", "M"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+#!/usr/bin/python3
+import unittest
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+from app.metrics import metrics_by_resolution, metrics_table
+from app.train import evaluation_metrics, precision_calculus, weighted_precision_calculus
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.preds = pd.DataFrame({
+            "cantine_nom": pd.Categorical(rng.choice(["A", "B", "C"], size=200)),
+            "date_str": rng.choice(["2017-01-02", "2017-01-03", "2017-01-04"], size=200),
+            "reel": rng.randint(1, 100, size=200).astype(float),
+            "prevision": rng.randint(1, 100, size=200).astype(float),
+            "output": rng.randint(1, 100, size=200).astype(float),
+        })
+
+    def test_metrics_by_resolution(self):
+        metrics = metrics_by_resolution(self.preds, "reel", "output", ["cantine_nom"])
+        self.assertEqual(list(metrics.index), ["A", "B", "C"])
+        for cantine_nom, data in self.preds.groupby("cantine_nom"):
+            expected = [len(data), data["reel"].sum(), data["output"].sum(),
+                        r2_score(data["reel"], data["output"]),
+                        mean_absolute_error(data["reel"], data["output"]),
+                        mean_squared_error(data["reel"], data["output"]),
+                        weighted_precision_calculus(data["reel"], data["output"]),
+                        precision_calculus(data["reel"], data["output"])]
+            np.testing.assert_allclose(metrics.loc[cantine_nom].values.astype(float), expected)
+
+    def test_metrics_edge_cases(self):
+        dtf = pd.DataFrame({"group": ["a", "b", "b", "c", "c"],
+                            "reel": [5.0, 2.0, 2.0, 0.0, 4.0],
+                            "output": [4.0, 2.0, 3.0, 0.0, 10.0]})
+        metrics = metrics_by_resolution(dtf, "reel", "output", ["group"])
+        # a single prediction has no r2, constant true values have a r2 of 1 only if perfectly predicted
+        self.assertTrue(np.isnan(metrics.loc["a", "r2"]))
+        self.assertEqual(metrics.loc["b", "r2"], 0)
+        # precisions of lines without true value are ignored, negative ones are 0
+        self.assertEqual(metrics.loc["c", "precision"], precision_calculus(dtf["reel"][3:], dtf["output"][3:]))
+        self.assertEqual(metrics.loc["c", "precision"], 0)
+        self.assertEqual(metrics_by_resolution(dtf, "reel", "output").index.tolist(), [None])
+
+    def test_evaluation_metrics(self):
+        table = evaluation_metrics(self.preds, "reel")
+        self.assertEqual(list(table.columns[:3]), ["resolution", "group", "predicted_col"])
+        self.assertEqual(table.groupby("resolution", sort=False).size().to_dict(),
+                         {"all": 2, "days": 2, "cantine_nom": 6, "date_str": 6})
+        line = table[(table["resolution"] == "all") & (table["predicted_col"] == "prevision")].iloc[0]
+        self.assertAlmostEqual(line["mae"], mean_absolute_error(self.preds["reel"], self.preds["prevision"]))
+        self.assertEqual(line["group"], "")
+        pd.testing.assert_frame_equal(metrics_table(self.preds, "reel", ["output"], {"days": None}).iloc[:, 3:],
+                                      metrics_by_resolution(self.preds, "reel", "output").reset_index(drop=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.model_cache import evict, lookup, store, training_fingerprint
+
+
+class TestModelCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.directory, "cache")
+        rng = np.random.RandomState(0)
+        self.train_data = pd.DataFrame({
+            "week": rng.randint(1, 53, 100),
+            "effectif": rng.randint(50, 300, 100),
+            "reel": rng.randint(0, 300, 100).astype(float),
+            "cantine_nom": "A",
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _artifacts(self, name, size):
+        artifacts = os.path.join(self.directory, name)
+        os.makedirs(artifacts)
+        with open(os.path.join(artifacts, "model.model"), "wb") as f_out:
+            f_out.write(b"0" * size)
+        return artifacts
+
+    def test_training_fingerprint(self):
+        features = ["week", "effectif"]
+        fingerprint = training_fingerprint("xgb", "reel", self.train_data, features, {"max_depth": 5})
+        # columns which are not features do not change the models
+        other_data = self.train_data.assign(cantine_nom="B")
+        self.assertEqual(training_fingerprint("xgb", "reel", other_data, features, {"max_depth": 5}), fingerprint)
+
+        other_data = self.train_data.copy()
+        other_data.loc[0, "reel"] += 1
+        self.assertNotEqual(training_fingerprint("xgb", "reel", other_data, features, {"max_depth": 5}), fingerprint)
+        self.assertNotEqual(training_fingerprint("xgb", "reel", self.train_data, features, {"max_depth": 6}),
+                            fingerprint)
+        self.assertNotEqual(training_fingerprint("xgb", "reel", self.train_data, ["week"], {"max_depth": 5}),
+                            fingerprint)
+        self.assertNotEqual(training_fingerprint("xgb_interval", "reel", self.train_data, features, {"max_depth": 5}),
+                            fingerprint)
+
+    def test_store_and_lookup(self):
+        self.assertIsNone(lookup("abc", self.cache_dir))
+        directory = store("abc", self._artifacts("artifacts", 10), self.cache_dir)
+        self.assertEqual(lookup("abc", self.cache_dir), directory)
+        self.assertTrue(os.path.exists(os.path.join(directory, "model.model")))
+
+    def test_evict_least_recently_used(self):
+        for age, name in enumerate(["new", "used", "old"]):
+            directory = store(name, self._artifacts(name, 100), self.cache_dir, max_bytes=1000)
+            os.utime(directory, (1000 - age, 1000 - age))
+        lookup("used", self.cache_dir)
+
+        evict(self.cache_dir, 250)
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), ["new", "used"])
+        # the models just stored are kept even when they exceed the size of the cache
+        store("big", self._artifacts("big", 1000), self.cache_dir, max_bytes=250)
+        self.assertEqual(os.listdir(self.cache_dir), ["big"])
+
+
+if __name__ == '__main__':
+    unittest.main()
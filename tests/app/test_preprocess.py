@@ -1,11 +1,17 @@
 #!/usr/bin/python3
 import os
+import shutil
+import tempfile
 import unittest
+from unittest import mock
 
 import pandas as pd
 
+from app import staging
 from app.exceptions import InconsistentDates, OverlappingColumns
-from app.preprocess import add_statistical_features, compute_dates_dataframe, compute_min_max_date, cross_product
+from app.algorithms import xgb_features, xgb_interval_features
+from app.preprocess import add_statistical_features, compute_dates_dataframe, compute_min_max_date, cross_product, \
+    calendar_calculators, feature_registry, smarter_process_data
 
 
 class TestPreprocess(unittest.TestCase):
@@ -67,6 +73,10 @@ class TestPreprocess(unittest.TestCase):
             "col_3": ["10", "10", "10", "20", "20", "20"],
             "col_4": ["c", "c", "c", "c", "c", "c"]})
         pd.testing.assert_frame_equal(cross_product(data_b, data_a), expected, check_like=True)
+        self.assertEqual(list(cross_product(data_b, data_a).columns), ["col_3", "col_4", "col_1", "col_2"])
+        # input dataframes are not modified
+        self.assertEqual(list(data_a.columns), ["col_1", "col_2"])
+        self.assertEqual(list(data_b.columns), ["col_3", "col_4"])
 
     def test_compute_dates_dataframe(self):
         date_format = "%Y-%m-%d"
@@ -75,6 +85,42 @@ class TestPreprocess(unittest.TestCase):
 
         pd.testing.assert_frame_equal(all_data, reference, check_like=True)
 
+        # only the calculators of the columns run, working days are derived from columns which are not kept
+        columns = ["week", "working", "Events.RAMADAN_ago", "noel"]
+        some_data, _ = compute_dates_dataframe("2017-05-01", "2017-07-20", date_format, "tests/data", False,
+                                               columns=columns)
+        self.assertEqual(list(some_data.columns), [date_col, "week", "Events.RAMADAN_ago", "noel", "working"])
+        pd.testing.assert_frame_equal(some_data, all_data[some_data.columns])
+
+    def test_feature_registry(self):
+        registry = feature_registry("tests/data")
+        self.assertEqual(registry["week"], "date_attributes")
+        self.assertEqual(registry["holidays_in"], "holidays")
+        self.assertEqual(registry["Events.RAMADAN_ago"], "events")
+        self.assertEqual(registry["noel"], "special_meals")
+        self.assertEqual(registry["wednesday"], "working_days")
+        self.assertEqual([calculator.name for calculator in calendar_calculators(
+            "date_str", "%Y-%m-%d", "tests/data", columns=["week", "noel", "annee_scolaire"])],
+            ["school_year", "date_attributes", "special_meals"])
+        calendar_features = set(xgb_features("tests/data") + xgb_interval_features("tests/data")) - \
+            {"site_id", "secteur_cat", "effectif", "frequentation_prevue"}
+        self.assertLessEqual(calendar_features, set(registry))
+
+    def test_statistics_of_the_history(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with mock.patch.object(staging, "STAGING_DIR", directory):
+            args = ["tests/data", [], False, "%Y-%m-%d"]
+            smarter_process_data(args[0], "2016-09-01", "2017-03-24", *args[1:])
+            expected = staging.read_staging("2016-09-01", "2017-03-24")
+            # only the lines of the window are computed, with the statistics of the real values since 2016-09-01
+            smarter_process_data(args[0], "2017-03-06", "2017-03-24", *args[1:], statistics_start="2016-09-01")
+            window = staging.read_staging("2017-03-06", "2017-03-24")
+        expected = expected[expected["date_str"] >= "2017-03-06"].reset_index(drop=True)
+        self.assertTrue(expected["frequentation_reel"].notna().any())
+        # categories of the datasets are the values of their own dates
+        pd.testing.assert_frame_equal(window, expected, check_dtype=False, check_categorical=False)
+
     def test_compute_min_max_date(self):
         min_date, max_date = compute_min_max_date("2015-05-01", "2017-05-08", "2017-07-20", "%Y-%m-%d", 1)
         min_date_expected = "2015-05-01"
@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.schema import apply_schema, dataset_schema, memory_report
+
+
+class TestSchema(unittest.TestCase):
+    def setUp(self):
+        self.dataset = pd.DataFrame({
+            "date_str": ["2017-01-02", "2017-01-03", "2017-01-04"] * 2,
+            "cantine_nom": ["A"] * 3 + ["B"] * 3,
+            "working": [1, 1, 0] * 2,
+            "frites": [0.0, 1.0, 0.0] * 2,
+            "holidays_in": [3, 2, 1] * 2,
+            "effectif": [100.0, np.nan, 120.0] * 2,
+            "greve": [0.0, np.nan, 0.0] * 2,
+            "reel": [90.0, 80.0, 0.0] * 2,
+        })
+
+    def test_apply_schema(self):
+        expected = self.dataset.copy()
+        result = apply_schema(self.dataset, dataset_schema(["frites"]))
+
+        self.assertEqual(str(result["cantine_nom"].dtype), "category")
+        self.assertEqual(result["working"].dtype, np.int8)
+        self.assertEqual(result["frites"].dtype, np.int8)
+        self.assertEqual(result["holidays_in"].dtype, np.int16)
+        self.assertEqual(result["effectif"].dtype, np.float32)
+        # a flag with nans cannot be stored as an integer
+        self.assertEqual(result["greve"].dtype, np.float64)
+        # columns out of the schema are left unchanged
+        self.assertEqual(result["date_str"].dtype, object)
+        self.assertEqual(result["reel"].dtype, np.float64)
+        pd.testing.assert_frame_equal(expected, result, check_dtype=False, check_categorical=False)
+
+    def test_apply_schema_out_of_bounds(self):
+        dataset = pd.DataFrame({"holidays_in": [0, 40000]})
+        result = apply_schema(dataset, dataset_schema())
+        self.assertEqual(result["holidays_in"].dtype, np.int64)
+
+    def test_apply_schema_sorted_categories(self):
+        dataset = pd.DataFrame({"cantine_nom": pd.Categorical(["B", "A", "B"], categories=["B", "A"])})
+        result = apply_schema(dataset, dataset_schema())
+        self.assertEqual(list(result["cantine_nom"].cat.categories), ["A", "B"])
+        self.assertEqual(list(result["cantine_nom"]), ["B", "A", "B"])
+
+    def test_memory_report(self):
+        before = self.dataset.memory_usage(index=False, deep=True)
+        result = apply_schema(self.dataset.copy(), dataset_schema(["frites"]), report=True)
+        report = memory_report(before, result.memory_usage(index=False, deep=True))
+        self.assertEqual(report.loc["working", "bytes_saved"], 6 * 7)
+        self.assertEqual(report.loc["reel", "bytes_saved"], 0)
+        self.assertEqual(list(report.columns), ["bytes_before", "bytes_after", "bytes_saved"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/python3
+import json
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+import numpy as np
+import pandas as pd
+from xgboost import XGBRegressor
+
+from app.artifacts import load_artifacts, save_artifacts
+from app.server import ForecastService, PredictionBatcher, serve
+
+
+class TestPredictionBatcher(unittest.TestCase):
+    def test_concurrent_requests_are_predicted_together(self):
+        calls = []
+
+        def predict(lines):
+            calls.append(list(lines))
+            return pd.DataFrame({"output": lines * 10}, index=lines)
+
+        batcher = PredictionBatcher(predict, max_delay=0.5)
+        futures = [batcher.submit([1, 2]), batcher.submit([2, 3]), batcher.submit([5])]
+        self.assertEqual(list(futures[1].result(5)["output"]), [20, 30])
+        self.assertEqual(list(futures[2].result(5)["output"]), [50])
+        self.assertEqual(calls, [[1, 2, 3, 5]])
+
+
+class TestForecastService(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        rng = np.random.RandomState(0)
+        dates = pd.date_range("2017-10-02", "2017-10-13").strftime("%Y-%m-%d")
+        self.dataset = pd.DataFrame(
+            [(date, cafeteria) for date in dates for cafeteria in ["A", "B"]], columns=["date_str", "cantine_nom"])
+        self.dataset["cantine_type"] = "M"
+        self.dataset["effectif"] = rng.randint(50, 300, len(self.dataset))
+        self.dataset["working"] = (pd.to_datetime(self.dataset["date_str"]).dt.weekday < 5).astype(int)
+        model = XGBRegressor(n_estimators=20, random_state=0)
+        model.fit(self.dataset[["effectif"]], 0.8 * self.dataset["effectif"])
+        save_artifacts(self.directory, {"model": model}, {
+            "training_type": "xgb", "column_to_predict": "reel", "training_dates": [], "features": ["effectif"]})
+        self.expected = np.ceil(model.predict(self.dataset[["effectif"]])) * self.dataset["working"]
+
+        metadata, boosters, _ = load_artifacts(self.directory)
+        self.service = ForecastService(metadata, boosters, self.dataset)
+        self.server = serve(self.service, port=0)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def _get(self, path, query=None):
+        with urlopen(f"{self.url}{path}?{urlencode(query or {}, doseq=True)}") as response:
+            return json.loads(response.read())
+
+    def test_forecast(self):
+        forecasts = self._get("/forecast", {"begin_date": "2017-10-06", "end_date": "2017-10-09", "cafeteria": ["B"]})
+        self.assertEqual([forecast["date_str"] for forecast in forecasts["forecasts"]],
+                         ["2017-10-06", "2017-10-07", "2017-10-08", "2017-10-09"])
+        lines = self.dataset.index[(self.dataset["cantine_nom"] == "B") & self.dataset["date_str"].between(
+            "2017-10-06", "2017-10-09")]
+        self.assertEqual([forecast["output"] for forecast in forecasts["forecasts"]], list(self.expected[lines]))
+
+        request = Request(f"{self.url}/forecast", method="POST", data=json.dumps(
+            {"begin_date": "2017-10-02", "end_date": "2017-10-13"}).encode())
+        with urlopen(request) as response:
+            forecasts = json.loads(response.read())["forecasts"]
+        self.assertEqual(len(forecasts), len(self.dataset))
+        self.assertEqual(self._get("/health")["cafeterias"], ["A", "B"])
+
+    def test_invalid_requests(self):
+        for query in [{"begin_date": "2017-10-02", "end_date": "2017-10-20"},
+                      {"begin_date": "2017-10-02", "end_date": "2017-10-03", "cafeteria": "C"},
+                      {"end_date": "2017-10-03"}]:
+            with self.assertRaises(HTTPError) as context:
+                self._get("/forecast", query)
+            self.assertEqual(context.exception.code, 400)
+            context.exception.close()
+
+    def _post(self, body):
+        request = Request(f"{self.url}/forecast", data=body, headers={"Content-Type": "application/json"})
+        with self.assertRaises(HTTPError) as context:
+            urlopen(request)
+        error = json.loads(context.exception.read())
+        context.exception.close()
+        return context.exception.code, error
+
+    def test_malformed_bodies(self):
+        for body in [[1, 2], {"begin_date": "2017-10-02", "end_date": "2017-10-03", "cafeterias": 5},
+                     {"begin_date": "2017-10-02", "end_date": "2017-10-03", "cafeterias": [["A"]]},
+                     {"begin_date": 20171002, "end_date": "2017-10-03"}]:
+            code, error = self._post(json.dumps(body).encode())
+            self.assertEqual(code, 400)
+            self.assertIn("error", error)
+
+    def test_prediction_failures(self):
+        body = json.dumps({"begin_date": "2017-10-02", "end_date": "2017-10-03"}).encode()
+        with mock.patch.object(self.service.batcher, "predict", side_effect=ValueError("broken model")):
+            code, error = self._post(body)
+        self.assertEqual(code, 500)
+        self.assertIn("broken model", error["error"])
+
+        self.service.timeout = 0.01
+        with mock.patch.object(self.service.batcher, "predict", side_effect=lambda lines: time.sleep(0.5)):
+            code, error = self._post(body)
+        self.assertEqual(code, 504)
+        self.assertIn("error", error)
+
+
+if __name__ == '__main__':
+    unittest.main()
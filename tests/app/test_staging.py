@@ -0,0 +1,92 @@
+#!/usr/bin/python3
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from app import staging
+from app.exceptions import IncompleteDataset
+
+
+class TestStaging(unittest.TestCase):
+    def setUp(self):
+        self.staging_dir = tempfile.mkdtemp()
+        self.patcher = mock.patch.object(staging, "STAGING_DIR", self.staging_dir)
+        self.patcher.start()
+        dates = pd.date_range("2017-01-01", "2017-03-31", freq="D").strftime("%Y-%m-%d")
+        self.dataset = pd.DataFrame({
+            "date_str": list(dates) * 2,
+            "cantine_nom": ["A"] * len(dates) + ["B"] * len(dates),
+            "reel": range(2 * len(dates)),
+            "week": [1] * 2 * len(dates),
+        })
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.staging_dir)
+
+    def test_read_staging_projection_and_dates(self):
+        date_ranges = [("2017-01-10", "2017-01-12"), ("2017-03-01", "2017-03-02")]
+        expected = self.dataset[
+            self.dataset["date_str"].between("2017-01-10", "2017-01-12") |
+            self.dataset["date_str"].between("2017-03-01", "2017-03-02")]
+        expected = expected.sort_values("date_str", kind="mergesort")[["date_str", "reel"]].reset_index(drop=True)
+
+        for staging_format in ["parquet", "csv"]:
+            staging.write_staging(self.dataset, "2017-01-01", "2017-03-31", staging_format)
+            result = staging.read_staging(
+                "2017-01-01", "2017-03-31", ["reel", "unknown"], date_ranges, staging_format)
+            if staging_format == "csv":
+                result = result.sort_values("date_str", kind="mergesort").reset_index(drop=True)
+            pd.testing.assert_frame_equal(expected, result)
+
+        result = staging.read_staging("2017-01-01", "2017-03-31")
+        self.assertEqual(list(result.columns), list(self.dataset.columns))
+        self.assertEqual(len(result), len(self.dataset))
+
+    def test_read_staging_other_format(self):
+        staging.write_staging(self.dataset, "2017-01-01", "2017-03-31", "csv")
+        result = staging.read_staging("2017-01-01", "2017-03-31", staging_format="parquet")
+        pd.testing.assert_frame_equal(self.dataset, result)
+
+    def test_read_staging_required_columns(self):
+        for staging_format in ["parquet", "csv"]:
+            staging.write_staging(self.dataset, "2017-01-01", "2017-03-31", staging_format)
+            result = staging.read_staging("2017-01-01", "2017-03-31", ["reel"], staging_format=staging_format,
+                                          required_columns=["reel", "week"])
+            self.assertEqual(list(result.columns), ["date_str", "reel"])
+            with self.assertRaises(IncompleteDataset):
+                staging.read_staging("2017-01-01", "2017-03-31", ["reel", "holidays_in"],
+                                     staging_format=staging_format, required_columns=["reel", "holidays_in"])
+
+    def test_find_staging(self):
+        self.assertIsNone(staging.find_staging("2017-02-01", "2017-02-10"))
+        staging.write_staging(self.dataset, "2017-01-01", "2017-03-31", "csv")
+        staging.write_staging(self.dataset, "2017-02-01", "2017-02-28", "parquet")
+        self.assertEqual(staging.find_staging("2017-02-01", "2017-02-10"), ("2017-02-01", "2017-02-28", "parquet"))
+        self.assertEqual(staging.find_staging("2017-02-01", "2017-03-10"), ("2017-01-01", "2017-03-31", "csv"))
+        self.assertIsNone(staging.find_staging("2016-12-01", "2017-02-10"))
+        self.assertEqual(staging.find_staging(None, "2017-03-10"), ("2017-01-01", "2017-03-31", "csv"))
+
+    def test_restricted_datasets(self):
+        columns = ["date_str", "reel"]
+        staging.write_staging(self.dataset, "2017-01-01", "2017-03-31")
+        staging.write_staging(self.dataset[columns], "2017-01-01", "2017-06-30", columns=columns)
+        restricted = self.dataset[columns].assign(reel=-1.0)
+        restricted_path = staging.write_staging(restricted, "2017-01-01", "2017-03-31", columns=columns)
+        # the complete dataset is kept and read unless the most recent dataset is restricted to the read columns
+        self.assertNotEqual(restricted_path, staging.staging_file_path("2017-01-01", "2017-03-31"))
+        self.assertIn("week", staging.read_staging("2017-01-01", "2017-03-31").columns)
+        self.assertEqual(sorted(staging.read_staging("2017-01-01", "2017-03-31", ["reel"])["reel"]),
+                         sorted(self.dataset["reel"]))
+        self.assertEqual(set(staging.read_staging("2017-01-01", "2017-03-31", columns)["reel"]), {-1})
+        self.assertIsNone(staging.find_staging("2017-02-01", "2017-05-10"))
+        self.assertEqual(staging.find_staging("2017-02-01", "2017-05-10", columns=["reel", "date_str"]),
+                         ("2017-01-01", "2017-06-30", "parquet"))
+        self.assertIsNone(staging.find_staging("2017-02-01", "2017-05-10", columns=["reel", "week"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/python3
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from app import preprocess, staging, staging_store
+
+
+class TestStagingStore(unittest.TestCase):
+    def setUp(self):
+        self.staging_dir = tempfile.mkdtemp()
+        self.patcher = mock.patch.object(staging, "STAGING_DIR", self.staging_dir)
+        self.patcher.start()
+        self.cafeterias = pd.DataFrame({"cafeteria_id": [0, 1], "cantine_nom": ["A", "B"], "cantine_type": ["M", "E"]})
+        self.cafeterias.to_csv(staging.cafeterias_dictionary_path(), index=False)
+        self.dataset = pd.DataFrame({"date_str": ["2017-01-02", "2017-01-03"], "reel": [1.0, 2.0]})
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.staging_dir)
+
+    def test_preprocessing_fingerprint(self):
+        args = ("tests/data", "2017-01-01", "2017-12-31", ["A"], False, "%Y-%m-%d")
+        fingerprint = staging_store.preprocessing_fingerprint(*args)
+        self.assertEqual(fingerprint, staging_store.preprocessing_fingerprint(*args))
+        self.assertNotEqual(fingerprint, staging_store.preprocessing_fingerprint(*args[:3], ["B"], *args[4:]))
+        self.assertNotEqual(fingerprint, staging_store.preprocessing_fingerprint(*args[:3], [], *args[4:]))
+        self.assertNotEqual(fingerprint, staging_store.preprocessing_fingerprint(*args[:4], True, *args[5:]))
+        self.assertNotEqual(fingerprint, staging_store.preprocessing_fingerprint(*args, staging_format="csv"))
+
+        # the contents of the input files are part of the fingerprint, not their folder
+        data_path = os.path.join(self.staging_dir, "data")
+        shutil.copytree("tests/data", data_path)
+        self.assertEqual(fingerprint, staging_store.preprocessing_fingerprint(data_path, *args[1:]))
+        with open(os.path.join(data_path, "raw", "frequentation.csv"), "a") as f_out:
+            f_out.write("\n")
+        self.assertNotEqual(fingerprint, staging_store.preprocessing_fingerprint(data_path, *args[1:]))
+
+    def test_store_and_restore(self):
+        file_path = staging.write_staging(self.dataset, "2017-01-01", "2017-01-31")
+        staging_store.store("abc", file_path, self.cafeterias)
+        os.remove(file_path)
+
+        self.assertIsNone(staging_store.restore("def", "2017-01-01", "2017-01-31"))
+        self.assertIsNone(staging_store.restore("abc", "2017-01-01", "2017-01-31", "csv"))
+        self.assertEqual(staging_store.restore("abc", "2017-01-01", "2017-01-31"), file_path)
+        pd.testing.assert_frame_equal(staging.read_staging("2017-01-01", "2017-01-31"), self.dataset)
+
+        # datasets written again do not modify the stored ones
+        staging.write_staging(self.dataset.iloc[:1], "2017-01-01", "2017-01-31")
+        staging_store.restore("abc", "2017-01-01", "2017-01-31")
+        pd.testing.assert_frame_equal(staging.read_staging("2017-01-01", "2017-01-31"), self.dataset)
+
+        # cafeterias ids of stored datasets must match the dictionary of cafeterias
+        self.cafeterias.assign(cafeteria_id=[1, 0]).to_csv(staging.cafeterias_dictionary_path(), index=False)
+        self.assertIsNone(staging_store.restore("abc", "2017-01-01", "2017-01-31"))
+
+    def test_restore_many_times(self):
+        file_path = staging.write_staging(self.dataset, "2017-01-01", "2017-01-31")
+        staging_store.store("abc", file_path, self.cafeterias)
+        for _ in range(3):
+            self.assertEqual(staging_store.restore("abc", "2017-01-01", "2017-01-31"), file_path)
+            pd.testing.assert_frame_equal(staging.read_staging("2017-01-01", "2017-01-31"), self.dataset)
+        self.assertFalse(os.path.exists(file_path + ".tmp"))
+
+        # a temporary file left by an interrupted restore is replaced
+        os.remove(file_path)
+        with open(file_path + ".tmp", "w") as f_out:
+            f_out.write("interrupted")
+        staging_store.restore("abc", "2017-01-01", "2017-01-31")
+        pd.testing.assert_frame_equal(staging.read_staging("2017-01-01", "2017-01-31"), self.dataset)
+        self.assertFalse(os.path.exists(file_path + ".tmp"))
+
+    def test_evict(self):
+        file_path = staging.write_staging(self.dataset, "2017-01-01", "2017-01-31")
+        size = os.path.getsize(file_path)
+        for fingerprint, mtime in [("a", 100), ("b", 300), ("c", 200)]:
+            entry_path = staging_store.store(fingerprint, file_path, self.cafeterias)
+            os.utime(entry_path, (mtime, mtime))
+
+        staging_store.evict(2 * size)
+        self.assertIsNone(staging_store.restore("a", "2017-01-01", "2017-01-31"))
+        self.assertIsNotNone(staging_store.restore("c", "2017-01-01", "2017-01-31"))
+        self.assertFalse(os.path.exists(os.path.join(self.staging_dir, "store", "a.json")))
+
+        staging_store.store("d", file_path, self.cafeterias, max_bytes=size)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.staging_dir, "store"))), ["d.json", "d.parquet"])
+
+    def test_smarter_process_data_restores_dataset(self):
+        with mock.patch.object(staging_store, "restore", return_value="prepared_data.parquet") as restore, \
+                mock.patch.object(preprocess, "compute_datafiles_related_dataframes") as compute:
+            preprocess.smarter_process_data("tests/data", "2017-01-01", "2017-01-31", [], False, "%Y-%m-%d",
+                                            cache_path=self.staging_dir)
+        restore.assert_called_once()
+        compute.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
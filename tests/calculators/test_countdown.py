@@ -0,0 +1,40 @@
+#!/usr/bin/python3
+import datetime
+import unittest
+
+import numpy as np
+
+import app.calculators as calc
+from app.calculators.countdown import to_day_numbers
+
+
+class TestCountdown(unittest.TestCase):
+    def test_find_runs(self):
+        run_starts, run_ends = calc.find_runs([True, True, False, False, True, False, True, True, True])
+        self.assertEqual(list(run_starts), [0, 4, 6])
+        self.assertEqual(list(run_ends), [1, 4, 8])
+
+        run_starts, run_ends = calc.find_runs([False, False])
+        self.assertEqual(len(run_starts), 0)
+        self.assertEqual(len(run_ends), 0)
+
+    def test_countdown_matches_nested_loops(self):
+        mask = np.random.RandomState(0).rand(300) > 0.8
+        run_starts, run_ends = calc.find_runs(mask)
+        indexes = range(0, len(mask))
+
+        expected_in = [min([i - x for i in run_starts if i > x], default=0) for x in indexes]
+        expected_ago = [min([x - i for i in run_ends if i < x], default=0) for x in indexes]
+        self.assertEqual(list(calc.countdown_in(indexes, run_starts)), expected_in)
+        self.assertEqual(list(calc.countdown_ago(indexes, run_ends)), expected_ago)
+
+    def test_countdown_not_strict(self):
+        events = to_day_numbers([datetime.date(2018, 12, 6), datetime.date(2018, 12, 24)])
+        days = to_day_numbers([datetime.date(2018, 12, 24), datetime.date(2018, 12, 1)])
+        self.assertEqual(list(calc.countdown_ago(days, events, strict=False)), [0, 0])
+        self.assertEqual(list(calc.countdown_in(days, events, strict=False)), [0, 5])
+        self.assertEqual(list(calc.countdown_ago(days, events, strict=True, default=-1)), [18, -1])
+
+
+if __name__ == '__main__':
+    unittest.main()
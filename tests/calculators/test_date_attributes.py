@@ -28,6 +28,8 @@ class TestDateAttributes(unittest.TestCase):
         self.assertRaises(ValueError, self._test_date_calcs, {'date_str': [datetime(1980, 9, 6)]}, {'day': [-1]}, ["day"])
         self.assertRaises(ValueError, self._test_date_calcs, {'date_str': ["6/9/1980"]}, {'day': [-1]}, ["day"])
         self.assertRaises(ValueError, self._test_date_calcs, {'date_str': [0.4]}, {'day': [-1]}, ["day"])
+        self.assertRaises(ValueError, self._test_date_calcs, {'date_str': ["2019-05-12", ""]}, {'day': [-1, -1]}, ["day"])
+        self.assertRaises(ValueError, self._test_date_calcs, {'date_str': ["2019-05-12"]}, {'day': [-1]}, ["hour"])
 
     def test_calc_date_attribute_future(self):
         date = datetime(datetime.now().year + 2, 4, 26)
@@ -49,6 +51,10 @@ class TestDateAttributes(unittest.TestCase):
         test_dict = {'date_str': ["2019-05-12", "2019-07-31"]}
         self._test_date_calcs(test_dict, {'week': [19, 31]}, ["week"])
 
+    def test_iso_week_at_year_boundaries(self):
+        test_dict = {'date_str': ["2019-12-30", "2021-01-03", "2020-12-31"]}
+        self._test_date_calcs(test_dict, {'week': [1, 53, 53], 'year': [2019, 2021, 2020]}, ["week", "year"])
+
     def test_all_date_attributes(self):
         test_dict = {'date_str': [datetime(2019, 5, 12), datetime(2020, 7, 31)]}
         added_cols = {'day': [12, 31], 'month': [5, 7], 'weekday': [6, 4], 'year': [2019, 2020]}
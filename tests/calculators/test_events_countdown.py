@@ -6,7 +6,7 @@ import pandas as pd
 
 import app.calculators as calc
 from app.calculators.events_countdown import Events, \
-    compute_events_dates, add_countdown_ago, add_countdown_in, \
+    compute_event_date, compute_events_dates, add_countdown_ago, add_countdown_in, \
     compute_first_weekday_of_a_month, compute_last_weekday_of_a_month
 
 
@@ -51,6 +51,16 @@ class TestSpecialDaysCountdown(unittest.TestCase):
         self._test_events_countdown(False)
         self._test_events_countdown(True)
 
+    def test_events_countdown_selected_columns(self):
+        dtf = pd.DataFrame({'date': ["2019-05-01", "2019-05-06", "2019-05-07"]})
+        all_dtf = calc.add_feature_events_countdown(dtf.copy(), 'date', "%Y-%m-%d")
+        train_dtf = calc.add_feature_events_countdown(dtf.copy(), 'date', "%Y-%m-%d", ["Events.RAMADAN_ago"])
+
+        self.assertEqual(list(train_dtf.columns), ["date", "Events.RAMADAN_ago"])
+        self.assertEqual(list(train_dtf["Events.RAMADAN_ago"]), [5, 0, 353])
+        pd.testing.assert_series_equal(train_dtf["Events.RAMADAN_ago"], all_dtf["Events.RAMADAN_ago"])
+        self.assertRaises(ValueError, calc.add_feature_events_countdown, dtf.copy(), 'date', "%Y-%m-%d", ["ramadan"])
+
     def test_compute_special_dates(self):
         special_dates = compute_events_dates([2018])
         self.assertEqual(7, len(special_dates))
@@ -66,6 +76,13 @@ class TestSpecialDaysCountdown(unittest.TestCase):
         self.assertEqual(2017, special_dates[Events.RAMADAN][0].year)
         self.assertEqual(2019, special_dates[Events.RAMADAN][1].year)
 
+    def test_compute_special_dates_memoized(self):
+        compute_event_date.cache_clear()
+        compute_events_dates([2017, 2019])
+        compute_events_dates([2017, 2018, 2019])
+        self.assertEqual(compute_event_date.cache_info().misses, 7 * 3)
+        self.assertEqual(compute_event_date.cache_info().hits, 7 * 2)
+
     def test_add_countdown(self):
         test_event_dates = {}
         test_event_dates["st_nicolas"] = {datetime.date(2017, 12, 6), datetime.date(2018, 12, 6), datetime.date(2019, 12, 6)}
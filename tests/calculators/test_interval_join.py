@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+import unittest
+
+import pandas as pd
+
+import app.calculators as calc
+
+
+def _cross_join_reference(dtf, key, intervals, low_bound, up_bound):
+    """
+    interval join as it used to be computed: cross join, filter on bounds then left merge
+    """
+    dtf = dtf.copy()
+    intervals = intervals.copy()
+    dtf['__magic_key'] = 1
+    intervals['__magic_key'] = 1
+    crossjoindf = pd.merge(dtf, intervals, on=['__magic_key'])
+    dtf.drop(columns=['__magic_key'], inplace=True)
+    crossjoindf.drop(columns=['__magic_key'], inplace=True)
+    conditionnal_join_df = crossjoindf[
+        (crossjoindf[key] >= crossjoindf[low_bound]) & (crossjoindf[key] <= crossjoindf[up_bound])]
+    dtf_columns = dtf.columns.values.tolist()
+    conditionnal_join_df.set_index(dtf_columns, inplace=True)
+    return dtf.merge(conditionnal_join_df, left_on=dtf_columns, right_index=True, how='left').reset_index(drop=True)
+
+
+class TestIntervalJoin(unittest.TestCase):
+    def _assert_same_as_cross_join(self, dtf, key, intervals, low_bound, up_bound):
+        expected = _cross_join_reference(dtf, key, intervals, low_bound, up_bound)
+        result = calc.interval_left_join(dtf, key, intervals, low_bound, up_bound)
+        pd.testing.assert_frame_equal(expected, result)
+
+    def test_interval_left_join_calendar_files(self):
+        all_dates = pd.date_range("2010-06-01", "2021-09-30", freq="D").to_frame(index=False, name="date")
+        for file_name in ["annees_scolaires", "vacances"]:
+            intervals = pd.read_csv(f"tests/data/calculators/{file_name}.csv", parse_dates=['date_debut', 'date_fin'])
+            intervals = intervals.drop_duplicates()
+            self._assert_same_as_cross_join(all_dates, "date", intervals, "date_debut", "date_fin")
+
+        non_working = pd.read_csv("tests/data/calculators/jours_feries.csv", parse_dates=['date'])
+        all_dates = all_dates.rename(columns={"date": "_date"})
+        self._assert_same_as_cross_join(all_dates, "_date", non_working[["date", "nom_jour_ferie"]], "date", "date")
+
+    def test_interval_left_join_overlapping_intervals(self):
+        all_dates = pd.date_range("2020-01-01", "2020-01-20", freq="D").to_frame(index=False, name="date")
+        intervals = pd.DataFrame({
+            "name": ["long", "short", "inner", "out_of_range"],
+            "start": pd.to_datetime(["2020-01-02", "2020-01-10", "2020-01-03", "2021-01-01"]),
+            "end": pd.to_datetime(["2020-01-15", "2020-01-12", "2020-01-04", "2021-01-05"]),
+        })
+        self._assert_same_as_cross_join(all_dates, "date", intervals, "start", "end")
+
+        result = calc.interval_left_join(all_dates, "date", intervals, "start", "end")
+        self.assertEqual(len(result), 20 + 2 + 3)
+        self.assertEqual(list(result[result["date"] == "2020-01-03"]["name"]), ["long", "inner"])
+        self.assertTrue(result[result["date"] == "2020-01-01"]["name"].isnull().all())
+
+    def test_interval_left_join_no_intervals(self):
+        all_dates = pd.date_range("2020-01-01", "2020-01-05", freq="D").to_frame(index=False, name="date")
+        intervals = pd.DataFrame({"name": [], "start": pd.to_datetime([]), "end": pd.to_datetime([])})
+        result = calc.interval_left_join(all_dates, "date", intervals, "start", "end")
+        self.assertEqual(len(result), 5)
+        self.assertTrue(result["name"].isnull().all())
+
+
+if __name__ == '__main__':
+    unittest.main()
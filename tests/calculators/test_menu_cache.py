@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from app.calculators import menu_cache
+
+
+class TestMenuCache(unittest.TestCase):
+    def setUp(self):
+        self.data_path = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.data_path, "raw"))
+        shutil.copy("tests/data/raw/menus_tous.csv", os.path.join(self.data_path, "raw", "menus_tous.csv"))
+        menus = pd.read_csv("tests/data/raw/menus_tous.csv")
+        menus.iloc[:100].to_csv(os.path.join(self.data_path, "raw", "menus_extra.csv"), index=False)
+        with open("tests/data/calculators/menus.json") as f_in:
+            self.dict_special_dishes = json.load(f_in)
+        self.cache_path = os.path.join(self.data_path, "cache")
+
+    def tearDown(self):
+        shutil.rmtree(self.data_path)
+
+    def _load(self):
+        with mock.patch.object(menu_cache, "_read_menus_file", wraps=menu_cache._read_menus_file) as reader:
+            features = menu_cache.load_menus_features(self.data_path, self.dict_special_dishes, self.cache_path)
+        return features, reader.call_count
+
+    def test_load_menus_features_cached(self):
+        expected = menu_cache.load_menus_features(self.data_path, self.dict_special_dishes)
+
+        features, nb_files_read = self._load()
+        self.assertEqual(nb_files_read, 2)
+        pd.testing.assert_frame_equal(expected, features)
+
+        features, nb_files_read = self._load()
+        self.assertEqual(nb_files_read, 0)
+        pd.testing.assert_frame_equal(expected, features)
+
+        # a new file is the only one to be parsed
+        menus = pd.read_csv("tests/data/raw/menus_tous.csv")
+        menus.iloc[100:200].to_csv(os.path.join(self.data_path, "raw", "menus_new.csv"), index=False)
+        features, nb_files_read = self._load()
+        self.assertEqual(nb_files_read, 1)
+        pd.testing.assert_frame_equal(expected, features)
+
+    def test_load_menus_features_changed_categories(self):
+        self._load()
+        self.dict_special_dishes["pizza"] = ["pizza", "calzone"]
+        self.dict_special_dishes.pop("frites")
+        self.dict_special_dishes["pates"] = ["pâtes", "tortis"]
+
+        with mock.patch.object(menu_cache, "compute_menus_features", wraps=menu_cache.compute_menus_features) as compute:
+            features, _ = self._load()
+        self.assertEqual(compute.call_count, 2)
+        self.assertEqual(set(compute.call_args[0][1]), {"pizza", "pates"})
+
+        expected = menu_cache.load_menus_features(self.data_path, self.dict_special_dishes)
+        pd.testing.assert_frame_equal(expected, features)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+#!/usr/bin/python3
+import json
+import re
+import unittest
+
+import pandas as pd
+
+import app.calculators as calc
+from app.calculators.menu_classifier import is_regex
+
+
+class TestMenuClassifier(unittest.TestCase):
+    def test_is_regex(self):
+        self.assertTrue(is_regex("bolognaise(?!végéta|vegeta)"))
+        self.assertFalse(is_regex("*"))
+        self.assertFalse(is_regex("°"))
+        self.assertFalse(is_regex("noël"))
+        self.assertFalse(is_regex("(unbalanced"))
+
+    def test_classify_dishes(self):
+        dishes = pd.Series(["Tortis à la Bolognaise", "Bolognaise végétarienne", "Nems", None, "Poulet*"], index=[3, 4, 5, 6, 7])
+        compiled = calc.compile_menu_categories({
+            "viande": ["*", "bolognaise(?! végéta| vegeta)"],
+            "asiatique": ["nem"],
+            "vide": [],
+        })
+        expected = pd.DataFrame({
+            "viande": [True, False, False, False, True],
+            "asiatique": [False, False, True, False, False],
+            "vide": [False] * 5,
+        }, index=[3, 4, 5, 6, 7])
+        pd.testing.assert_frame_equal(calc.classify_dishes(dishes, compiled), expected)
+
+    def test_classify_dishes_literal_terms(self):
+        with open("tests/data/calculators/menus.json") as f_in:
+            dict_special_dishes = json.load(f_in)
+        dishes = pd.read_csv("tests/data/raw/menus_tous.csv")["plat"]
+        result = calc.classify_dishes(dishes, calc.compile_menu_categories(dict_special_dishes))
+
+        for category, terms in dict_special_dishes.items():
+            terms = [term for term in terms if not is_regex(term)]
+            expected = dishes.apply(lambda plat, words=terms: any(re.search(re.escape(word), plat.lower()) for word in words))
+            if len(terms) == len(dict_special_dishes[category]):
+                self.assertEqual(list(expected), list(result[category]), category)
+            else:
+                self.assertTrue((result[category] | ~expected).all(), category)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,8 @@
 #!/usr/bin/python3
 import json
+import os
+import shutil
+import tempfile
 import unittest
 
 import pandas as pd
@@ -28,6 +31,24 @@ class TestMenus(unittest.TestCase):
 
         pd.testing.assert_frame_equal(pd.read_csv("tests/fixtures/menus_dataset.csv", index_col=0), train_dtf)
 
+    def test_read_meals_dictionary(self):
+        directory = tempfile.mkdtemp()
+        try:
+            os.makedirs(os.path.join(directory, "calculators"))
+            file_path = os.path.join(directory, "calculators", "menus.json")
+            with open(file_path, "w") as f_out:
+                json.dump({"noel": ["dinde"]}, f_out)
+            meals = calc.read_meals_dictionary(directory)
+            meals["noel"].append("marron")
+            self.assertEqual(calc.read_meals_dictionary(directory), {"noel": ["dinde"]})
+
+            # the file is parsed again once modified
+            with open(file_path, "w") as f_out:
+                json.dump({"noel": ["dinde"], "frites": ["frites"]}, f_out)
+            self.assertEqual(list(calc.read_meals_dictionary(directory)), ["noel", "frites"])
+        finally:
+            shutil.rmtree(directory)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+import functools
+import unittest
+
+import pandas as pd
+
+import app.calculators as calc
+from app.exceptions import InvalidCalculators
+
+
+def _double(dtf, column, output):
+    dtf[output] = 2 * dtf[column]
+    return dtf
+
+
+def _reset(dtf, column, output):
+    dtf = dtf.reset_index(drop=True)
+    dtf[output] = dtf[column] + 1
+    return dtf
+
+
+def _calculator(name, column, output, function=_double):
+    return calc.Calculator(name, functools.partial(function, column=column, output=output), [column], [output])
+
+
+class TestRunner(unittest.TestCase):
+    def setUp(self):
+        self.dates = pd.DataFrame({"value": [1, 2, 3]}, index=pd.date_range("2017-01-02", periods=3, name="date_index"))
+        self.calculators = [_calculator("quadruple", "double", "quadruple"),
+                            _calculator("double", "value", "double"),
+                            _calculator("next", "value", "next", _reset)]
+
+    def test_calculators_levels(self):
+        levels = calc.calculators_levels(self.calculators, self.dates.columns)
+        self.assertEqual([[calculator.name for calculator in level] for level in levels],
+                         [["double", "next"], ["quadruple"]])
+
+        with self.assertRaises(InvalidCalculators):
+            calc.calculators_levels(self.calculators + [_calculator("other", "value", "next")], self.dates.columns)
+        with self.assertRaises(InvalidCalculators):
+            calc.calculators_levels(self.calculators + [_calculator("value", "next", "value")], self.dates.columns)
+        with self.assertRaises(InvalidCalculators):
+            calc.calculators_levels(self.calculators[:1], self.dates.columns)
+
+    def test_run_calculators(self):
+        expected = self.dates.assign(quadruple=[4, 8, 12], double=[2, 4, 6], next=[2, 3, 4])
+        for processes in [False, True]:
+            dates = calc.run_calculators(self.dates, self.calculators, workers=2, processes=processes)
+            pd.testing.assert_frame_equal(dates, expected)
+        self.assertEqual(list(self.dates.columns), ["value"])
+
+
+if __name__ == '__main__':
+    unittest.main()
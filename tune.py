@@ -0,0 +1,149 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------
+# search the hyperparameters of the xgb model of school meal forecast app
+# -----------------------------------------------------------
+
+import argparse
+import sys
+
+from app.algorithms import xgb_features
+from app.algorithms.xgb_search import HYPERPARAMETERS_FILE, SEARCH_METHODS, sample_candidates, \
+    save_hyperparameters, search_hyperparameters, time_split
+from app.exceptions import EmptyTrainingSet
+from app.log import logger
+from app.train import filter_data, load_preprocessed_dataset
+from main import prepare_arborescence
+
+
+def load_arguments(args):
+    """
+    Loads arguments from user input through command line
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--data-path",
+        default="data",
+        help="the folder containing data files")
+
+    parser.add_argument(
+        "--start-training-date",
+        default="2012-09-01",
+        help="begin date of the training set using date format 'YYYY-MM-DD'")
+
+    parser.add_argument(
+        "--end-training-date",
+        required=True,
+        help="end date of the training set using date format 'YYYY-MM-DD', a preprocessed dataset must cover it")
+
+    parser.add_argument(
+        "--column-to-predict",
+        default="reel",
+        choices=["reel", "prevision"],
+        help="the column to predict")
+
+    parser.add_argument(
+        "--method",
+        default="halving",
+        choices=SEARCH_METHODS,
+        help="train all candidates fully ('random') or only the best ones of shorter trainings ('halving')")
+
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        default=27,
+        help="number of sets of hyperparameters to evaluate, the first one is the default one")
+
+    parser.add_argument(
+        "--validation-ratio",
+        type=float,
+        default=0.2,
+        help="share of the last dates of the training set used to evaluate candidates")
+
+    parser.add_argument(
+        "--min-rounds",
+        type=int,
+        default=100,
+        help="When using halving, number of rounds of the first trainings")
+
+    parser.add_argument(
+        "--max-rounds",
+        type=int,
+        default=5000,
+        help="maximum number of rounds of a training")
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="number of candidates trained concurrently, the number of cpus by default")
+
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="seed of the random draw of candidates")
+
+    parser.add_argument(
+        "--train-on-no-school-days",
+        dest="remove_no_school",
+        default=True,
+        action="store_false",
+        help="whether no school days should be removed from the training set")
+
+    parser.add_argument(
+        "--train-on-outliers",
+        dest="remove_outliers",
+        default=True,
+        action="store_false",
+        help="whether to include outliers in the training set")
+
+    parser.add_argument(
+        "--staging-format",
+        default="parquet",
+        choices=["parquet", "csv"],
+        help="preferred format of the preprocessed dataset to load")
+
+    parser.add_argument(
+        "--output",
+        default=HYPERPARAMETERS_FILE,
+        help="file where the best hyperparameters are saved, to be used with main.py --xgb-hyperparameters")
+
+    return parser.parse_args(args)
+
+
+def main():
+    """
+    evaluates candidates hyperparameters of the xgb model on the last dates of the training set
+    and saves the best ones
+    """
+    prepare_arborescence()
+    args = load_arguments(sys.argv[1:])
+
+    train_data = load_preprocessed_dataset(
+        args.start_training_date, args.end_training_date, args.data_path, ["xgb"], args.staging_format)
+    train_data = filter_data(train_data, args.remove_no_school, args.remove_outliers, args.end_training_date)
+    if len(train_data) == 0:
+        raise EmptyTrainingSet(f"between {args.start_training_date} and {args.end_training_date}")
+    split = time_split(train_data, xgb_features(args.data_path), args.column_to_predict, args.validation_ratio)
+
+    candidates = sample_candidates(args.candidates, args.seed)
+    best, evaluations = search_hyperparameters(
+        split,
+        candidates,
+        args.method,
+        args.min_rounds,
+        args.max_rounds,
+        workers=args.workers)
+    save_hyperparameters(
+        best,
+        args.output,
+        column_to_predict=args.column_to_predict,
+        training_dates=[args.start_training_date, args.end_training_date],
+        method=args.method,
+        candidates=candidates,
+        evaluations=evaluations)
+    logger.info("------------- finished ----------------")
+
+
+if __name__ == "__main__":
+    main()